@@ -0,0 +1,494 @@
+"""Benchmarks for the OnStar GPS decoder
+
+generate: writes a reproducible synthetic Gen10/Gen11-style image with GPS
+          records at a configurable density, noise rate and corruption rate.
+run:      times each pipeline stage (detect, read, scan, parse, validate,
+          write) on synthetic images of the requested sizes with the chosen
+          firmware variant and decode engine, plus the legacy in-memory
+          find_gps_blocks_binary scan on images small enough to load, and
+          reports MB/s and fixes/s.
+compare:  prints the change in throughput between two JSON result files.
+startup: runs `python -X importtime` on `import onstar_gen11` and on the
+         CLI's --help a few times, reports the median import cost and the
+         slowest modules, and fails when the median exceeds --budget-ms or
+         when a GUI/optional dependency is imported eagerly.
+
+Usage:
+    python benchmark.py generate image.bin --size 100MB [--density 400] [--noise 0.2] [--corruption 0.05]
+    python benchmark.py run --sizes 1MB,100MB,1GB [--format xlsx] [--engine auto] [--variant auto] [--json results.json]
+    python benchmark.py compare old.json new.json
+    python benchmark.py startup [--repeat 5] [--budget-ms 150] [--json results.json]
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import struct
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+SCRIPT = os.path.join(HERE, 'onstar_gen11.py')
+
+# Modules `import onstar_gen11` must not pull in
+LAZY_MODULES = ('tkinter', 'tkinterdnd2', 'openpyxl', 'numpy', 'concurrent.futures')
+
+SIZE_UNITS = {'': 1, 'B': 1, 'K': 1 << 10, 'KB': 1 << 10, 'M': 1 << 20, 'MB': 1 << 20, 'G': 1 << 30, 'GB': 1 << 30}
+
+# Generator tuning: noise bytes are sliced from a fixed random pool, and this
+# share of records follows the previous one closely, the way log lines cluster
+NOISE_POOL_BYTES = 1 << 20
+CLUSTERED_SHARE = 0.3
+GENERATOR_FLUSH_BYTES = 8 << 20
+
+# find_gps_blocks_binary needs the whole image in memory; skip it above this
+IN_MEMORY_LIMIT = 256 << 20
+
+STAGES = ('detect', 'read', 'scan', 'parse', 'validate', 'write')
+
+
+def parse_size(text):
+    """Parse a size such as 512KB, 100MB or 10GB into bytes"""
+    text = text.strip().upper()
+    number = text.rstrip('KMGB')
+    unit = text[len(number):]
+    if unit not in SIZE_UNITS or not number:
+        raise argparse.ArgumentTypeError(f"invalid size: {text}")
+    return int(float(number) * SIZE_UNITS[unit])
+
+
+def format_size(size):
+    for unit in ('GB', 'MB', 'KB'):
+        if size >= SIZE_UNITS[unit] and size % SIZE_UNITS[unit] == 0:
+            return f"{size // SIZE_UNITS[unit]}{unit}"
+    return f"{size}B"
+
+
+def encode_coordinate(value, rng, noisy):
+    """Hex of value * 1e7 as a little-endian double, the way the logs store it"""
+    text = struct.pack('<d', value * 10000000.0).hex()
+    if noisy and rng.random() < 0.5:
+        text = text.upper()
+    if noisy and rng.random() < 0.2:
+        text = text[:8] + ' ' + text[8:12] + '\n' + text[12:]
+    return text.encode()
+
+
+def make_record(rng, style, noise, corruption):
+    """Return one synthetic GPS log record as bytes"""
+    noisy = rng.random() < noise
+    week = rng.randint(2000, 2350)
+    tow = rng.randrange(604800000)
+    lat = rng.uniform(-90.0, 90.0)
+    lon = rng.uniform(-180.0, 180.0)
+    if style == 'gen10':
+        tow_key, week_key, separator = b'tow=', b'week=', b'\n'
+    else:
+        tow_key, week_key, separator = b'gps_tow=', b'gps_week=', b' '
+    fields = [
+        tow_key + str(tow).encode(),
+        week_key + str(week).encode(),
+        b'utc_year=%d utc_month=%d utc_day=%d utc_hour=%d utc_min=%d' % (
+            rng.randint(2015, 2025), rng.randint(1, 12), rng.randint(1, 28), rng.randrange(24), rng.randrange(60)),
+        b'lat=' + encode_coordinate(lat, rng, noisy),
+        b'lon=' + encode_coordinate(lon, rng, noisy),
+    ]
+    if noisy:
+        if rng.random() < 0.3:
+            rng.shuffle(fields)
+        separator = rng.choice([b',', b'\x00', b'; ', b'\r\n'])
+    if rng.random() < corruption:
+        damage = rng.randrange(5)
+        if damage == 0:
+            fields[3] = fields[3][:12]  # truncated latitude
+        elif damage == 1:
+            fields[4] = b'lon=zz' + fields[4][4:]  # garbage in the longitude hex
+        elif damage == 2:
+            fields[1] = week_key + b'4001'  # week out of range
+        elif damage == 3:
+            fields[2] = b'year=20231 month=4 today=5'  # no UTC fields
+        else:
+            return separator.join(fields)[:rng.randrange(8, 60)]  # record cut short
+    return separator.join(fields)
+
+
+def generate_image(path, size, density=400, noise=0.2, corruption=0.05, style='gen11', seed=1):
+    """Write a synthetic image of `size` bytes; returns the number of records written
+
+    density is GPS records per MiB. Records are separated by random bytes
+    (with '=' removed so the noise never forms a keyword), and about
+    CLUSTERED_SHARE of them follow the previous record within 64 bytes.
+    """
+    rng = random.Random(seed)
+    pool = rng.randbytes(NOISE_POOL_BYTES).replace(b'=', b'#')
+    mean_record = 170
+    mean_gap = max(0.0, (1 << 20) / max(density, 1e-9) - mean_record)
+    spread_gap = max(0.0, (mean_gap - CLUSTERED_SHARE * 32) / (1 - CLUSTERED_SHARE))
+    records = 0
+    written = 0
+    buffer = bytearray()
+    with open(path, 'wb') as f:
+        while written + len(buffer) < size:
+            if rng.random() < CLUSTERED_SHARE:
+                gap = rng.randrange(64)
+            else:
+                gap = int(rng.uniform(0, 2 * spread_gap))
+            while gap > 0:
+                start = rng.randrange(NOISE_POOL_BYTES)
+                piece = pool[start:start + gap]
+                buffer += piece
+                gap -= len(piece)
+            buffer += make_record(rng, style, noise, corruption)
+            records += 1
+            if len(buffer) >= GENERATOR_FLUSH_BYTES:
+                f.write(buffer)
+                written += len(buffer)
+                buffer = bytearray()
+        f.write(buffer[:size - written])
+    return records
+
+
+class TimedReader:
+    """Wrap a binary file and add up the time spent in read()"""
+
+    def __init__(self, f):
+        self.f = f
+        self.seconds = 0.0
+
+    def read(self, size=-1):
+        start = time.perf_counter()
+        data = self.f.read(size)
+        self.seconds += time.perf_counter() - start
+        return data
+
+    def tell(self):
+        return self.f.tell()
+
+
+def bench_stages(image_path, output_format='xlsx', segmentation='cluster', work_dir=None, variant='auto',
+                 engine='auto'):
+    """Run the decode pipeline once with a timer around every stage; returns a results dict
+
+    detect is resolve_variant (firmware variant detection when variant is
+    'auto'), read is time inside file reads, scan is segment finding minus
+    reads, parse is decode_segments with the given engine ('auto' uses
+    NumPy when installed), validate is is_valid_entry and write is the
+    sink's write() and close().
+    """
+    from onstar_gen11 import OnStarDecoder, load_numpy
+    decoder = OnStarDecoder()
+    size = os.path.getsize(image_path)
+    output_path = os.path.join(work_dir or tempfile.gettempdir(),
+                               'benchmark_output' + decoder.output_sinks[output_format].extension)
+    # Build one sink untimed so one-off imports (openpyxl) are not charged to the first image
+    decoder.open_sink(output_path, output_format).abort()
+    if engine != 'python' and load_numpy() is None:
+        engine = 'python'  # the decoder falls back the same way
+    elif engine == 'auto':
+        engine = 'numpy'
+    seconds = dict.fromkeys(STAGES, 0.0)
+    segments = fixes = valid = 0
+    clock = time.perf_counter
+    total_start = clock()
+    resolved = decoder.resolve_variant(image_path, variant)
+    detect = clock() - total_start
+    scan = [0.0]
+
+    def timed_segments(iterator):
+        while True:
+            t0 = clock()
+            segment = next(iterator, None)
+            scan[0] += clock() - t0
+            if segment is None:
+                return
+            yield segment
+
+    with open(image_path, 'rb') as raw, decoder.open_sink(output_path, output_format) as sink:
+        reader = TimedReader(raw)
+        iterator = decoder.iter_segments(reader, segmentation, anchor=resolved.record_anchor)
+        decoded = decoder.decode_segments(timed_segments(iterator), engine, variant=resolved)
+        parse = validate = write = 0.0
+        done = object()
+        while True:
+            scanned = scan[0]
+            t1 = clock()
+            fix = next(decoded, done)
+            t2 = clock()
+            # Time spent pulling segments inside next() belongs to the scan
+            parse += t2 - t1 - (scan[0] - scanned)
+            if fix is done:
+                break
+            segments += 1
+            ok = decoder.is_valid_entry(fix)
+            t3 = clock()
+            validate += t3 - t2
+            if fix:
+                fixes += 1
+            if ok:
+                valid += 1
+                sink.write(fix)
+                write += clock() - t3
+        t0 = clock()
+    seconds.update(detect=detect, read=reader.seconds, scan=scan[0] - reader.seconds, parse=parse,
+                   validate=validate, write=write + clock() - t0)
+    total = clock() - total_start
+    os.remove(output_path)
+
+    megabytes = size / (1 << 20)
+    stages = {}
+    for stage in STAGES:
+        stage_seconds = seconds[stage]
+        stages[stage] = {
+            'seconds': stage_seconds,
+            'mb_per_s': megabytes / stage_seconds if stage_seconds else None,
+            'fixes_per_s': valid / stage_seconds if stage_seconds else None,
+        }
+    results = {
+        'bytes': size,
+        'segments': segments,
+        'fixes': fixes,
+        'valid_fixes': valid,
+        'format': output_format,
+        'segmentation': segmentation,
+        'variant': resolved.name,
+        'engine': engine,
+        'total_seconds': total,
+        'mb_per_s': megabytes / total if total else None,
+        'fixes_per_s': valid / total if total else None,
+        'stages': stages,
+    }
+    if size <= IN_MEMORY_LIMIT:
+        with open(image_path, 'rb') as f:
+            data = f.read()
+        start = clock()
+        blocks = decoder.find_gps_blocks_binary(data)
+        elapsed = clock() - start
+        results['find_gps_blocks_binary'] = {'seconds': elapsed, 'blocks': len(blocks),
+                                             'mb_per_s': megabytes / elapsed if elapsed else None}
+    return results
+
+
+def bench_run(sizes, density, noise, corruption, style, seed, output_format, segmentation, work_dir, keep,
+              variant='auto', engine='auto'):
+    """Generate (or reuse) one image per size and time the stages on each"""
+    work_dir = work_dir or os.path.join(tempfile.gettempdir(), 'onstar_benchmark')
+    os.makedirs(work_dir, exist_ok=True)
+    runs = []
+    for size in sizes:
+        name = f"synthetic_{style}_{format_size(size)}_d{density:g}_n{noise:g}_c{corruption:g}_s{seed}.bin"
+        image_path = os.path.join(work_dir, name)
+        if not os.path.exists(image_path):
+            print(f"Generating {name}...")
+            start = time.perf_counter()
+            generate_image(image_path, size, density, noise, corruption, style, seed)
+            print(f"  {time.perf_counter() - start:.1f}s")
+        print(f"Timing {format_size(size)}...")
+        result = bench_stages(image_path, output_format, segmentation, work_dir, variant, engine)
+        result['image'] = name
+        runs.append(result)
+        report_run(result)
+        if not keep:
+            os.remove(image_path)
+    return {
+        'benchmark': 'stages',
+        'created': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'commit': git_commit(),
+        'python': sys.version.split()[0],
+        'platform': platform.platform(),
+        'generator': {'density': density, 'noise': noise, 'corruption': corruption, 'style': style, 'seed': seed},
+        'runs': runs,
+    }
+
+
+def git_commit():
+    try:
+        result = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=HERE, capture_output=True, text=True)
+    except OSError:
+        return None
+    return result.stdout.strip() or None
+
+
+def report_run(result):
+    """Print one size's stage table"""
+    print(f"  {result['variant']} variant, {result['engine']} engine: "
+          f"{result['segments']} segments, {result['valid_fixes']} valid fixes, "
+          f"{result['total_seconds']:.2f}s total, {result['mb_per_s']:.1f} MB/s, {result['fixes_per_s']:.0f} fixes/s")
+    for stage in STAGES:
+        entry = result['stages'][stage]
+        mb_per_s = f"{entry['mb_per_s']:10.1f} MB/s" if entry['mb_per_s'] else ' ' * 15
+        fixes_per_s = f"{entry['fixes_per_s']:12.0f} fixes/s" if entry['fixes_per_s'] else ''
+        print(f"    {stage:<9}{entry['seconds']:8.3f}s {mb_per_s} {fixes_per_s}")
+    legacy = result.get('find_gps_blocks_binary')
+    if legacy:
+        print(f"    find_gps_blocks_binary (in memory): {legacy['seconds']:.3f}s, {legacy['mb_per_s']:.1f} MB/s")
+
+
+def compare_results(old, new):
+    """Print the throughput change per size and stage between two result files"""
+    old_runs = {run['bytes']: run for run in old['runs']}
+    print(f"{old.get('commit')} ({old.get('created')}) -> {new.get('commit')} ({new.get('created')})")
+    for run in new['runs']:
+        before = old_runs.get(run['bytes'])
+        if before is None:
+            continue
+        notes = [f"{key} {before.get(key)} -> {run.get(key)}" for key in ('format', 'variant', 'engine')
+                 if before.get(key) != run.get(key)]
+        note = f" ({', '.join(notes)})" if notes else ''
+        print(f"{format_size(run['bytes'])}{note}:")
+        rows = [('total', before['mb_per_s'], run['mb_per_s'])]
+        # Results from before a stage existed simply lack it
+        rows += [(stage, before['stages'].get(stage, {}).get('mb_per_s'), run['stages'][stage]['mb_per_s'])
+                 for stage in STAGES]
+        for label, old_rate, new_rate in rows:
+            if old_rate and new_rate:
+                print(f"  {label:<9}{old_rate:10.1f} -> {new_rate:10.1f} MB/s ({(new_rate / old_rate - 1) * 100:+.1f}%)")
+
+
+def parse_importtime(stderr):
+    """Return {module: (self_us, cumulative_us)} from -X importtime output"""
+    modules = {}
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        modules[name.strip()] = (int(self_us), int(cumulative_us))
+    return modules
+
+
+def run_importtime(code):
+    """Run code in a fresh interpreter with -X importtime; returns (modules, wall seconds)"""
+    command = [sys.executable, '-X', 'importtime', '-c', code]
+    start = time.perf_counter()
+    result = subprocess.run(command, cwd=HERE, capture_output=True, text=True)
+    elapsed = time.perf_counter() - start
+    if result.returncode != 0:
+        raise RuntimeError(f"{code!r} failed:\n{result.stderr}")
+    return parse_importtime(result.stderr), elapsed
+
+
+def bench_startup(repeat):
+    """Measure import and --help startup; returns a results dict"""
+    # Warm the bytecode cache so the first sample does not include compiling
+    subprocess.run([sys.executable, '-m', 'compileall', '-q', SCRIPT], cwd=HERE, check=True)
+    import_ms, wall_ms, help_ms = [], [], []
+    modules = {}
+    for _ in range(repeat):
+        modules, elapsed = run_importtime('import onstar_gen11')
+        import_ms.append(modules['onstar_gen11'][1] / 1000)
+        wall_ms.append(elapsed * 1000)
+        start = time.perf_counter()
+        subprocess.run([sys.executable, SCRIPT, '--help'], cwd=HERE, capture_output=True, check=True)
+        help_ms.append((time.perf_counter() - start) * 1000)
+    _, baseline = run_importtime('pass')
+    slowest = sorted(modules.items(), key=lambda item: item[1][0], reverse=True)[:10]
+    return {
+        'python': sys.version.split()[0],
+        'repeat': repeat,
+        'import_ms_median': statistics.median(import_ms),
+        'import_ms': import_ms,
+        'process_ms_median': statistics.median(wall_ms),
+        'interpreter_ms': baseline * 1000,
+        'help_ms_median': statistics.median(help_ms),
+        'eager_lazy_modules': [name for name in LAZY_MODULES if name in modules],
+        'slowest_modules': [{'module': name, 'self_ms': self_us / 1000, 'cumulative_ms': cumulative_us / 1000}
+                            for name, (self_us, cumulative_us) in slowest],
+    }
+
+
+def report_startup(results, budget_ms):
+    """Print startup results; returns the list of failures"""
+    print(f"import onstar_gen11: {results['import_ms_median']:.1f} ms median "
+          f"(process {results['process_ms_median']:.1f} ms, bare interpreter {results['interpreter_ms']:.1f} ms)")
+    print(f"onstar_gen11.py --help: {results['help_ms_median']:.1f} ms median")
+    print("Slowest modules (self time):")
+    for entry in results['slowest_modules']:
+        print(f"  {entry['self_ms']:8.2f} ms  {entry['module']}")
+    failures = []
+    if results['eager_lazy_modules']:
+        failures.append(f"imported eagerly: {', '.join(results['eager_lazy_modules'])}")
+    if budget_ms is not None and results['import_ms_median'] > budget_ms:
+        failures.append(f"import took {results['import_ms_median']:.1f} ms, budget is {budget_ms} ms")
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description='OnStar GPS Decoder benchmarks')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    def add_generator_options(command):
+        command.add_argument('--density', type=float, default=400, help='GPS records per MiB (default: 400)')
+        command.add_argument('--noise', type=float, default=0.2,
+                             help='Share of records with formatting noise: case, spacing, order (default: 0.2)')
+        command.add_argument('--corruption', type=float, default=0.05,
+                             help='Share of damaged records (default: 0.05)')
+        command.add_argument('--style', choices=['gen11', 'gen10'], default='gen11',
+                             help='gen11: gps_tow=/gps_week= on one line; gen10: tow=/week= on separate lines')
+        command.add_argument('--seed', type=int, default=1, help='Random seed (default: 1)')
+
+    generate = commands.add_parser('generate', help='Write a synthetic OnStar image')
+    generate.add_argument('path')
+    generate.add_argument('--size', type=parse_size, default=parse_size('100MB'), help='Image size (default: 100MB)')
+    add_generator_options(generate)
+    run = commands.add_parser('run', help='Time each pipeline stage on synthetic images')
+    run.add_argument('--sizes', default='1MB,100MB',
+                     help='Comma-separated image sizes, 1MB up to 10GB (default: 1MB,100MB)')
+    run.add_argument('--format', dest='output_format', default='xlsx', help='Output format to write (default: xlsx)')
+    run.add_argument('--segmentation', choices=['cluster', 'record'], default='cluster')
+    run.add_argument('--variant', choices=['auto', 'gen10', 'gen11', 'generic'], default='auto',
+                     help='Firmware variant to decode with; auto (default) times detection as its own stage')
+    run.add_argument('--engine', choices=['auto', 'python', 'numpy'], default='auto',
+                     help='Decode engine to time (default: auto, NumPy when installed)')
+    run.add_argument('--work-dir', help='Where images are generated and cached (default: a temp folder)')
+    run.add_argument('--keep', action='store_true', help='Keep generated images for later runs')
+    run.add_argument('--json', help='Write the results to this JSON file')
+    add_generator_options(run)
+    compare = commands.add_parser('compare', help='Compare two run result files')
+    compare.add_argument('old')
+    compare.add_argument('new')
+    startup = commands.add_parser('startup', help='Measure import and CLI startup time')
+    startup.add_argument('--repeat', type=int, default=5, help='Samples per measurement (default: 5)')
+    startup.add_argument('--budget-ms', type=float, default=None,
+                         help='Fail if the median import time exceeds this many milliseconds')
+    startup.add_argument('--json', help='Also write the results to this JSON file')
+    args = parser.parse_args()
+
+    if args.command == 'generate':
+        records = generate_image(args.path, args.size, args.density, args.noise, args.corruption, args.style,
+                                 args.seed)
+        print(f"Wrote {records} records to {args.path}")
+        return 0
+    if args.command == 'run':
+        sys.path.insert(0, HERE)
+        sizes = [parse_size(size) for size in args.sizes.split(',')]
+        results = bench_run(sizes, args.density, args.noise, args.corruption, args.style, args.seed,
+                            args.output_format, args.segmentation, args.work_dir, args.keep, args.variant,
+                            args.engine)
+        if args.json:
+            with open(args.json, 'w', encoding='utf-8') as f:
+                json.dump(results, f, indent=2)
+        return 0
+    if args.command == 'compare':
+        with open(args.old, encoding='utf-8') as f:
+            old = json.load(f)
+        with open(args.new, encoding='utf-8') as f:
+            new = json.load(f)
+        compare_results(old, new)
+        return 0
+
+    results = bench_startup(args.repeat)
+    failures = report_startup(results, args.budget_ms)
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+    for failure in failures:
+        print(f"FAIL: {failure}", file=sys.stderr)
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,273 +1,3086 @@
-﻿import tkinter as tk
-from tkinter import ttk, filedialog, messagebox
-import threading
+﻿import threading
 import os
 import sys
-from pathlib import Path
+import glob
+import time
+import mmap
 import binascii
 import re
 import struct
-from datetime import datetime, timezone
-from tkinterdnd2 import DND_FILES, TkinterDnD
-from openpyxl import Workbook
-import platform
+import math
+from datetime import datetime, timezone, timedelta
+from array import array
 import csv
+import json
+import sqlite3
 import argparse
+import io
+import hashlib
+import queue
+from collections import deque
+from contextlib import contextmanager, nullcontext
+
+# The decoder core only needs the standard library. The GUI stack, openpyxl
+# and NumPy are imported on first use (load_gui_modules, XlsxSink,
+# load_numpy) so CLI runs and headless workers start quickly and work without
+# them installed.
+tk = ttk = filedialog = messagebox = None
+DND_FILES = TkinterDnD = None
+np = None
+_numpy_checked = False
+
+
+def load_gui_modules():
+    """Import tkinter and tkinterdnd2 into the module namespace for the GUI"""
+    global tk, ttk, filedialog, messagebox, DND_FILES, TkinterDnD
+    if tk is not None:
+        return
+    import tkinter
+    from tkinter import ttk as _ttk, filedialog as _filedialog, messagebox as _messagebox
+    from tkinterdnd2 import DND_FILES as _dnd_files, TkinterDnD as _tkinterdnd
+    tk, ttk, filedialog, messagebox = tkinter, _ttk, _filedialog, _messagebox
+    DND_FILES, TkinterDnD = _dnd_files, _tkinterdnd
+
+
+def load_numpy():
+    """Import NumPy on first use; returns None when it is not installed"""
+    global np, _numpy_checked
+    if not _numpy_checked:
+        try:
+            import numpy
+            np = numpy
+        except ImportError:
+            np = None
+        _numpy_checked = True
+    return np
+
+# Keywords that mark the start of GPS fields in the OnStar logs
+GPS_KEYWORD_PATTERNS = [
+    b'gps_tow=',
+    b'gps_week=',
+    b'utc_year=',
+    b'lat=',
+    b'lon='
+]
+GPS_KEYWORD_MAX_LEN = max(len(p) for p in GPS_KEYWORD_PATTERNS)
+
+# Every keyword ends in '=', so a single regex that starts with a literal '='
+# lets the regex engine use its fast literal search and only then check which
+# keyword precedes it. Each lookbehind carries an empty group so lastindex
+# tells which keyword matched; GPS_KEYWORD_EQ_OFFSETS maps it back to the
+# keyword's first byte.
+GPS_KEYWORD_RE = re.compile(
+    b'=(?:' + b'|'.join(b'(?<=' + re.escape(p) + b')()' for p in GPS_KEYWORD_PATTERNS) + b')'
+)
+GPS_KEYWORD_EQ_OFFSETS = [None] + [len(p) - 1 for p in GPS_KEYWORD_PATTERNS]
+
+# Field specs for parse_gps_block: (field, preferred pattern, fallback alias).
+# Patterns are compiled once and run over the raw block bytes; the hex
+# fallback class lists the same characters r'[0-9A-Fa-f\s]' matches in
+# latin-1 decoded text so results are unchanged.
+HEX_SPACED = rb'([0-9A-Fa-f\t\n\x0b\x0c\r\x1c-\x1f \x85\xa0]{16,})'
+GPS_FIELD_SPECS = [
+    ('gps_tow', re.compile(rb'gps_tow=(\d+)'), re.compile(rb'tow=(\d+)')),
+    ('gps_week', re.compile(rb'gps_week=(\d+)'), re.compile(rb'week=(\d+)')),
+    ('utc_year', re.compile(rb'utc_year=(\d+)'), re.compile(rb'year=(\d{4})')),
+    ('utc_month', re.compile(rb'utc_month=(\d+)'), re.compile(rb'month=(\d+)')),
+    ('utc_day', re.compile(rb'utc_day=(\d+)'), re.compile(rb'day=(\d+)')),
+    ('utc_hour', re.compile(rb'utc_hour=(\d+)'), re.compile(rb'hour=(\d+)')),
+    ('utc_min', re.compile(rb'utc_min=(\d+)'), re.compile(rb'min=(\d+)')),
+    ('lat_hex', re.compile(rb'lat=([0-9A-Fa-f]{16})'), re.compile(rb'lat=' + HEX_SPACED)),
+    ('lon_hex', re.compile(rb'lon=([0-9A-Fa-f]{16})'), re.compile(rb'lon=' + HEX_SPACED)),
+]
+GPS_HEX_FIELDS = ('lat_hex', 'lon_hex')
+NON_HEX_RE = re.compile(rb'[^0-9A-Fa-f]')
+# Joins the words of a longer key name: 'gps_tow=' is not a 'tow=' field
+KEY_JOINER = ord('_')
+
+# Firmware variant auto-detection looks at this much of the start of an image
+VARIANT_SAMPLE_BYTES = 4 * 1024 * 1024
+# Share of all marker hits in the sample the detected variant must have, so
+# a few corrupted records (e.g. 'lon=zzweek=') do not outvote the rest
+VARIANT_MAJORITY = 0.9
+# Used when a variant is not given and detection finds none or several
+DEFAULT_VARIANT = 'generic'
+
+# Block clustering: keywords within BLOCK_CLUSTER_SPAN bytes of a block's first
+# keyword join that block, which extends BLOCK_KEYWORD_PAD bytes past its last
+# keyword and is padded by BLOCK_EDGE_PAD bytes on both sides
+BLOCK_CLUSTER_SPAN = 1000
+BLOCK_KEYWORD_PAD = 200
+BLOCK_EDGE_PAD = 50
+
+# Record segmentation: a record starts at RECORD_ANCHOR (or the firmware
+# variant's record_anchor) and ends at the next anchor, but never spans more
+# than RECORD_MAX_BYTES
+RECORD_ANCHOR = b'gps_tow='
+RECORD_MAX_BYTES = 1024
+
+# Read size for the streaming scanner; peak memory is a small multiple of this
+STREAM_CHUNK_SIZE = 8 * 1024 * 1024
+
+# GPS time: milliseconds from the Unix epoch to the GPS epoch (1980-01-06)
+GPS_EPOCH_MS = 315964800000
+GPS_WEEK_MS = 604800000
+MAX_GPS_WEEK = 4000
+# GPS time runs ahead of UTC by the leap seconds since 1980: (UTC date the
+# offset took effect, GPS - UTC seconds from then on)
+LEAP_SECONDS = [
+    ((1981, 7, 1), 1), ((1982, 7, 1), 2), ((1983, 7, 1), 3), ((1985, 7, 1), 4), ((1988, 1, 1), 5),
+    ((1990, 1, 1), 6), ((1991, 1, 1), 7), ((1992, 7, 1), 8), ((1993, 7, 1), 9), ((1994, 7, 1), 10),
+    ((1996, 1, 1), 11), ((1997, 7, 1), 12), ((1999, 1, 1), 13), ((2006, 1, 1), 14), ((2009, 1, 1), 15),
+    ((2012, 7, 1), 16), ((2015, 7, 1), 17), ((2017, 1, 1), 18),
+]
+DAY_MS = 86400000
+# Fixes before 2010-01-01 are labelled as date errors in the output
+MIN_VALID_TIMESTAMP_MS = 1262304000000
+UNIX_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+COORD_STRUCT = struct.Struct('<d')
+
+# Intra-file parallel mode: shards per worker (for load balancing) and the
+# smallest shard worth handing to a process
+SHARDS_PER_WORKER = 4
+MIN_SHARD_BYTES = 16 * 1024 * 1024
+# How far past a cluster-mode shard boundary to look for a sync point before
+# merging the shard into the one in front of it
+SHARD_SYNC_SEARCH_BYTES = 1024 * 1024
+
+# Pipelined decoding: chunks of STREAM_CHUNK_SIZE read ahead of the scanner,
+# and batches of fixes (of PIPELINE_WRITE_BATCH) queued for the writer thread
+PIPELINE_READ_AHEAD = 4
+PIPELINE_WRITE_BATCH = 1024
+PIPELINE_WRITE_DEPTH = 8
+
+# At most 20 progress updates per second reach the GUI or console
+PROGRESS_MIN_INTERVAL = 0.05
+
+# Segments decoded per NumPy batch by the 'numpy' engine
+NUMPY_BATCH_SIZE = 65536
+
+# Excel's per-sheet row limit, header row included
+XLSX_MAX_ROWS = 1048576
+XLSX_HEADERS = ['lat', 'long', 'utc_year', 'utc_month', 'utc_day', 'utc_hour', 'utc_min',
+                'timestamp_time', '', '', '', '', '', '', 'lat_hex', 'lon_hex']
+UTC_FIELDS = ('utc_year', 'utc_month', 'utc_day', 'utc_hour', 'utc_min')
+# Column layout of the machine-readable sinks (CSV, NDJSON, SQLite)
+RECORD_FIELDS = ['lat', 'long', 'utc_year', 'utc_month', 'utc_day', 'utc_hour', 'utc_min',
+                 'timestamp_time', 'lat_hex', 'lon_hex', 'gps_week', 'gps_tow', 'offset']
+# Rows per executemany batch in the SQLite sink
+SQLITE_BATCH_SIZE = 10000
+
+# Result cache: bump DECODER_VERSION whenever a change alters the decoded
+# fixes, so cached results from older decoders are not reused
+DECODER_VERSION = 4
+CACHE_MAGIC = b'ONSTARFX'
+CACHE_FORMAT_VERSION = 2
+# Entry header after the magic: format version, segments, parsed fixes and
+# the fixes rejected as bad_lat, bad_lon and missing_time
+CACHE_HEADER = struct.Struct('<Iqqqqq')
+# Valid fixes per frame of a cache entry; one frame is held in memory at a time
+CACHE_FRAME_FIXES = 65536
+CACHE_MAX_BYTES = 2 * 1024 * 1024 * 1024
+CACHE_SAMPLE_BYTES = 64 * 1024
+CACHE_SAMPLE_COUNT = 16
+CACHE_EDGE_BYTES = 1024 * 1024
+
+# Output path that streams a text format to standard output
+STDOUT_PATH = '-'
+
+# Decode service (--serve): localhost API port, watch folder poll interval,
+# and how many finished jobs it remembers
+SERVICE_PORT = 8765
+SERVICE_WATCH_INTERVAL = 2.0
+SERVICE_MAX_FINISHED_JOBS = 10000
+
+# Resumable runs: a JSON checkpoint next to the output, saved at most every
+# CHECKPOINT_INTERVAL seconds; the bytes hashed to recognise the image again
+CHECKPOINT_SUFFIX = '.checkpoint.json'
+CHECKPOINT_FORMAT_VERSION = 1
+CHECKPOINT_INTERVAL = 30.0
+CHECKPOINT_FINGERPRINT_BYTES = 64 * 1024
+CHECKPOINT_CANDIDATES = 64
+CHECKPOINT_DEDUP_SUFFIX = '.checkpoint.dedup'
+
+# De-duplication table: slots are allocated in powers of two, kept at most half full
+DEDUP_INITIAL_SLOTS = 1 << 16
+DEDUP_MAX_KEYS = 1 << 22
+
+# Trips: a new trip starts after a gap of more than TRIP_MAX_GAP_SECONDS or a
+# jump of more than TRIP_MAX_JUMP_METERS between fixes; tracks are simplified
+# to within TRIP_TOLERANCE_METERS, TRIP_WINDOW_FIXES fixes at a time
+TRIP_MAX_GAP_SECONDS = 300
+TRIP_MAX_JUMP_METERS = 5000
+TRIP_TOLERANCE_METERS = 10.0
+TRIP_WINDOW_FIXES = 4096
+EARTH_RADIUS_M = 6371008.8
+
+
+class KeyMarker:
+    """Variant marker: the keys that identify a firmware variant in a sample
+
+    count() returns how often the keys occur in data, found() whether any
+    does. Occurrences are counted with bytes.count, which is far faster on
+    a multi-MB sample than a regex.
+    """
+
+    def __init__(self, *keys):
+        self.keys = keys
+
+    def count(self, data):
+        return sum(data.count(key) for key in self.keys)
+
+    def found(self, data):
+        return self.count(data) > 0
+
+
+class BareKeyMarker(KeyMarker):
+    """KeyMarker for keys that must not be the tail of a longer key name
+
+    Occurrences that follow KEY_JOINER are not counted: b'tow=' but not
+    inside b'gps_tow='.
+    """
+
+    def count(self, data):
+        joiner = bytes([KEY_JOINER])
+        return sum(data.count(key) - data.count(joiner + key) for key in self.keys)
+
+
+class FirmwareVariant:
+    """The GPS field layout written by one family of OnStar firmware
+
+    specs are (field, pattern, fallback) tuples like GPS_FIELD_SPECS, with
+    a fallback of None for fields the variant spells only one way. markers
+    is a KeyMarker counting the keys that identify the variant in a sample
+    (see OnStarDecoder.detect_variant). A variant without markers is only
+    used by name or as DEFAULT_VARIANT.
+    record_anchor is the key that starts each record for record
+    segmentation.
+    """
+
+    def __init__(self, name, description, specs, markers=None, record_anchor=RECORD_ANCHOR):
+        self.name = name
+        self.description = description
+        self.specs = specs
+        self.markers = markers
+        self.record_anchor = record_anchor
+
+    def __repr__(self):
+        return f"FirmwareVariant({self.name!r})"
+
+
+# Lat/lon hex is the same in every variant; the spaced fallback tolerates
+# values wrapped or padded in the log dump, not another firmware spelling
+GPS_HEX_SPECS = GPS_FIELD_SPECS[-2:]
+UTC_FIELD_SPECS = [(field, re.compile(field.encode() + rb'=(\d+)'), None) for field in UTC_FIELDS]
+
+# Firmware variants by name. 'gen11' logs gps_tow=/gps_week=, 'gen10' bare
+# tow=/week=, both with utc_*= time fields; 'generic' tries every alias of
+# every field, as all images were decoded before variants were detected.
+FIRMWARE_VARIANTS = {
+    'gen11': FirmwareVariant(
+        'gen11', 'Gen11 (gps_tow=/gps_week=)',
+        [('gps_tow', re.compile(rb'gps_tow=(\d+)'), None),
+         ('gps_week', re.compile(rb'gps_week=(\d+)'), None)] + UTC_FIELD_SPECS + GPS_HEX_SPECS,
+        KeyMarker(b'gps_tow=', b'gps_week=')),
+    'gen10': FirmwareVariant(
+        'gen10', 'Gen10 (tow=/week=)',
+        [('gps_tow', re.compile(rb'tow=(\d+)'), None),
+         ('gps_week', re.compile(rb'week=(\d+)'), None)] + UTC_FIELD_SPECS + GPS_HEX_SPECS,
+        BareKeyMarker(b'tow=', b'week='), record_anchor=b'tow='),
+    'generic': FirmwareVariant('generic', 'generic (all field aliases)', GPS_FIELD_SPECS),
+}
+
+
+class GpsTimeConverter:
+    """GPS week/time-of-week to UTC conversion and fast timestamp formatting
+
+    Each GPS week's base offset (GPS epoch + week, minus the leap seconds in
+    force) is worked out once and memoized, along with the time of week at
+    which a leap second inside that week takes effect. Formatting splits
+    milliseconds with integer arithmetic and memoizes the 'YYYY-MM-DD '
+    prefix per day instead of going through datetime and strftime. Pass
+    an updated table as leap_seconds if another leap second is announced.
+    """
+    MAX_MEMO_DAYS = 100000
+
+    def __init__(self, leap_seconds=LEAP_SECONDS):
+        # Leap offsets on the GPS time scale: the offset applies from GPS ms (UTC date + offset) on
+        self.leap_starts = [(datetime(*date, tzinfo=timezone.utc) - UNIX_EPOCH) // timedelta(milliseconds=1)
+                            + offset * 1000 for date, offset in leap_seconds]
+        self.leap_offsets = [offset * 1000 for _, offset in leap_seconds]
+        self._weeks = {}
+        self._days = {}
+        self._clock = [f"{hour:02d}:{minute:02d}:" for hour in range(24) for minute in range(60)]
+        self._seconds = [f"{second:02d}." for second in range(61)]
+        self._millis = [f"{ms:03d}" for ms in range(1000)]
+
+    def leap_ms_at(self, gps_ms):
+        """Return GPS - UTC in ms at a time given on the GPS scale (ms since the Unix epoch)"""
+        offset = 0
+        for start, leap in zip(self.leap_starts, self.leap_offsets):
+            if gps_ms < start:
+                break
+            offset = leap
+        return offset
+
+    def _week(self, gps_week):
+        start = GPS_EPOCH_MS + gps_week * GPS_WEEK_MS
+        leap = self.leap_ms_at(start)
+        step_tow, step = None, 0
+        for leap_start, offset in zip(self.leap_starts, self.leap_offsets):
+            if start < leap_start <= start + GPS_WEEK_MS:
+                step_tow, step = leap_start - start, offset - leap
+        memo = self._weeks[gps_week] = (start - leap, step_tow, step)
+        return memo
+
+    def to_unix_ms(self, gps_week, gps_tow):
+        """Return UTC Unix milliseconds for a GPS week and time of week in ms, or None when out of range"""
+        if gps_week is None or gps_tow is None:
+            return None
+        if not (0 <= gps_tow <= GPS_WEEK_MS and 0 <= gps_week <= MAX_GPS_WEEK):
+            return None
+        base, step_tow, step = self._weeks.get(gps_week) or self._week(gps_week)
+        if step_tow is not None and gps_tow >= step_tow:
+            return base + gps_tow - step
+        return base + gps_tow
+
+    def to_unix_ms_batch(self, gps_weeks, gps_tows):
+        """to_unix_ms over two sequences, returning a list with None where a pair is out of range"""
+        return [self.to_unix_ms(week, tow) for week, tow in zip(gps_weeks, gps_tows)]
+
+    def to_unix_ms_array(self, gps_weeks, gps_tows):
+        """Vectorised to_unix_ms for int64 NumPy arrays; range checks are left to the caller"""
+        gps_ms = GPS_EPOCH_MS + gps_weeks * GPS_WEEK_MS + gps_tows
+        leaps = np.array([0] + self.leap_offsets, dtype=np.int64)
+        return gps_ms - leaps[np.searchsorted(np.array(self.leap_starts, dtype=np.int64), gps_ms, side='right')]
+
+    def format_ms(self, timestamp_ms):
+        """Format Unix milliseconds as 'YYYY-MM-DD HH:MM:SS.mmm' UTC"""
+        days, ms = divmod(timestamp_ms, DAY_MS)
+        prefix = self._days.get(days)
+        if prefix is None:
+            prefix = self._day_prefix(days)
+        seconds, millis = divmod(ms, 1000)
+        minutes, second = divmod(seconds, 60)
+        return prefix + self._clock[minutes] + self._seconds[second] + self._millis[millis]
+
+    def format_ms_batch(self, timestamps):
+        """format_ms over a sequence, passing None through"""
+        format_ms = self.format_ms
+        return [None if value is None else format_ms(value) for value in timestamps]
+
+    def _day_prefix(self, days):
+        # Civil date from days since 1970-01-01 (proleptic Gregorian, H. Hinnant's algorithm)
+        z = days + 719468
+        era = z // 146097
+        doe = z - era * 146097
+        yoe = (doe - doe // 1460 + doe // 36524 - doe // 146096) // 365
+        doy = doe - (365 * yoe + yoe // 4 - yoe // 100)
+        mp = (5 * doy + 2) // 153
+        day = doy - (153 * mp + 2) // 5 + 1
+        month = mp + 3 if mp < 10 else mp - 9
+        year = yoe + era * 400 + (month <= 2)
+        if len(self._days) >= self.MAX_MEMO_DAYS:
+            self._days.clear()
+        prefix = self._days[days] = f"{year:04d}-{month:02d}-{day:02d} "
+        return prefix
+
+
+# Shared converter behind gps_time_to_ms and format_timestamp_ms
+GPS_TIME = GpsTimeConverter()
+
+
+def format_timestamp_ms(timestamp_ms):
+    """Format milliseconds since the Unix epoch as 'YYYY-MM-DD HH:MM:SS.mmm' UTC"""
+    return GPS_TIME.format_ms(timestamp_ms)
+
+
+def format_iso_timestamp_ms(timestamp_ms):
+    """Format milliseconds since the Unix epoch as ISO 8601 UTC ('...T...Z')"""
+    return format_timestamp_ms(timestamp_ms).replace(' ', 'T') + 'Z'
+
+
+def parse_timestamp_ms(text):
+    """Parse 'YYYY-MM-DD[ HH:MM[:SS[.mmm]]]' or ISO 8601 (UTC unless an offset is given) to Unix milliseconds"""
+    moment = datetime.fromisoformat(text.strip().replace('Z', '+00:00'))
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return (moment - UNIX_EPOCH) // timedelta(milliseconds=1)
+
+
+def gps_time_to_ms(gps_week, gps_tow):
+    """Return UTC Unix milliseconds for a GPS week and time of week in ms, or None when either is out of range"""
+    return GPS_TIME.to_unix_ms(gps_week, gps_tow)
+
+
+class GpsFix:
+    """A decoded GPS fix; None marks a field that is missing or failed to decode"""
+    __slots__ = ('lat', 'lon', 'utc_year', 'utc_month', 'utc_day', 'utc_hour', 'utc_min',
+                 'timestamp_ms', 'lat_hex', 'lon_hex', 'gps_week', 'gps_tow', 'offset')
+
+    def __init__(self, lat=None, lon=None, utc_year=None, utc_month=None, utc_day=None,
+                 utc_hour=None, utc_min=None, timestamp_ms=None, lat_hex=None, lon_hex=None,
+                 gps_week=None, gps_tow=None, offset=None):
+        self.lat = lat
+        self.lon = lon
+        self.utc_year = utc_year
+        self.utc_month = utc_month
+        self.utc_day = utc_day
+        self.utc_hour = utc_hour
+        self.utc_min = utc_min
+        self.timestamp_ms = timestamp_ms
+        self.lat_hex = lat_hex
+        self.lon_hex = lon_hex
+        self.gps_week = gps_week
+        self.gps_tow = gps_tow
+        self.offset = offset
+
+    def __eq__(self, other):
+        if not isinstance(other, GpsFix):
+            return NotImplemented
+        return all(getattr(self, name) == getattr(other, name) for name in self.__slots__)
+
+    def __repr__(self):
+        fields = ', '.join(f"{name}={getattr(self, name)!r}" for name in self.__slots__)
+        return f"GpsFix({fields})"
+
+    @property
+    def timestamp_time(self):
+        """The GPS time as text, or the 'ERROR' labels the output has always used"""
+        if self.timestamp_ms is None:
+            return 'ERROR'
+        if self.timestamp_ms < MIN_VALID_TIMESTAMP_MS:
+            return 'DATE BEFORE 2010 ERROR'
+        return format_timestamp_ms(self.timestamp_ms)
+
+    def to_row(self):
+        """Return the XLSX row for this fix"""
+        return [
+            self.lat if self.lat is not None else 'ERROR',
+            self.lon if self.lon is not None else 'ERROR',
+            self.utc_year if self.utc_year else 'ERROR',
+            self.utc_month if self.utc_month else 'ERROR',
+            self.utc_day if self.utc_day else 'ERROR',
+            self.utc_hour if self.utc_hour else 'ERROR',
+            self.utc_min if self.utc_min else 'ERROR',
+            self.timestamp_time,
+            '', '', '', '', '', '',  # Six blank columns
+            self.lat_hex or '',
+            self.lon_hex or ''
+        ]
+
+    @property
+    def has_valid_time(self):
+        """True when the GPS time decoded to a date from 2010 on"""
+        return self.timestamp_ms is not None and self.timestamp_ms >= MIN_VALID_TIMESTAMP_MS
+
+    def to_record(self):
+        """Return the fix as a RECORD_FIELDS list, with None for missing values"""
+        return [
+            self.lat, self.lon,
+            self.utc_year, self.utc_month, self.utc_day, self.utc_hour, self.utc_min,
+            format_timestamp_ms(self.timestamp_ms) if self.has_valid_time else None,
+            self.lat_hex, self.lon_hex,
+            self.gps_week, self.gps_tow, self.offset
+        ]
+
+    @classmethod
+    def from_record(cls, record):
+        """Rebuild a fix from a RECORD_FIELDS row (e.g. read back from the SQLite store)"""
+        (lat, lon, utc_year, utc_month, utc_day, utc_hour, utc_min, _, lat_hex, lon_hex,
+         gps_week, gps_tow, offset) = record
+        return cls(lat, lon, utc_year, utc_month, utc_day, utc_hour, utc_min, gps_time_to_ms(gps_week, gps_tow),
+                   lat_hex, lon_hex, gps_week, gps_tow, offset)
+
+    def as_dict(self):
+        """Return the fix in the dict layout parse_gps_block used to return"""
+        entry = {
+            'lat': self.lat if self.lat is not None else 'ERROR',
+            'long': self.lon if self.lon is not None else 'ERROR',
+        }
+        for name in UTC_FIELDS:
+            value = getattr(self, name)
+            entry[name] = value if value is not None else ''
+        entry['timestamp_time'] = self.timestamp_time
+        entry['lat_hex'] = self.lat_hex or ''
+        entry['lon_hex'] = self.lon_hex or ''
+        return entry
+
+
+class GpsFixColumns:
+    """Columnar store for many fixes backed by typed arrays
+
+    Each column has a validity mask (1 = value present) in place of the old
+    'ERROR'/'' sentinel strings. Integers too wide for their column are kept
+    in a small overflow dict so nothing read from the image is lost.
+    Indexing and iterating return GpsFix objects.
+    """
+    NUMERIC_COLUMNS = (
+        ('lat', 'd'), ('lon', 'd'),
+        ('utc_year', 'q'), ('utc_month', 'q'), ('utc_day', 'q'), ('utc_hour', 'q'), ('utc_min', 'q'),
+        ('timestamp_ms', 'q'), ('gps_week', 'i'), ('gps_tow', 'I'), ('offset', 'q'),
+    )
+    HEX_COLUMNS = ('lat_hex', 'lon_hex')
+
+    def __init__(self, fixes=()):
+        self.columns = {name: array(code) for name, code in self.NUMERIC_COLUMNS}
+        self.hex_columns = {name: bytearray() for name in self.HEX_COLUMNS}
+        self.masks = {name: bytearray() for name in GpsFix.__slots__}
+        self.overflow = {}
+        self.count = 0
+        self.extend(fixes)
+
+    def __len__(self):
+        return self.count
+
+    def __iter__(self):
+        # Rebuilt column-wise a chunk at a time, which is several times faster than row-wise __getitem__
+        for start in range(0, self.count, NUMPY_BATCH_SIZE):
+            stop = min(start + NUMPY_BATCH_SIZE, self.count)
+            values = []
+            for name in GpsFix.__slots__:
+                mask = self.masks[name][start:stop]
+                if name in self.hex_columns:
+                    text = self.hex_columns[name][start * 16:stop * 16].decode('ascii')
+                    column = [text[i:i + 16] for i in range(0, len(text), 16)]
+                else:
+                    column = self.columns[name][start:stop]
+                values.append([value if present else None for value, present in zip(column, mask)])
+            for (name, row), value in self.overflow.items():
+                if start <= row < stop:
+                    values[GpsFix.__slots__.index(name)][row - start] = value
+            for fields in zip(*values):
+                yield GpsFix(*fields)
+
+    def append(self, fix):
+        row = self.count
+        for name, _ in self.NUMERIC_COLUMNS:
+            value = getattr(fix, name)
+            column = self.columns[name]
+            if value is None:
+                column.append(0)
+                self.masks[name].append(0)
+                continue
+            try:
+                column.append(value)
+            except OverflowError:
+                column.append(0)
+                self.overflow[(name, row)] = value
+            self.masks[name].append(1)
+        for name in self.HEX_COLUMNS:
+            value = getattr(fix, name)
+            if value:
+                self.hex_columns[name] += value.encode('ascii')
+                self.masks[name].append(1)
+            else:
+                self.hex_columns[name] += bytes(16)
+                self.masks[name].append(0)
+        self.count += 1
+
+    def extend(self, fixes):
+        for fix in fixes:
+            self.append(fix)
+
+    def to_bytes(self):
+        """Serialize to a compact binary form: a JSON header followed by the raw column buffers"""
+        buffers = [self.columns[name].tobytes() for name, _ in self.NUMERIC_COLUMNS]
+        buffers += [bytes(self.hex_columns[name]) for name in self.HEX_COLUMNS]
+        buffers += [bytes(self.masks[name]) for name in GpsFix.__slots__]
+        header = json.dumps({
+            'count': self.count,
+            'byteorder': sys.byteorder,
+            'lengths': [len(buffer) for buffer in buffers],
+            'overflow': [[name, row, value] for (name, row), value in self.overflow.items()],
+        }).encode('utf-8')
+        return struct.pack('<I', len(header)) + header + b''.join(buffers)
+
+    @classmethod
+    def from_bytes(cls, data):
+        """Rebuild a store written by to_bytes(); raises ValueError if it does not fit this platform"""
+        data = memoryview(data)
+        header_length, = struct.unpack_from('<I', data)
+        header = json.loads(bytes(data[4:4 + header_length]))
+        if header['byteorder'] != sys.byteorder:
+            raise ValueError("Fixes were stored with a different byte order")
+        names = ([name for name, _ in cls.NUMERIC_COLUMNS] + list(cls.HEX_COLUMNS)
+                 + ['mask:' + name for name in GpsFix.__slots__])
+        if len(header['lengths']) != len(names):
+            raise ValueError("Fixes were stored with a different column layout")
+        store = cls()
+        pos = 4 + header_length
+        for name, length in zip(names, header['lengths']):
+            chunk = data[pos:pos + length]
+            pos += length
+            if name.startswith('mask:'):
+                store.masks[name[5:]] = bytearray(chunk)
+            elif name in store.hex_columns:
+                store.hex_columns[name] = bytearray(chunk)
+            else:
+                store.columns[name].frombytes(chunk)
+        store.overflow = {(name, row): value for name, row, value in header['overflow']}
+        store.count = header['count']
+        return store
+
+    def __getitem__(self, row):
+        if row < 0:
+            row += self.count
+        if not 0 <= row < self.count:
+            raise IndexError("fix index out of range")
+        fix = GpsFix()
+        for name, _ in self.NUMERIC_COLUMNS:
+            if self.masks[name][row]:
+                setattr(fix, name, self.overflow.get((name, row), self.columns[name][row]))
+        for name in self.HEX_COLUMNS:
+            if self.masks[name][row]:
+                setattr(fix, name, self.hex_columns[name][row * 16:row * 16 + 16].decode('ascii'))
+        return fix
+
+
+class ResultCache:
+    """On-disk cache of decoded fixes, so a repeat export skips scanning and parsing
+
+    Entries are keyed by the file's size, mtime and a hash of sampled
+    content (its first and last CACHE_EDGE_BYTES plus CACHE_SAMPLE_COUNT
+    evenly spaced CACHE_SAMPLE_BYTES windows), the segmentation mode and
+    DECODER_VERSION. An entry holds the valid fixes in frames of
+    CACHE_FRAME_FIXES (GpsFixColumns.to_bytes() form) plus the segment and
+    rejection counts, so stats still add up. It is written by a CacheSpool
+    while the decode runs and replayed a frame at a time (CacheEntry), so
+    neither side holds more than one frame. Reads refresh an entry's mtime
+    and writes evict the least recently used entries beyond max_bytes.
+    The default directory is $ONSTAR_CACHE_DIR, else %LOCALAPPDATA%\\onstar_gen11\\cache or ~/.cache/onstar_gen11.
+    """
+    extension = '.fixes'
+
+    def __init__(self, directory=None, max_bytes=CACHE_MAX_BYTES):
+        self.directory = directory or self.default_directory()
+        self.max_bytes = max_bytes
+
+    @staticmethod
+    def default_directory():
+        if os.environ.get('ONSTAR_CACHE_DIR'):
+            return os.environ['ONSTAR_CACHE_DIR']
+        if os.name == 'nt' and os.environ.get('LOCALAPPDATA'):
+            return os.path.join(os.environ['LOCALAPPDATA'], 'onstar_gen11', 'cache')
+        base = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+        return os.path.join(base, 'onstar_gen11')
+
+    def key_for(self, file_path, segmentation='cluster', variant=DEFAULT_VARIANT):
+        """Return the cache key for a file as it is now, decoded with the named FirmwareVariant"""
+        info = os.stat(file_path)
+        digest = hashlib.blake2b(digest_size=16)
+        digest.update(f"{info.st_size}:{info.st_mtime_ns}:{segmentation}:{variant}:{DECODER_VERSION}".encode())
+        with open(file_path, 'rb') as f:
+            if info.st_size <= 2 * CACHE_EDGE_BYTES + CACHE_SAMPLE_COUNT * CACHE_SAMPLE_BYTES:
+                digest.update(f.read())
+            else:
+                step = (info.st_size - 2 * CACHE_EDGE_BYTES) // (CACHE_SAMPLE_COUNT + 1)
+                spans = [(0, CACHE_EDGE_BYTES)]
+                spans += [(CACHE_EDGE_BYTES + step * i, CACHE_SAMPLE_BYTES) for i in range(1, CACHE_SAMPLE_COUNT + 1)]
+                spans.append((info.st_size - CACHE_EDGE_BYTES, CACHE_EDGE_BYTES))
+                for start, length in spans:
+                    f.seek(start)
+                    digest.update(f.read(length))
+        return digest.hexdigest()
+
+    def path_for(self, key):
+        return os.path.join(self.directory, key + self.extension)
+
+    def load(self, key):
+        """Return the CacheEntry for a key, or None on a miss"""
+        path = self.path_for(key)
+        try:
+            with open(path, 'rb') as f:
+                head = f.read(len(CACHE_MAGIC) + CACHE_HEADER.size)
+                if head[:len(CACHE_MAGIC)] != CACHE_MAGIC:
+                    return None
+                version, segments, parsed, *rejected = CACHE_HEADER.unpack_from(head, len(CACHE_MAGIC))
+                if version != CACHE_FORMAT_VERSION:
+                    return None
+                # Walk the frame lengths so a truncated entry is a miss, not a failure half way through
+                frames = []
+                pos = len(head)
+                size = os.fstat(f.fileno()).st_size
+                while pos < size:
+                    f.seek(pos)
+                    length, = struct.unpack('<I', f.read(4))
+                    frames.append((pos + 4, length))
+                    pos += 4 + length
+                if pos != size:
+                    return None
+                if frames:
+                    # Frames from another platform would only fail half way through the replay
+                    f.seek(frames[0][0])
+                    header_length, = struct.unpack('<I', f.read(4))
+                    if json.loads(f.read(header_length))['byteorder'] != sys.byteorder:
+                        return None
+            os.utime(path)  # mark as recently used
+        except (OSError, ValueError, KeyError, struct.error):
+            return None
+        return CacheEntry(path, segments, parsed, dict(zip(DecodeStats.REJECT_REASONS, rejected)), frames)
+
+    def spool(self, key):
+        """Return a CacheSpool that writes the entry for key, or None if the cache cannot be written"""
+        try:
+            return CacheSpool(self, key)
+        except OSError:
+            return None
+
+    def evict(self):
+        """Delete least recently used entries until the cache fits in max_bytes"""
+        entries = []
+        for name in os.listdir(self.directory):
+            if not name.endswith(self.extension):
+                continue
+            try:
+                info = os.stat(os.path.join(self.directory, name))
+            except FileNotFoundError:
+                continue
+            entries.append((info.st_mtime, info.st_size, name))
+        total = sum(size for _, size, _ in entries)
+        for _, size, name in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(os.path.join(self.directory, name))
+            except FileNotFoundError:
+                pass
+            total -= size
+
+    def clear(self):
+        """Delete every cache entry"""
+        if os.path.isdir(self.directory):
+            for name in os.listdir(self.directory):
+                if name.endswith(self.extension):
+                    os.remove(os.path.join(self.directory, name))
+
+
+class CacheEntry:
+    """A ResultCache entry: its counts, and its valid fixes read back one frame at a time"""
+
+    def __init__(self, path, segments, parsed, rejected, frames):
+        self.path = path
+        self.segments = segments
+        self.parsed = parsed
+        self.rejected = rejected
+        self.frames = frames
+
+    def __iter__(self):
+        with open(self.path, 'rb') as f:
+            for offset, length in self.frames:
+                f.seek(offset)
+                yield from GpsFixColumns.from_bytes(f.read(length))
+
+
+class CacheSpool:
+    """Write one ResultCache entry while a decode runs
+
+    add() takes the valid fixes and writes them to a temporary file a
+    frame at a time; once the entry would pass the cache's max_bytes the
+    spool gives up and the decode carries on uncached. The counts are
+    filled in by the caller; commit() writes them and moves the entry into
+    place, discard() drops it.
+    """
+
+    def __init__(self, cache, key):
+        self.cache = cache
+        self.path = cache.path_for(key)
+        self.temp_path = f"{self.path}.{os.getpid()}.{id(self)}.tmp"
+        self.segments = 0
+        self.parsed = 0
+        self.rejected = dict.fromkeys(DecodeStats.REJECT_REASONS, 0)
+        self.frame = GpsFixColumns()
+        os.makedirs(cache.directory, exist_ok=True)
+        self.file = open(self.temp_path, 'wb')
+        self.file.write(CACHE_MAGIC + bytes(CACHE_HEADER.size))
+        self.size = len(CACHE_MAGIC) + CACHE_HEADER.size
+
+    def add(self, fix):
+        if self.file is None:
+            return
+        self.frame.append(fix)
+        if len(self.frame) >= CACHE_FRAME_FIXES:
+            self._flush()
+
+    def _flush(self):
+        data = self.frame.to_bytes()
+        self.frame = GpsFixColumns()
+        if self.size + 4 + len(data) > self.cache.max_bytes:
+            self.discard()  # too big to keep: evicting everything else for it would not help
+            return
+        self.file.write(struct.pack('<I', len(data)) + data)
+        self.size += 4 + len(data)
+
+    def commit(self):
+        """Store the entry, then evict old entries beyond max_bytes; returns whether it was stored"""
+        if self.file is not None and len(self.frame):
+            self._flush()
+        if self.file is None:
+            return False
+        try:
+            self.file.seek(len(CACHE_MAGIC))
+            self.file.write(CACHE_HEADER.pack(CACHE_FORMAT_VERSION, self.segments, self.parsed,
+                                              *(self.rejected[reason] for reason in DecodeStats.REJECT_REASONS)))
+            self.file.close()
+            self.file = None
+            os.replace(self.temp_path, self.path)
+        except OSError:
+            self.discard()
+            return False
+        self.cache.evict()
+        return True
+
+    def discard(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+        try:
+            os.remove(self.temp_path)
+        except OSError:
+            pass
+
+
+class Checkpoint:
+    """Resume point of a decode into one output, kept as a JSON sidecar next to it
+
+    offset is where a block starts: its first keyword, or its anchor in
+    record mode. A cluster covers the keywords within BLOCK_CLUSTER_SPAN
+    bytes of its first one, so a scan from there (see
+    OnStarDecoder.iter_fixes_from) finds the same blocks as one from byte
+    0, even on a dense image with no sync points. Blocks before it are
+    final even if the image grows later, and their rows are the first rows
+    of the output. Resuming truncates the output to rows and scans from
+    offset, which continues an interrupted run, or scans only the tail of
+    an image that grew since the last run. The image is recognised by a
+    hash of its first bytes and of the bytes just before offset. A
+    FixDeduplicator passed as dedup is saved with the checkpoint and
+    restored on resume. variant is the name of the FirmwareVariant the
+    output was decoded with.
+    """
+
+    def __init__(self, output_path, segmentation='cluster', output_format=None, dedup=None,
+                 variant=DEFAULT_VARIANT):
+        self.path = output_path + CHECKPOINT_SUFFIX
+        self.dedup_path = output_path + CHECKPOINT_DEDUP_SUFFIX
+        self.segmentation = segmentation
+        self.output_format = output_format
+        self.dedup = dedup
+        self.variant = variant
+        self.offset = 0
+        self.rows = 0
+        self.fingerprint = None
+        self.complete = False
+
+    @classmethod
+    def resume(cls, file_path, output_path, segmentation='cluster', output_format=None, dedup=None,
+               variant=DEFAULT_VARIANT):
+        """Load the checkpoint of output_path if it continues a decode of file_path, else return a fresh one"""
+        checkpoint = cls(output_path, segmentation, output_format, dedup, variant)
+        try:
+            with open(checkpoint.path, encoding='utf-8') as f:
+                saved = json.load(f)
+            if (saved['version'] != CHECKPOINT_FORMAT_VERSION or saved['decoder_version'] != DECODER_VERSION
+                    or saved['segmentation'] != segmentation or saved['output_format'] != output_format
+                    or saved['dedup'] != (dedup.keep if dedup is not None else None)
+                    or saved['variant'] != variant
+                    or not os.path.exists(output_path)):
+                return checkpoint
+            with open(file_path, 'rb') as f:
+                if saved['offset'] > os.fstat(f.fileno()).st_size:
+                    return checkpoint
+                if cls.fingerprint_at(f, saved['offset']) != saved['fingerprint']:
+                    return checkpoint
+            if dedup is not None:
+                with open(checkpoint.dedup_path, 'rb') as f:
+                    dedup.load_bytes(f.read())
+        except (OSError, ValueError, KeyError, TypeError, struct.error):
+            return checkpoint
+        checkpoint.offset = saved['offset']
+        checkpoint.rows = saved['rows']
+        checkpoint.fingerprint = saved['fingerprint']
+        return checkpoint
+
+    @staticmethod
+    def fingerprint_at(f, offset):
+        """Hash the start of a binary file and the bytes before offset"""
+        digest = hashlib.blake2b(digest_size=16)
+        f.seek(0)
+        digest.update(f.read(min(offset, CHECKPOINT_FINGERPRINT_BYTES)))
+        f.seek(max(0, offset - CHECKPOINT_FINGERPRINT_BYTES))
+        digest.update(f.read(offset - f.tell()))
+        return digest.hexdigest()
+
+    def advance(self, f, offset, rows):
+        """Move the checkpoint to a block start in the open image f with rows output before it"""
+        self.fingerprint = self.fingerprint_at(f, offset)
+        self.offset = offset
+        self.rows = rows
+
+    def save(self):
+        state = {
+            'version': CHECKPOINT_FORMAT_VERSION,
+            'decoder_version': DECODER_VERSION,
+            'segmentation': self.segmentation,
+            'output_format': self.output_format,
+            'offset': self.offset,
+            'rows': self.rows,
+            'fingerprint': self.fingerprint,
+            'complete': self.complete,
+            'dedup': self.dedup.keep if self.dedup is not None else None,
+            'variant': self.variant,
+        }
+        if self.dedup is not None:
+            # Saved first: a table newer than the checkpoint is harmless, an older one is not
+            temp_path = f"{self.dedup_path}.{os.getpid()}.tmp"
+            with open(temp_path, 'wb') as f:
+                f.write(self.dedup.to_bytes())
+            os.replace(temp_path, self.dedup_path)
+        temp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(state, f, indent=2)
+        os.replace(temp_path, self.path)
+
+    def remove(self):
+        for path in (self.path, self.dedup_path):
+            if os.path.exists(path):
+                os.remove(path)
+
+
+class FixDeduplicator:
+    """Streaming filter for repeated copies of the same fix (flash wear levelling)
+
+    A fix's key is (gps_week, gps_tow, lat_hex, lon_hex), held as a 64-bit
+    BLAKE2 fingerprint in an open-addressing table of typed arrays next to
+    the offset of its first copy (16 bytes per slot). A fix is a duplicate
+    when its key was first seen at a smaller offset, so scanning part of an
+    image again (a resumed run) finds the same first copies. The table
+    grows up to max_keys keys and then starts over, which bounds memory at
+    the cost of keeping copies that are more than max_keys distinct fixes
+    apart. keep='first' only counts removed copies; keep='offsets' also
+    records their offsets per first offset in duplicate_offsets.
+    """
+
+    def __init__(self, keep='first', max_keys=DEDUP_MAX_KEYS):
+        if keep not in ('first', 'offsets'):
+            raise ValueError(f"Unknown duplicate handling: {keep}")
+        self.keep = keep
+        self.max_keys = max_keys
+        self.removed = 0
+        self.resets = 0
+        self.duplicate_offsets = {}
+        self._allocate(DEDUP_INITIAL_SLOTS)
+
+    def _allocate(self, slots):
+        self.keys = array('Q', bytes(8 * slots))
+        self.first_offsets = array('q', bytes(8 * slots))
+        self.mask = slots - 1
+        self.size = 0
+
+    def __len__(self):
+        return self.size
+
+    @staticmethod
+    def fingerprint(fix):
+        """Return the non-zero 64-bit fingerprint of a fix's key"""
+        key = f"{fix.gps_week}|{fix.gps_tow}|{(fix.lat_hex or '').lower()}|{(fix.lon_hex or '').lower()}"
+        return int.from_bytes(hashlib.blake2b(key.encode(), digest_size=8).digest(), 'little') or 1
+
+    def is_duplicate(self, fix):
+        """Record a fix and return whether an earlier copy of it was seen"""
+        fingerprint = self.fingerprint(fix)
+        offset = fix.offset if fix.offset is not None else -1
+        keys = self.keys
+        slot = fingerprint & self.mask
+        while keys[slot]:
+            if keys[slot] == fingerprint:
+                first = self.first_offsets[slot]
+                if first < offset or fix.offset is None:
+                    self.removed += 1
+                    if self.keep == 'offsets':
+                        copies = self.duplicate_offsets.setdefault(first, [])
+                        # Offsets only grow within a run, so a rescan after a resume repeats the tail
+                        if not copies or offset > copies[-1]:
+                            copies.append(offset)
+                    return True
+                self.first_offsets[slot] = offset
+                return False
+            slot = (slot + 1) & self.mask
+        if self.size >= self.max_keys:
+            self.resets += 1
+            self._allocate(DEDUP_INITIAL_SLOTS)
+        elif 2 * (self.size + 1) > len(keys):
+            self._grow()
+        self._insert(fingerprint, offset)
+        return False
+
+    def _insert(self, fingerprint, offset):
+        keys = self.keys
+        slot = fingerprint & self.mask
+        while keys[slot]:
+            slot = (slot + 1) & self.mask
+        keys[slot] = fingerprint
+        self.first_offsets[slot] = offset
+        self.size += 1
+
+    def _grow(self):
+        old = zip(self.keys, self.first_offsets)
+        self._allocate(2 * len(self.keys))
+        for fingerprint, offset in old:
+            if fingerprint:
+                self._insert(fingerprint, offset)
+
+    def to_bytes(self):
+        """Serialize the table (not the removed count) as a JSON header and the raw arrays"""
+        header = json.dumps({
+            'keep': self.keep,
+            'byteorder': sys.byteorder,
+            'size': self.size,
+            'slots': len(self.keys),
+            'duplicate_offsets': [[first, copies] for first, copies in self.duplicate_offsets.items()],
+        }).encode('utf-8')
+        return struct.pack('<I', len(header)) + header + self.keys.tobytes() + self.first_offsets.tobytes()
+
+    def load_bytes(self, data):
+        """Restore a table written by to_bytes(); raises ValueError if it does not fit"""
+        data = memoryview(data)
+        header_length, = struct.unpack_from('<I', data)
+        header = json.loads(bytes(data[4:4 + header_length]))
+        if header['byteorder'] != sys.byteorder or header['keep'] != self.keep:
+            raise ValueError("Duplicate table was stored with other settings")
+        slots = header['slots']
+        if len(data) != 4 + header_length + 16 * slots or slots & (slots - 1):
+            raise ValueError("Duplicate table is truncated")
+        pos = 4 + header_length
+        self.keys = array('Q', bytes(data[pos:pos + 8 * slots]))
+        self.first_offsets = array('q', bytes(data[pos + 8 * slots:]))
+        self.mask = slots - 1
+        self.size = header['size']
+        self.duplicate_offsets = {first: copies for first, copies in header['duplicate_offsets']}
+
+
+class TripSimplifier:
+    """Streaming stage that splits valid fixes into trips and thins each trip's track
+
+    add(fix) returns the fixes that are final so far (often none) and
+    finish() the rest, in input order. A trip ends when two consecutive
+    fixes are more than max_gap_s apart in time (either way: logs are not
+    always in time order) or more than max_jump_m apart on the ground.
+    Each trip is simplified with Douglas-Peucker at tolerance_m metres,
+    window fixes at a time: every window keeps its first and last fix, so
+    memory stays bounded and each dropped fix lies within tolerance_m of
+    the kept track. A parked vehicle's stream of near-identical fixes
+    shrinks to its two ends. With tolerance_m None every fix is kept and
+    only the trip stats are collected. trips holds one dict per finished
+    trip; its distance is measured along the kept track, so jitter below
+    the tolerance does not add to it.
+    """
+
+    def __init__(self, tolerance_m=TRIP_TOLERANCE_METERS, max_gap_s=TRIP_MAX_GAP_SECONDS,
+                 max_jump_m=TRIP_MAX_JUMP_METERS, window=TRIP_WINDOW_FIXES):
+        self.tolerance_m = tolerance_m
+        self.max_gap_ms = max_gap_s * 1000
+        self.max_jump_m = max_jump_m
+        self.window = max(window, 3)
+        self.trips = []
+        self.fixes = 0
+        self.kept = 0
+        self.pending = []
+        self.trip = None
+        self.last = None
+        self.last_kept = None
+
+    def add(self, fix):
+        """Add the next valid fix; returns the fixes to write now"""
+        out = []
+        if self.last is not None and self.breaks_trip(self.last, fix):
+            out = self._end_trip()
+        if self.trip is None:
+            self.trip = {'trip': len(self.trips) + 1, 'start_ms': None, 'end_ms': None, 'fixes': 0, 'kept': 0,
+                         'distance_m': 0.0, 'start_offset': fix.offset, 'start': [fix.lat, fix.lon]}
+        trip = self.trip
+        trip['fixes'] += 1
+        trip['end_offset'] = fix.offset
+        trip['end'] = [fix.lat, fix.lon]
+        timestamp = fix.timestamp_ms
+        if timestamp is not None:
+            if trip['start_ms'] is None or timestamp < trip['start_ms']:
+                trip['start_ms'] = timestamp
+            if trip['end_ms'] is None or timestamp > trip['end_ms']:
+                trip['end_ms'] = timestamp
+        self.fixes += 1
+        self.last = fix
+        if self.tolerance_m is None:
+            out += self._keep([fix])
+            return out
+        self.pending.append(fix)
+        if len(self.pending) >= self.window:
+            kept = self.simplify(self.pending)
+            # The window's last fix is kept and starts the next window
+            self.pending = kept[-1:]
+            out += self._keep(kept[:-1])
+        return out
+
+    def finish(self):
+        """End the current trip; returns the fixes still to write"""
+        return self._end_trip() if self.trip is not None else []
+
+    def breaks_trip(self, previous, fix):
+        """Return whether fix starts a new trip after previous"""
+        if (previous.timestamp_ms is not None and fix.timestamp_ms is not None
+                and abs(fix.timestamp_ms - previous.timestamp_ms) > self.max_gap_ms):
+            return True
+        return haversine_m(previous.lat, previous.lon, fix.lat, fix.lon) > self.max_jump_m
+
+    def _keep(self, fixes):
+        trip = self.trip
+        previous = self.last_kept
+        for fix in fixes:
+            if previous is not None:
+                trip['distance_m'] += haversine_m(previous.lat, previous.lon, fix.lat, fix.lon)
+            previous = fix
+        self.last_kept = previous
+        trip['kept'] += len(fixes)
+        self.kept += len(fixes)
+        return fixes
+
+    def _end_trip(self):
+        out = self._keep(self.simplify(self.pending)) if self.pending else []
+        trip = self.trip
+        start_ms, end_ms = trip['start_ms'], trip['end_ms']
+        self.trips.append({
+            'trip': trip['trip'],
+            'start_time': format_timestamp_ms(start_ms) if start_ms is not None else None,
+            'end_time': format_timestamp_ms(end_ms) if end_ms is not None else None,
+            'duration_s': (end_ms - start_ms) / 1000 if start_ms is not None else None,
+            'distance_m': round(trip['distance_m'], 1),
+            'fixes': trip['fixes'],
+            'kept': trip['kept'],
+            'start': trip['start'],
+            'end': trip['end'],
+            'start_offset': trip['start_offset'],
+            'end_offset': trip['end_offset'],
+        })
+        self.trip = self.last = self.last_kept = None
+        self.pending = []
+        return out
+
+    def simplify(self, fixes):
+        """Return the fixes Douglas-Peucker keeps at tolerance_m, always including the first and last
+
+        Positions are projected to metres on a plane tangent at the first
+        fix; over the extent of one window the distortion is a small
+        fraction of the tolerance.
+        """
+        count = len(fixes)
+        if count < 3:
+            return list(fixes)
+        lat0 = fixes[0].lat
+        lon0 = fixes[0].lon
+        metres = EARTH_RADIUS_M * math.pi / 180
+        x_scale = metres * math.cos(math.radians(lat0))
+        xs = [((fix.lon - lon0 + 180) % 360 - 180) * x_scale for fix in fixes]
+        ys = [(fix.lat - lat0) * metres for fix in fixes]
+        tolerance = self.tolerance_m * self.tolerance_m
+        keep = bytearray(count)
+        keep[0] = keep[-1] = 1
+        spans = [(0, count - 1)]
+        while spans:
+            first, last = spans.pop()
+            ax, ay = xs[first], ys[first]
+            dx, dy = xs[last] - ax, ys[last] - ay
+            length = dx * dx + dy * dy
+            worst = -1.0
+            worst_index = first
+            for i in range(first + 1, last):
+                px, py = xs[i] - ax, ys[i] - ay
+                if length:
+                    # Distance to the segment, not the line: a vehicle can double back
+                    t = (px * dx + py * dy) / length
+                    t = 0.0 if t < 0.0 else 1.0 if t > 1.0 else t
+                    px -= t * dx
+                    py -= t * dy
+                distance = px * px + py * py
+                if distance > worst:
+                    worst = distance
+                    worst_index = i
+            if worst > tolerance:
+                keep[worst_index] = 1
+                spans.append((worst_index, last))
+                spans.append((first, worst_index))
+        return [fix for fix, kept in zip(fixes, keep) if kept]
+
+    def summary(self):
+        return f"{len(self.trips)} trips, {self.kept} of {self.fixes} fixes kept"
+
+
+def haversine_m(lat1, lon1, lat2, lon2):
+    """Great-circle distance in metres between two points in degrees"""
+    phi1 = math.radians(lat1)
+    phi2 = math.radians(lat2)
+    a = (math.sin((phi2 - phi1) / 2) ** 2
+         + math.cos(phi1) * math.cos(phi2) * math.sin(math.radians(lon2 - lon1) / 2) ** 2)
+    return 2 * EARTH_RADIUS_M * math.asin(min(1.0, math.sqrt(a)))
+
+
+class DecodeStats:
+    """Counters and stage timings for one or more decode runs
+
+    Pass an instance to extract_gps_data / write_fixes (or iter_fixes) to
+    collect it; decoding without one skips the timers entirely. Segments
+    that fail to parse are blocks_found - blocks_parsed. Parsed fixes that
+    are dropped are counted per reason in `rejected` (see
+    OnStarDecoder.rejection_reason), while fixes that are written but dated
+    before 2010 are counted in `flagged`, and valid fixes dropped as
+    copies of earlier ones (see FixDeduplicator) in `duplicates`. Fixes a
+    TripSimplifier leaves out are counted in `simplified`, not in
+    entries_written.
+    `variants` counts the files decoded per FirmwareVariant name. In
+    parallel mode the stage times are summed over workers, and with a
+    pipeline the write time includes the writer thread's, so they can
+    exceed the wall-clock total.
+    """
+    STAGES = ('scan', 'parse', 'validate', 'write')
+    REJECT_REASONS = ('bad_lat', 'bad_lon', 'missing_time')
+
+    def __init__(self):
+        self.bytes_scanned = 0
+        self.cache_hits = 0
+        self.blocks_found = 0
+        self.blocks_parsed = 0
+        self.entries_written = 0
+        self.duplicates = 0
+        self.simplified = 0
+        self.variants = {}
+        self.rejected = dict.fromkeys(self.REJECT_REASONS, 0)
+        self.flagged = {'pre_2010': 0}
+        self.seconds = dict.fromkeys(self.STAGES, 0.0)
+        self.total_seconds = 0.0
+
+    @property
+    def parse_errors(self):
+        return self.blocks_found - self.blocks_parsed
+
+    def merge(self, other):
+        """Add another run's counters and timings to this one"""
+        self.bytes_scanned += other.bytes_scanned
+        self.cache_hits += other.cache_hits
+        self.blocks_found += other.blocks_found
+        self.blocks_parsed += other.blocks_parsed
+        self.entries_written += other.entries_written
+        self.duplicates += other.duplicates
+        self.simplified += other.simplified
+        for counts, other_counts in ((self.rejected, other.rejected), (self.flagged, other.flagged),
+                                     (self.seconds, other.seconds), (self.variants, other.variants)):
+            for key, value in other_counts.items():
+                counts[key] = counts.get(key, 0) + value
+        self.total_seconds += other.total_seconds
+
+    def as_dict(self):
+        seconds = self.total_seconds
+        return {
+            'bytes_scanned': self.bytes_scanned,
+            'cache_hits': self.cache_hits,
+            'blocks_found': self.blocks_found,
+            'blocks_parsed': self.blocks_parsed,
+            'entries_written': self.entries_written,
+            'duplicates': self.duplicates,
+            'simplified': self.simplified,
+            'variants': dict(self.variants),
+            'rejected': dict(self.rejected, parse_error=self.parse_errors),
+            'flagged': dict(self.flagged),
+            'seconds': dict(self.seconds, total=seconds),
+            'mb_per_s': self.bytes_scanned / (1 << 20) / seconds if seconds else None,
+            'entries_per_s': self.entries_written / seconds if seconds else None,
+        }
+
+    def write_json(self, path):
+        """Write as_dict() to a JSON report"""
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.as_dict(), f, indent=2)
+
+    def summary(self):
+        """One-paragraph text summary for the CLI"""
+        rejected = ', '.join(f"{reason} {count}" for reason, count in self.as_dict()['rejected'].items())
+        timings = ', '.join(f"{stage} {seconds:.2f}s" for stage, seconds in self.seconds.items())
+        cached = f" ({self.cache_hits} from cache)" if self.cache_hits else ""
+        duplicates = f", {self.duplicates} duplicates removed" if self.duplicates else ""
+        if self.simplified:
+            duplicates += f", {self.simplified} left out by simplification"
+        variants = ', '.join(f"{name} {count}" for name, count in self.variants.items())
+        variants = f"\nFirmware variants: {variants}." if variants else ""
+        return (f"Scanned {self.bytes_scanned} bytes{cached}: {self.blocks_found} blocks found, "
+                f"{self.blocks_parsed} parsed, {self.entries_written} written "
+                f"({self.flagged['pre_2010']} dated before 2010{duplicates}).{variants}\n"
+                f"Rejected: {rejected}.\nStage times: {timings}, total {self.total_seconds:.2f}s.")
+
+
+class ProgressReporter:
+    """Turn bytes processed into throttled progress_callback(status, percent) calls
+
+    update() is cheap enough to call per block: it only formats and calls
+    back once every min_interval seconds (and always when forced). The
+    status shows MB done, throughput, entries and an ETA; percent is mapped
+    into [start_percent, end_percent] of the overall progress bar. The
+    scanners also call it once per chunk, with the bytes read and without
+    entries, which then shows the last count given. Bytes done never go
+    back, as the fixes of a chunk come after its read.
+    """
+
+    def __init__(self, callback, total_bytes, label='Scanning', start_percent=10, end_percent=85,
+                 min_interval=PROGRESS_MIN_INTERVAL):
+        self.callback = callback
+        self.total_bytes = total_bytes
+        self.label = label
+        self.start_percent = start_percent
+        self.end_percent = end_percent
+        self.min_interval = min_interval
+        self.started = time.perf_counter()
+        self.next_update = self.started
+        self.done_bytes = 0
+        self.entries = None
+
+    def update(self, done_bytes, entries=None, force=False):
+        if entries is None:
+            entries = self.entries
+        else:
+            self.entries = entries
+        self.done_bytes = done_bytes = max(self.done_bytes, min(done_bytes, self.total_bytes))
+        now = time.perf_counter()
+        if now < self.next_update and not force:
+            return
+        self.next_update = now + self.min_interval
+        fraction = done_bytes / self.total_bytes if self.total_bytes else 1.0
+        percent = self.start_percent + int((self.end_percent - self.start_percent) * fraction)
+        self.callback(self.status(done_bytes, entries, now - self.started), percent)
+
+    def status(self, done_bytes, entries, elapsed):
+        megabytes = 1 << 20
+        text = f"{self.label} {done_bytes / megabytes:.1f} of {self.total_bytes / megabytes:.1f} MB"
+        details = []
+        if elapsed > 0 and done_bytes:
+            rate = done_bytes / elapsed
+            details.append(f"{rate / megabytes:.1f} MB/s")
+        if entries is not None:
+            details.append(f"{entries} entries")
+        if elapsed > 0 and done_bytes and done_bytes < self.total_bytes:
+            remaining = int((self.total_bytes - done_bytes) / rate)
+            details.append(f"ETA {remaining // 60}:{remaining % 60:02d}")
+        return f"{text} ({', '.join(details)})" if details else text
+
+
+class DecodeCancelled(Exception):
+    """Raised inside a decode when its CancelToken is cancelled"""
+
+
+class CancelToken:
+    """Cooperative cancellation flag shared between the GUI and a decode thread
+
+    The decode loops check it once per block and the scanners once per
+    chunk read, so cancel() takes effect within one block or chunk, even
+    in a long stretch without keywords. event may be a multiprocessing
+    Event, to share the flag with worker processes.
+    """
+
+    def __init__(self, event=None):
+        self._event = event if event is not None else threading.Event()
+
+    def cancel(self):
+        self._event.set()
+
+    @property
+    def cancelled(self):
+        return self._event.is_set()
+
+    def raise_if_cancelled(self):
+        if self._event.is_set():
+            raise DecodeCancelled("Cancelled")
+
+
+class ConsoleProgress:
+    """progress_callback that redraws a single status line on a terminal"""
+
+    def __init__(self, stream):
+        self.stream = stream
+        self.width = 0
+
+    def __call__(self, status, percent):
+        line = f"[{percent:3d}%] {status}"
+        self.stream.write('\r' + line.ljust(self.width))
+        self.stream.flush()
+        self.width = len(line)
+
+    def finish(self):
+        """End the status line so later output starts on a new one"""
+        if self.width:
+            self.stream.write('\n')
+            self.stream.flush()
+            self.width = 0
+
+
+@contextmanager
+def profile_to(path):
+    """Opt-in cProfile hook: profile the with-block and dump pstats data to path
+
+    Inspect the dump with `python -m pstats path` or snakeviz.
+    """
+    import cProfile
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield profiler
+    finally:
+        profiler.disable()
+        profiler.dump_stats(path)
+
+
+class OutputSink:
+    """Base class for output formats that consume fixes as a stream
+
+    Call write() once per fix and close() when done; used as a context
+    manager the sink is closed on success and abort()ed on error.
+    """
+    extension = ''
+
+    def __init__(self, path):
+        self.path = path
+        self.count = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+    # Whether the format can be written to STDOUT_PATH
+    streams = False
+    # Whether an existing output can be reopened with resume_rows (see Checkpoint)
+    resumable = False
+
+    def write(self, fix):
+        raise NotImplementedError
+
+    def sync(self):
+        """Make every row written so far durable, before a checkpoint is saved"""
+        pass
+
+    def close(self):
+        pass
+
+    def abort(self):
+        """Release resources without finishing the output"""
+        pass
+
+
+class TextSink(OutputSink):
+    """Base class for sinks that write a text file
+
+    A path of STDOUT_PATH streams to standard output instead, flushed line
+    by line so a downstream reader sees each fix as soon as it is written.
+    With resume_rows, an existing file is kept up to its header_lines and
+    first resume_rows rows (one line per fix) and appended to.
+    """
+    streams = True
+    resumable = True
+    header_lines = 0
+
+    def __init__(self, path, resume_rows=None):
+        super().__init__(path)
+        if path == STDOUT_PATH:
+            sys.stdout.flush()
+            self.file = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8', newline='', line_buffering=True)
+        elif resume_rows is not None:
+            with open(path, 'r+b') as existing:
+                existing.truncate(self._line_offset(existing, self.header_lines + resume_rows))
+            self.file = open(path, 'a', encoding='utf-8', newline='')
+            self.count = resume_rows
+        else:
+            self.file = open(path, 'w', encoding='utf-8', newline='')
+
+    @staticmethod
+    def _line_offset(f, lines):
+        """Return the byte offset just past the first lines lines of a binary file"""
+        offset = 0
+        while lines:
+            chunk = f.read(STREAM_CHUNK_SIZE)
+            if not chunk:
+                raise ValueError(f"{f.name} is shorter than its checkpoint")
+            found = chunk.count(b'\n')
+            if found < lines:
+                lines -= found
+                offset += len(chunk)
+                continue
+            end = -1
+            for _ in range(lines):
+                end = chunk.index(b'\n', end + 1)
+            return offset + end + 1
+        return offset
+
+    def sync(self):
+        self.file.flush()
+        os.fsync(self.file.fileno())
+
+    def close(self):
+        self._release()
+
+    def abort(self):
+        self._release()
+
+    def _release(self):
+        if self.path == STDOUT_PATH:
+            self.file.flush()
+            self.file.detach()  # leave sys.stdout open
+        else:
+            self.file.close()
+
+
+class CsvSink(TextSink):
+    """Write fixes as CSV rows in RECORD_FIELDS order; missing values are empty"""
+    extension = '.csv'
+    header_lines = 1
+
+    def __init__(self, path, resume_rows=None):
+        super().__init__(path, resume_rows)
+        self.writer = csv.writer(self.file)
+        if resume_rows is None:
+            self.writer.writerow(RECORD_FIELDS)
+
+    def write(self, fix):
+        self.writer.writerow(['' if value is None else value for value in fix.to_record()])
+        self.count += 1
+
+
+class NdjsonSink(TextSink):
+    """Write one JSON object per line; missing values are null"""
+    extension = '.ndjson'
+
+    def write(self, fix):
+        self.file.write(json.dumps(dict(zip(RECORD_FIELDS, fix.to_record())), separators=(',', ':')))
+        self.file.write('\n')
+        self.count += 1
+
+
+class SqliteSink(OutputSink):
+    """Insert fixes into a gps_fixes table with batched executemany in one transaction
+
+    On close the table is indexed for FixStore queries (see create_indexes).
+    With resume_rows, an existing database keeps the first resume_rows rows
+    (in rowid order) and new rows are added after them.
+    """
+    extension = '.sqlite'
+    resumable = True
+
+    def __init__(self, path, batch_size=SQLITE_BATCH_SIZE, resume_rows=None):
+        super().__init__(path)
+        self.batch_size = batch_size
+        self.batch = []
+        if resume_rows is None and os.path.exists(path):
+            os.remove(path)
+        # The writer thread of a PipelinedSink may insert on the sink's behalf
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        columns = ', '.join(f'"{name}"' for name in RECORD_FIELDS)
+        self.conn.execute(f"CREATE TABLE IF NOT EXISTS gps_fixes ({columns})")
+        self.insert_sql = f"INSERT INTO gps_fixes ({columns}) VALUES ({', '.join('?' * len(RECORD_FIELDS))})"
+        self.conn.execute("BEGIN")
+        if resume_rows is not None:
+            stored = self.conn.execute("SELECT COUNT(*) FROM gps_fixes").fetchone()[0]
+            if stored < resume_rows:
+                self.conn.close()
+                raise ValueError(f"{path} is shorter than its checkpoint")
+            self.conn.execute("DELETE FROM gps_fixes WHERE rowid > ?", (resume_rows,))
+            if self.conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'gps_fixes_rtree'").fetchone():
+                self.conn.execute("DELETE FROM gps_fixes_rtree WHERE id > ?", (resume_rows,))
+            self.count = resume_rows
+
+    def write(self, fix):
+        record = fix.to_record()
+        # SQLite integers are 64-bit; keep wider values from corrupt data as text
+        self.batch.append([str(v) if isinstance(v, int) and not -2**63 <= v < 2**63 else v for v in record])
+        self.count += 1
+        if len(self.batch) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if self.batch:
+            self.conn.executemany(self.insert_sql, self.batch)
+            self.batch = []
+
+    def sync(self):
+        self.flush()
+        self.conn.commit()
+        self.conn.execute("BEGIN")
+
+    def close(self):
+        self.flush()
+        self.create_indexes(self.conn)
+        self.conn.commit()
+        self.conn.close()
+
+    def abort(self):
+        self.conn.rollback()
+        self.conn.close()
+
+    @staticmethod
+    def create_indexes(conn):
+        """Index gps_fixes by time and position, adding rows written since the last call
+
+        The time index is on timestamp_time, whose text sorts in time order.
+        Positions go into the gps_fixes_rtree R*Tree (keyed by rowid), built
+        in bulk after loading; SQLite builds without the R*Tree module get a
+        (lat, long) index instead. A sampled ANALYZE lets the query planner
+        pick the more selective index. Returns whether the R*Tree is available.
+        """
+        conn.execute('CREATE INDEX IF NOT EXISTS gps_fixes_time ON gps_fixes ("timestamp_time")')
+        try:
+            conn.execute("CREATE VIRTUAL TABLE IF NOT EXISTS gps_fixes_rtree "
+                         "USING rtree(id, min_lat, max_lat, min_lon, max_lon)")
+            spatial = True
+        except sqlite3.OperationalError:
+            conn.execute('CREATE INDEX IF NOT EXISTS gps_fixes_position ON gps_fixes ("lat", "long")')
+            spatial = False
+        if spatial:
+            conn.execute('INSERT INTO gps_fixes_rtree SELECT rowid, "lat", "lat", "long", "long" FROM gps_fixes '
+                         'WHERE rowid > (SELECT coalesce(max(id), 0) FROM gps_fixes_rtree) '
+                         'AND "lat" IS NOT NULL AND "long" IS NOT NULL')
+        conn.execute("PRAGMA analysis_limit = 1000")
+        conn.execute("ANALYZE")
+        return spatial
+
+
+class FixStore:
+    """Time-range and bounding-box queries on a SQLite store written by SqliteSink
+
+    Queries use the time index and the R*Tree, so they read only matching
+    rows. The R*Tree holds 32-bit floats rounded outwards, so each hit is
+    checked again against the exact coordinates. Stores written before
+    SqliteSink indexed them are indexed on first open.
+    """
+
+    def __init__(self, path):
+        if not os.path.isfile(path):
+            raise FileNotFoundError(path)
+        self.conn = sqlite3.connect(path)
+        names = {row[0] for row in self.conn.execute("SELECT name FROM sqlite_master")}
+        if 'gps_fixes_time' in names:
+            self.spatial = 'gps_fixes_rtree' in names
+        else:
+            self.spatial = SqliteSink.create_indexes(self.conn)
+            self.conn.commit()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def close(self):
+        self.conn.close()
+
+    def query(self, start_ms=None, end_ms=None, bbox=None, limit=None):
+        """Yield GpsFix objects in time order, optionally within a time range and a bounding box
+
+        start_ms and end_ms are inclusive Unix milliseconds (fixes without
+        a valid time sort first and never match a time range); bbox is
+        (min_lat, min_lon, max_lat, max_lon).
+        """
+        columns = ', '.join(f'f."{name}"' for name in RECORD_FIELDS)
+        sql = f"SELECT {columns} FROM gps_fixes f"
+        conditions = []
+        params = []
+        if bbox is not None:
+            min_lat, min_lon, max_lat, max_lon = bbox
+            if self.spatial:
+                sql += (" JOIN gps_fixes_rtree r ON r.id = f.rowid AND r.min_lat <= ? AND r.max_lat >= ?"
+                        " AND r.min_lon <= ? AND r.max_lon >= ?")
+                params += [max_lat, min_lat, max_lon, min_lon]
+            conditions.append('f."lat" BETWEEN ? AND ? AND f."long" BETWEEN ? AND ?')
+            params += [min_lat, max_lat, min_lon, max_lon]
+        if start_ms is not None:
+            conditions.append('f."timestamp_time" >= ?')
+            params.append(format_timestamp_ms(start_ms))
+        if end_ms is not None:
+            conditions.append('f."timestamp_time" <= ?')
+            params.append(format_timestamp_ms(end_ms))
+        if conditions:
+            sql += " WHERE " + " AND ".join(conditions)
+        sql += ' ORDER BY f."timestamp_time", f.rowid'
+        if limit is not None:
+            sql += " LIMIT ?"
+            params.append(limit)
+        for record in self.conn.execute(sql, params):
+            yield GpsFix.from_record(record)
+
+
+class GpxSink(TextSink):
+    """Write fixes as a single GPX track; times are only written when valid"""
+    extension = '.gpx'
+    header_lines = 3
+
+    def __init__(self, path, resume_rows=None):
+        super().__init__(path, resume_rows)
+        if resume_rows is None:
+            self.file.write('<?xml version="1.0" encoding="UTF-8"?>\n'
+                            '<gpx version="1.1" creator="OnStar GPS Decoder" xmlns="http://www.topografix.com/GPX/1/1">\n'
+                            '<trk><name>OnStar GPS Data</name><trkseg>\n')
+
+    def write(self, fix):
+        point = f'<trkpt lat="{fix.lat!r}" lon="{fix.lon!r}">'
+        if fix.has_valid_time:
+            point += f'<time>{format_iso_timestamp_ms(fix.timestamp_ms)}</time>'
+        self.file.write(point + '</trkpt>\n')
+        self.count += 1
+
+    def close(self):
+        self.file.write('</trkseg></trk>\n</gpx>\n')
+        super().close()
+
+
+class KmlSink(TextSink):
+    """Write one timestamped KML placemark per fix"""
+    extension = '.kml'
+    header_lines = 3
+
+    def __init__(self, path, resume_rows=None):
+        super().__init__(path, resume_rows)
+        if resume_rows is None:
+            self.file.write('<?xml version="1.0" encoding="UTF-8"?>\n'
+                            '<kml xmlns="http://www.opengis.net/kml/2.2">\n'
+                            '<Document><name>OnStar GPS Data</name>\n')
+
+    def write(self, fix):
+        placemark = '<Placemark>'
+        if fix.has_valid_time:
+            placemark += f'<TimeStamp><when>{format_iso_timestamp_ms(fix.timestamp_ms)}</when></TimeStamp>'
+        placemark += f'<Point><coordinates>{fix.lon!r},{fix.lat!r}</coordinates></Point></Placemark>\n'
+        self.file.write(placemark)
+        self.count += 1
+
+    def close(self):
+        self.file.write('</Document>\n</kml>\n')
+        super().close()
+
+
+class XlsxSink(OutputSink):
+    """Stream fixes into a write-only XLSX workbook
+
+    Rows go straight to openpyxl's write-only worksheets (lxml-backed when
+    lxml is installed) instead of being held as cells until save. When a
+    sheet reaches Excel's row limit a new "GPS Data (n)" sheet is started,
+    each with its own header row.
+    """
+
+    extension = '.xlsx'
+
+    def __init__(self, path, max_rows=XLSX_MAX_ROWS):
+        super().__init__(path)
+        self.max_rows = max_rows
+        from openpyxl import Workbook
+        self.wb = Workbook(write_only=True)
+        self.ws = None
+        self.sheet_rows = 0
+        self.sheet_count = 0
+
+    def _new_sheet(self):
+        self.sheet_count += 1
+        title = "GPS Data" if self.sheet_count == 1 else f"GPS Data ({self.sheet_count})"
+        self.ws = self.wb.create_sheet(title)
+        self.ws.append(XLSX_HEADERS)
+        self.sheet_rows = 1
+
+    def write(self, fix):
+        if self.ws is None or self.sheet_rows >= self.max_rows:
+            self._new_sheet()
+        self.ws.append(fix.to_row())
+        self.sheet_rows += 1
+        self.count += 1
+
+    def close(self):
+        if self.ws is None:
+            self._new_sheet()
+        self.wb.save(self.path)
+
+
+class PrefetchReader:
+    """Read a file ahead of its consumer on a background thread
+
+    A reader thread keeps up to depth chunks of chunk_size bytes queued, so
+    the next chunk is usually already in memory when the scanner asks for
+    it; when the scanner falls behind the full queue stops the thread until
+    it catches up. read() returns the chunks in file order whatever size is
+    asked for, and b'' at end of file; tell() is the number of bytes handed
+    out. Read errors are raised from read().
+    """
+
+    def __init__(self, f, chunk_size=STREAM_CHUNK_SIZE, depth=PIPELINE_READ_AHEAD):
+        self.queue = queue.Queue(depth)
+        self.position = 0
+        self.done = False
+        self.closed = threading.Event()
+        self.thread = threading.Thread(target=self._run, args=(f, chunk_size), daemon=True)
+        self.thread.start()
+
+    def _run(self, f, chunk_size):
+        try:
+            while not self.closed.is_set():
+                chunk = f.read(chunk_size)
+                self._put(chunk)
+                if not chunk:
+                    return
+        except Exception as e:
+            self._put(e)
+
+    def _put(self, item):
+        # Wake up now and then to notice close() while the queue is full
+        while not self.closed.is_set():
+            try:
+                self.queue.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                pass
+
+    def read(self, size=-1):
+        if self.done:
+            return b''
+        item = self.queue.get()
+        if isinstance(item, Exception):
+            self.done = True
+            raise item
+        if not item:
+            self.done = True
+        self.position += len(item)
+        return item
+
+    def tell(self):
+        return self.position
+
+    def close(self):
+        """Stop the reader thread; the underlying file is left open"""
+        self.closed.set()
+        self.thread.join()
+
+
+class PipelinedSink(OutputSink):
+    """Hand fixes to another sink that writes them on a background thread
+
+    write() only appends to a batch; full batches of batch_size fixes go
+    through a queue of at most depth batches to a writer thread that
+    passes them to the wrapped sink, so formatting and I/O overlap with
+    scanning and parsing, and a slow output holds the decode back instead
+    of letting batches pile up in memory. count is the number of fixes
+    handed over. sync() and drain() wait until the writer has caught up;
+    an error in the writer is raised from the next write(), drain() or
+    sync(). stop() ends the thread, dropping anything still queued. The
+    wrapped sink is closed or aborted with this one.
+    """
+
+    def __init__(self, sink, batch_size=PIPELINE_WRITE_BATCH, depth=PIPELINE_WRITE_DEPTH):
+        super().__init__(sink.path)
+        self.sink = sink
+        self.count = sink.count
+        self.batch_size = batch_size
+        self.batch = []
+        self.error = None
+        self.stopped = False
+        self.busy_seconds = 0.0
+        self.queue = queue.Queue(depth)
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def _run(self):
+        clock = time.perf_counter
+        while True:
+            batch = self.queue.get()
+            try:
+                if batch is None:
+                    return
+                if self.error is None and not self.stopped:
+                    start = clock()
+                    write = self.sink.write
+                    for fix in batch:
+                        write(fix)
+                    self.busy_seconds += clock() - start
+            except Exception as e:
+                self.error = e
+            finally:
+                self.queue.task_done()
+
+    def write(self, fix):
+        self.batch.append(fix)
+        self.count += 1
+        if len(self.batch) >= self.batch_size:
+            self._hand_off()
+
+    def _hand_off(self):
+        if self.error is not None:
+            raise self.error
+        if self.batch:
+            self.queue.put(self.batch)
+            self.batch = []
+
+    def drain(self):
+        """Wait until every fix written so far has reached the wrapped sink"""
+        self._hand_off()
+        self.queue.join()
+        if self.error is not None:
+            raise self.error
+
+    def stop(self):
+        """End the writer thread without waiting for queued batches"""
+        if self.thread.is_alive():
+            self.stopped = True
+            self.queue.put(None)
+            self.thread.join()
+
+    def sync(self):
+        self.drain()
+        self.sink.sync()
+
+    def close(self):
+        try:
+            self.drain()
+        except Exception:
+            self.abort()
+            raise
+        self.stop()
+        self.sink.close()
+
+    def abort(self):
+        self.stop()
+        self.sink.abort()
+
+
+class TripSink(OutputSink):
+    """Pass fixes through a TripSimplifier on their way to another sink
+
+    Only the fixes the simplifier keeps reach the wrapped sink; count is
+    its row count. Call finish() once the input is done to write the last
+    trip; close() does so and closes the wrapped sink. With a DecodeStats
+    as stats, finish() moves the fixes left out from entries_written to
+    simplified, so entries_written counts the rows actually written.
+    """
+
+    def __init__(self, sink, trips, stats=None):
+        self.path = sink.path
+        self.sink = sink
+        self.trips = trips
+        self.stats = stats
+        self.dropped = 0  # fixes taken in minus fixes passed on
+
+    @property
+    def count(self):
+        return self.sink.count
+
+    def write(self, fix):
+        self.dropped += 1
+        for kept in self.trips.add(fix):
+            self.sink.write(kept)
+            self.dropped -= 1
+
+    def finish(self):
+        for kept in self.trips.finish():
+            self.sink.write(kept)
+            self.dropped -= 1
+        if self.stats is not None:
+            self.stats.entries_written -= self.dropped
+            self.stats.simplified += self.dropped
+        self.dropped = 0
+
+    def sync(self):
+        self.sink.sync()
+
+    def close(self):
+        self.finish()
+        self.sink.close()
+
+    def abort(self):
+        self.sink.abort()
+
+
+def expand_input_paths(inputs, skip_extensions=()):
+    """Expand files, directories and glob patterns into a sorted list of input files
+
+    Directories contribute the files directly inside them; files ending in
+    one of skip_extensions (previous outputs) are left out of directory and
+    glob matches. Plain paths are returned as given, even if missing.
+    """
+    paths = []
+    for item in inputs:
+        if os.path.isdir(item):
+            matches = [os.path.join(item, name) for name in os.listdir(item)]
+        elif os.path.isfile(item) or not glob.has_magic(item):
+            # Missing plain paths are kept so the report lists them as errors
+            paths.append(item)
+            continue
+        else:
+            matches = glob.glob(item, recursive=True)
+        for path in sorted(matches):
+            if os.path.isfile(path) and not path.lower().endswith(tuple(skip_extensions)):
+                paths.append(path)
+    seen = set()
+    return [p for p in paths if not (os.path.abspath(p) in seen or seen.add(os.path.abspath(p)))]
+
+
+def _decode_file_job(input_path, output_path, options):
+    """Decode one file in a batch worker process and return its report entry"""
+    started = time.perf_counter()
+    entry = {'input': input_path, 'output': output_path, 'bytes': None, 'entries': 0, 'seconds': None,
+             'error': None}
+    try:
+        options = dict(options)
+        cache_settings = options.pop('cache', None)
+        cache = ResultCache(*cache_settings) if cache_settings else None
+        dedup = FixDeduplicator() if options.pop('dedup', False) else None
+        trip_options = options.pop('trips', None)
+        trips = TripSimplifier(**trip_options) if trip_options is not None else None
+        decoder = OnStarDecoder(cache)
+        variant = options.pop('variant', 'auto')
+        if os.path.isfile(input_path):
+            variant = decoder.resolve_variant(input_path, variant)
+            entry['variant'] = variant.name
+        count, error = decoder.extract_gps_data(input_path, output_path, dedup=dedup, variant=variant, trips=trips,
+                                                **options)
+        entry['entries'] = count
+        entry['error'] = error
+        if dedup is not None:
+            entry['duplicates'] = dedup.removed
+        if trips is not None:
+            entry['trips'] = trips.trips
+        if os.path.isfile(input_path):
+            entry['bytes'] = os.path.getsize(input_path)
+    except Exception as e:
+        entry['error'] = f"Error processing file: {str(e)}"
+    entry['seconds'] = round(time.perf_counter() - started, 3)
+    return entry
+
+
+def _warm_service_worker(output_format, engine):
+    """Pool initializer for DecodeService: import what every job will need once, up front"""
+    import signal
+    signal.signal(signal.SIGINT, signal.SIG_IGN)  # Ctrl+C stops the service, which shuts the workers down
+    if output_format == 'xlsx':
+        try:
+            __import__('openpyxl')
+        except ImportError:
+            pass  # the job reports the error
+    if engine != 'python':
+        load_numpy()
+
+
+# Set in iter_fixes_parallel's worker processes: the Event that cancels their shards
+_shard_cancel_event = None
+
+
+def _init_shard_worker(cancel_event):
+    """Pool initializer for iter_fixes_parallel"""
+    global _shard_cancel_event
+    _shard_cancel_event = cancel_event
+
+
+def _decode_shard(file_path, shard_start, shard_end, segmentation, engine, with_stats=False, variant=None):
+    """Scan and parse one byte range of a file in a worker process
+
+    Returns the shard's fixes as GpsFixColumns (compact to send back) and,
+    with with_stats, the shard's DecodeStats (otherwise None). Raises
+    DecodeCancelled once the parent sets the pool's cancel event.
+    """
+    decoder = OnStarDecoder()
+    fixes = GpsFixColumns()
+    stats = DecodeStats() if with_stats else None
+    cancel = CancelToken(_shard_cancel_event) if _shard_cancel_event is not None else None
+    with open(file_path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        anchor = variant.record_anchor if variant is not None else RECORD_ANCHOR
+        segments = decoder.iter_buffer_segments(mm, shard_start, shard_end, segmentation, anchor, cancel=cancel)
+        for fix in decoder.decode_segments(segments, engine, stats, variant):
+            if fix:
+                fixes.append(fix)
+    return fixes, stats
 
-if platform.system() == "Windows":
-    import ctypes
-    from ctypes import windll
 
 class OnStarDecoder:
-    def __init__(self):
+    # Output formats by name; extract_gps_data infers one from the output extension
+    output_sinks = {
+        'xlsx': XlsxSink,
+        'csv': CsvSink,
+        'ndjson': NdjsonSink,
+        'sqlite': SqliteSink,
+        'gpx': GpxSink,
+        'kml': KmlSink,
+    }
+
+    def __init__(self, cache=None):
         # GPS epoch start: January 6, 1980 00:00:00 UTC (first Sunday of 1980)
         self.gps_epoch = datetime(1980, 1, 6, 0, 0, 0, tzinfo=timezone.utc)
+        # Optional ResultCache used by write_fixes / extract_gps_data
+        self.cache = cache
 
-    def extract_gps_data(self, file_path, output_xlsx_path, progress_callback=None):
-        """Extract GPS data from OnStar binary file and decode it to XLSX"""
+    def extract_gps_data(self, file_path, output_xlsx_path, progress_callback=None, segmentation='cluster',
+                         engine='auto', output_format=None, workers=None, stats=None, cancel=None,
+                         on_fix=None, resume=False, dedup=None, pipeline=False, variant='auto', trips=None):
+        """Extract GPS data from OnStar binary file and decode it to XLSX (or another output format)
+
+        Returns (fixes in the output, error message or None); a cancelled
+        run returns (0, "Cancelled"). The options are passed on to
+        write_fixes. With resume a Checkpoint next to the output continues
+        an earlier run; it cannot be combined with trips.
+        """
+        checkpoint = None
         try:
+            if resume and trips is not None:
+                raise ValueError("trip simplification cannot be resumed")
+            output_format = self.output_format_for(output_xlsx_path, output_format)
+            variant = self.resolve_variant(file_path, variant)
+            if resume:
+                checkpoint = self.checkpoint_for(file_path, output_xlsx_path, output_format, segmentation, dedup,
+                                                 variant)
             if progress_callback:
-                progress_callback("Reading binary file...", 10)
-            with open(file_path, 'rb') as f:
-                data = f.read()
-            if progress_callback:
-                progress_callback("Finding GPS data blocks...", 30)
-            gps_blocks = self.find_gps_blocks_binary(data)
-            if progress_callback:
-                progress_callback(f"Parsing {len(gps_blocks)} GPS blocks...", 50)
-            parsed_entries = []
-            for i, block in enumerate(gps_blocks):
-                entry = self.parse_gps_block(block)
-                if entry and self.is_valid_entry(entry):
-                    parsed_entries.append(entry)
-                if progress_callback and len(gps_blocks) > 0:
-                    progress = 50 + (30 * (i + 1) // len(gps_blocks))
-                    progress_callback(f"Parsing block {i+1}/{len(gps_blocks)}", progress)
-            if progress_callback:
-                progress_callback("Writing XLSX file...", 85)
-            wb = Workbook()
-            ws = wb.active
-            ws.title = "GPS Data"
-            headers = ['lat', 'long', 'utc_year', 'utc_month', 'utc_day', 'utc_hour', 'utc_min', 
-                      'timestamp_time', '', '', '', '', '', '', 'lat_hex', 'lon_hex']
-            ws.append(headers)
-            for entry in parsed_entries:
-                ws.append([
-                    entry['lat'] if entry['lat'] != 'ERROR' else 'ERROR',
-                    entry['long'] if entry['long'] != 'ERROR' else 'ERROR',
-                    entry['utc_year'] if entry['utc_year'] else 'ERROR',
-                    entry['utc_month'] if entry['utc_month'] else 'ERROR',
-                    entry['utc_day'] if entry['utc_day'] else 'ERROR',
-                    entry['utc_hour'] if entry['utc_hour'] else 'ERROR',
-                    entry['utc_min'] if entry['utc_min'] else 'ERROR',
-                    entry['timestamp_time'] if entry['timestamp_time'] != 'ERROR' else 'ERROR',
-                    '', '', '', '', '', '',  # Six blank columns
-                    entry['lat_hex'],
-                    entry['lon_hex']
-                ])
-            wb.save(output_xlsx_path)
+                if checkpoint is not None and checkpoint.offset:
+                    progress_callback(f"Resuming at byte {checkpoint.offset:,} ({variant.description})...", 10)
+                else:
+                    progress_callback(f"Reading binary file ({variant.description})...", 10)
+            with self.open_sink(output_xlsx_path, output_format, checkpoint) as sink:
+                target = TripSink(sink, trips, stats) if trips is not None else sink
+                self.write_fixes(file_path, target, segmentation, engine, workers, progress_callback, stats, cancel,
+                                 on_fix, checkpoint, dedup, pipeline, variant)
+                if trips is not None:
+                    target.finish()
+                if progress_callback:
+                    progress_callback(f"Writing {output_format.upper()} file...", 85)
+                closing = time.perf_counter()
+            if checkpoint is not None:
+                checkpoint.complete = True
+                checkpoint.save()
+            if stats is not None:
+                # Finishing the file (XLSX zip, SQLite commit) is part of the write stage
+                closed = time.perf_counter() - closing
+                stats.seconds['write'] += closed
+                stats.total_seconds += closed
             if progress_callback:
                 progress_callback("Complete!", 100)
-            return len(parsed_entries), None
+            return sink.count, None
+        except DecodeCancelled:
+            if checkpoint is None and os.path.exists(output_xlsx_path):
+                os.remove(output_xlsx_path)
+            return 0, "Cancelled"
         except FileNotFoundError:
             return 0, f"File not found: {file_path}"
         except Exception as e:
             return 0, f"Error processing file: {str(e)}"
 
+    def write_fixes(self, file_path, sink, segmentation='cluster', engine='auto', workers=None,
+                    progress_callback=None, stats=None, cancel=None, on_fix=None, checkpoint=None, dedup=None,
+                    pipeline=False, variant='auto'):
+        """Decode one file into an open sink, writing each valid fix as soon as it is parsed
+
+        Returns the number of segments parsed (fixes, in parallel mode).
+        Replays and fills the decoder's ResultCache, if it has one. The
+        sink's close() and the checkpoint's final save are left to the
+        caller, see extract_gps_data.
+        """
+        file_size = os.path.getsize(file_path)
+        variant = self.resolve_variant(file_path, variant)
+        if stats is not None:
+            stats.variants[variant.name] = stats.variants.get(variant.name, 0) + 1
+        progress = ProgressReporter(progress_callback, file_size) if progress_callback else None
+        resume_offset = checkpoint.offset if checkpoint is not None else 0
+        cached = spool = None
+        if self.cache is not None and not resume_offset:
+            cache_key = self.cache.key_for(file_path, segmentation, variant.name)
+            cached = self.cache.load(cache_key)
+            if cached is None:
+                spool = self.cache.spool(cache_key)
+        # Standard output stays unbatched so each fix is seen as soon as it is decoded
+        writer = PipelinedSink(sink) if pipeline and sink.path != STDOUT_PATH else sink
+        with open(file_path, 'rb') as f:
+            source = f
+            try:
+                if resume_offset:
+                    entries = self.iter_fixes_from(file_path, resume_offset, segmentation, engine, stats, variant,
+                                                   cancel, progress)
+                elif cached is not None:
+                    entries = iter(cached)
+                    if stats is not None:
+                        stats.cache_hits += 1
+                        stats.blocks_found += cached.segments
+                        stats.blocks_parsed += cached.parsed
+                        for reason, rejected in cached.rejected.items():
+                            stats.rejected[reason] = stats.rejected.get(reason, 0) + rejected
+                elif workers and workers > 1:
+                    # Parallel decoding yields fixes only, so the cached segment count comes from the shards' stats
+                    shard_stats = stats if stats is not None or spool is None else DecodeStats()
+                    if shard_stats is not None:
+                        found, parsed = shard_stats.blocks_found, shard_stats.blocks_parsed
+                    entries = self.iter_fixes_parallel(file_path, workers, segmentation, engine, progress_callback,
+                                                       shard_stats, cancel, variant)
+                    progress = None
+                else:
+                    if pipeline:
+                        source = PrefetchReader(f)
+                    entries = self.iter_fixes(source, segmentation, engine, stats, variant, cancel, progress)
+                if spool is not None:
+                    entries = self._spool_fixes(entries, spool)
+                if checkpoint is not None:
+                    entries = self._track_checkpoint(entries, writer, checkpoint, file_path, segmentation)
+                if stats is not None:
+                    start = time.perf_counter()
+                    count = self._write_fixes_counted(entries, writer, stats, progress, cancel, on_fix, dedup)
+                    if writer is not sink:
+                        writer.drain()
+                        # The writer thread's time, on top of handing the fixes over
+                        stats.seconds['write'] += writer.busy_seconds
+                    if resume_offset or (workers and workers > 1):
+                        stats.bytes_scanned += file_size - resume_offset
+                    else:
+                        stats.bytes_scanned += source.tell()
+                    stats.total_seconds += time.perf_counter() - start
+                else:
+                    count = 0
+                    for count, entry in enumerate(entries, 1):
+                        if cancel is not None:
+                            cancel.raise_if_cancelled()
+                        if not entry:
+                            continue
+                        if self.is_valid_entry(entry) and not (dedup is not None and dedup.is_duplicate(entry)):
+                            writer.write(entry)
+                            if on_fix:
+                                on_fix(entry)
+                        if progress:
+                            # A fix's offset is where its block starts, i.e. bytes scanned so far
+                            progress.update(entry.offset, writer.count)
+                    if writer is not sink:
+                        writer.drain()
+                if progress:
+                    progress.update(file_size, writer.count, force=True)
+                if spool is not None:
+                    if workers and workers > 1:
+                        spool.segments = shard_stats.blocks_found - found
+                        spool.parsed = shard_stats.blocks_parsed - parsed
+                    # A cache that cannot be written only costs the next run its speed-up
+                    spool.commit()
+            finally:
+                if spool is not None:
+                    spool.discard()
+                if source is not f:
+                    source.close()
+                if writer is not sink:
+                    writer.stop()
+        if cached is not None:
+            return cached.segments
+        return count
+
+    def _spool_fixes(self, entries, spool):
+        """Pass entries through, counting them on spool and adding the valid fixes to it"""
+        rejected = spool.rejected
+        for entry in entries:
+            spool.segments += 1
+            if entry:
+                spool.parsed += 1
+                reason = self.rejection_reason(entry)
+                if reason:
+                    rejected[reason] += 1
+                else:
+                    spool.add(entry)
+            yield entry
+
+    def _track_checkpoint(self, entries, sink, checkpoint, file_path, segmentation):
+        """Pass entries through, moving checkpoint along the blocks they start
+
+        The sink is synced and the checkpoint saved at most every
+        CHECKPOINT_INTERVAL seconds. Once entries run out the checkpoint is
+        moved to the last block start whose predecessor ended before the end
+        of the image, which is not saved here: the rows after it are only
+        final once the sink is closed.
+        """
+        recent = deque(maxlen=CHECKPOINT_CANDIDATES)
+        due = time.monotonic() + CHECKPOINT_INTERVAL
+        # A cluster's slice may run this far past the next block's start
+        overlap = BLOCK_KEYWORD_PAD + BLOCK_EDGE_PAD if segmentation == 'cluster' else 0
+        with open(file_path, 'rb') as f:
+            for entry in entries:
+                # A cluster fix's offset is BLOCK_EDGE_PAD before its first keyword, unless clipped at 0
+                if entry and (entry.offset or segmentation == 'record'):
+                    start = entry.offset + BLOCK_EDGE_PAD if segmentation == 'cluster' else entry.offset
+                    recent.append((start, sink.count))
+                    if time.monotonic() >= due:
+                        sink.sync()
+                        checkpoint.advance(f, start, sink.count)
+                        checkpoint.save()
+                        due = time.monotonic() + CHECKPOINT_INTERVAL
+                yield entry
+            file_size = os.fstat(f.fileno()).st_size
+            for start, rows in reversed(recent):
+                if start + overlap <= file_size:
+                    checkpoint.advance(f, start, rows)
+                    break
+
+    def _write_fixes_counted(self, entries, sink, stats, progress=None, cancel=None, on_fix=None, dedup=None):
+        """write_fixes loop with rejection counters and validate/write timers"""
+        clock = time.perf_counter
+        seconds = stats.seconds
+        rejected = stats.rejected
+        count = 0
+        for count, entry in enumerate(entries, 1):
+            if cancel is not None:
+                cancel.raise_if_cancelled()
+            if not entry:
+                continue
+            if progress:
+                progress.update(entry.offset, sink.count)
+            start = clock()
+            reason = self.rejection_reason(entry)
+            checked = clock()
+            seconds['validate'] += checked - start
+            if reason:
+                rejected[reason] = rejected.get(reason, 0) + 1
+                continue
+            if dedup is not None:
+                duplicate = dedup.is_duplicate(entry)
+                deduped = clock()
+                seconds['validate'] += deduped - checked
+                checked = deduped
+                if duplicate:
+                    stats.duplicates += 1
+                    continue
+            if entry.timestamp_ms is not None and not entry.has_valid_time:
+                stats.flagged['pre_2010'] += 1
+            sink.write(entry)
+            stats.entries_written += 1
+            seconds['write'] += clock() - checked
+            if on_fix:
+                on_fix(entry)
+        return count
+
+    def output_format_for(self, output_path, output_format=None):
+        """Return the output format name, inferring it from the file extension when not given"""
+        if output_format is None:
+            if output_path == STDOUT_PATH:
+                return 'ndjson'
+
+            extension = os.path.splitext(output_path)[1].lower()
+            aliases = {'.jsonl': 'ndjson', '.json': 'ndjson', '.db': 'sqlite', '.sqlite3': 'sqlite'}
+            output_format = aliases.get(extension, extension.lstrip('.'))
+            if output_format not in self.output_sinks:
+                output_format = 'xlsx'
+        if output_format not in self.output_sinks:
+            raise ValueError(f"Unknown output format: {output_format}")
+        return output_format
+
+    def open_sink(self, output_path, output_format=None, checkpoint=None):
+        """Create the output sink for a path, by format name or file extension
+
+        With a resumed Checkpoint the existing output is reopened and kept
+        up to the checkpoint's rows.
+        """
+        sink_class = self.output_sinks[self.output_format_for(output_path, output_format)]
+        if output_path == STDOUT_PATH and not sink_class.streams:
+            raise ValueError(f"{sink_class.extension.lstrip('.').upper()} output cannot be written to stdout")
+        if checkpoint is not None and checkpoint.offset:
+            return sink_class(output_path, resume_rows=checkpoint.rows)
+        return sink_class(output_path)
+
+    def checkpoint_for(self, file_path, output_path, output_format=None, segmentation='cluster', dedup=None,
+                       variant='auto'):
+        """Return the Checkpoint to resume and keep for an output, or None if its format cannot resume
+
+        A checkpoint left by an earlier run over the same image with the
+        same firmware variant is picked up; otherwise the returned one
+        starts at byte 0.
+        """
+        output_format = self.output_format_for(output_path, output_format)
+        if output_path == STDOUT_PATH or not self.output_sinks[output_format].resumable:
+            return None
+        variant = self.resolve_variant(file_path, variant)
+        return Checkpoint.resume(file_path, output_path, segmentation, output_format, dedup, variant.name)
+
+    def resolve_variant(self, file_path, variant='auto'):
+        """Return the FirmwareVariant to decode a file with
+
+        variant may be a FirmwareVariant, a name in FIRMWARE_VARIANTS, or
+        'auto' to detect it from the file (see detect_variant).
+        """
+        if isinstance(variant, FirmwareVariant):
+            return variant
+        if variant == 'auto':
+            return self.detect_variant(file_path)
+        try:
+            return FIRMWARE_VARIANTS[variant]
+        except KeyError:
+            raise ValueError(f"Unknown firmware variant: {variant}") from None
+
+    def detect_variant(self, file_path, sample_bytes=VARIANT_SAMPLE_BYTES):
+        """Detect which firmware variant wrote an image from its first sample_bytes
+
+        Returns the variant with the most marker hits in the sample, if it
+        has at least VARIANT_MAJORITY of them all. If no markers occur or no
+        variant has such a majority (no GPS log near the start, or mixed
+        firmware), the DEFAULT_VARIANT, which accepts every spelling, is
+        returned instead.
+        """
+        with open(file_path, 'rb') as f:
+            sample = f.read(sample_bytes)
+        hits = {name: variant.markers.count(sample) for name, variant in FIRMWARE_VARIANTS.items()
+                if variant.markers is not None}
+        total = sum(hits.values())
+        best = max(hits, key=hits.get, default=None)
+        if total and hits[best] >= VARIANT_MAJORITY * total:
+            return FIRMWARE_VARIANTS[best]
+        return FIRMWARE_VARIANTS[DEFAULT_VARIANT]
+
+    def process_batch(self, inputs, output_dir=None, output_format='xlsx', workers=None, report_path=None,
+                      progress_callback=None, segmentation='cluster', engine='auto', cancel=None, dedup=False,
+                      pipeline=False, variant='auto', trips=None):
+        """Decode many images in parallel, one output per file, and write a JSON summary report
+
+        inputs may mix files, directories and glob patterns. Files are fanned
+        out over a ProcessPoolExecutor with `workers` processes (default: all
+        cores). Outputs go next to each input unless output_dir is given.
+        Returns the report dict; the report is also saved to report_path
+        (default: onstar_batch_report.json in output_dir or the current directory).
+        Cancelling the CancelToken cancel skips the files not started yet; they
+        are reported with the error "Cancelled". Workers share the decoder's
+        ResultCache settings, if it has a cache. With dedup, each file is
+        de-duplicated and its entry reports the number of duplicates removed.
+        pipeline is passed on to each file's extract_gps_data. variant names
+        the firmware variant, or 'auto' to detect it per file; each entry
+        records the variant used. trips, a dict of TripSimplifier arguments,
+        simplifies each file's track and adds its per-trip stats to its entry.
+        """
+        extension = self.output_sinks[output_format].extension
+        skip = tuple(sink.extension for sink in self.output_sinks.values()) + ('.json',)
+        paths = expand_input_paths(inputs, skip)
+        if output_dir:
+            os.makedirs(output_dir, exist_ok=True)
+        jobs = []
+        used = set()
+        for path in paths:
+            base = os.path.splitext(os.path.basename(path))[0]
+            folder = output_dir or os.path.dirname(path)
+            output_path = os.path.join(folder, base + extension)
+            n = 2
+            while output_path in used:
+                output_path = os.path.join(folder, f"{base}_{n}{extension}")
+                n += 1
+            used.add(output_path)
+            jobs.append((path, output_path))
+        options = {'segmentation': segmentation, 'engine': engine, 'output_format': output_format,
+                   'cache': (self.cache.directory, self.cache.max_bytes) if self.cache is not None else None,
+                   'dedup': dedup, 'pipeline': pipeline, 'variant': variant, 'trips': trips}
+        started = time.perf_counter()
+        results = {}
+        if jobs:
+            from concurrent.futures import ProcessPoolExecutor, as_completed
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                futures = {pool.submit(_decode_file_job, path, output_path, options): path
+                           for path, output_path in jobs}
+                for done, future in enumerate(as_completed(futures), 1):
+                    path = futures[future]
+                    try:
+                        results[path] = future.result()
+                    except Exception as e:
+                        results[path] = {'input': path, 'output': None, 'bytes': None, 'entries': 0,
+                                         'seconds': None, 'error': f"Worker failed: {str(e)}"}
+                    if progress_callback:
+                        progress_callback(f"Processed {done}/{len(jobs)}: {os.path.basename(path)}",
+                                          100 * done // len(jobs))
+                    if cancel is not None and cancel.cancelled:
+                        for pending in futures:
+                            pending.cancel()
+                        break
+        files = [results.get(path) or {'input': path, 'output': None, 'bytes': None, 'entries': 0,
+                                       'seconds': None, 'error': "Cancelled"}
+                 for path, _ in jobs]
+        report = {
+            'files': files,
+            'total_files': len(files),
+            'failed_files': sum(1 for f in files if f['error']),
+            'total_entries': sum(f['entries'] for f in files),
+            'total_bytes': sum(f['bytes'] or 0 for f in files),
+            'workers': workers or os.cpu_count(),
+            'seconds': round(time.perf_counter() - started, 3),
+        }
+        if report_path is None:
+            report_path = os.path.join(output_dir or os.getcwd(), 'onstar_batch_report.json')
+        with open(report_path, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        report['report_path'] = report_path
+        return report
+
     def find_gps_blocks_binary(self, data):
         """Find GPS data blocks in binary data"""
         blocks = []
-        text_data = data.decode('latin-1', errors='ignore')
-        gps_patterns = [
-            b'gps_tow=',
-            b'gps_week=', 
-            b'utc_year=',
-            b'lat=',
-            b'lon='
-        ]
-        keyword_positions = []
-        for pattern in gps_patterns:
-            pattern_str = pattern.decode('latin-1')
-            for match in re.finditer(re.escape(pattern_str), text_data):
-                keyword_positions.append(match.start())
-        if not keyword_positions:
-            return blocks
-        keyword_positions.sort()
-        i = 0
-        while i < len(keyword_positions):
-            block_start = keyword_positions[i]
-            block_end = block_start + 200
-            j = i + 1
-            while j < len(keyword_positions) and keyword_positions[j] - block_start < 1000:
-                block_end = max(block_end, keyword_positions[j] + 200)
-                j += 1
-            start_pos = max(0, block_start - 50)
-            end_pos = min(len(text_data), block_end + 50)
-            block_text = text_data[start_pos:end_pos]
-            blocks.append(block_text)
-            i = j
+        block_start = None
+        block_end = None
+        for pos in self.iter_keyword_positions(data):
+            if block_start is not None and pos - block_start < BLOCK_CLUSTER_SPAN:
+                block_end = max(block_end, pos + BLOCK_KEYWORD_PAD)
+                continue
+            if block_start is not None:
+                blocks.append(self._slice_block(data, block_start, block_end))
+            block_start, block_end = pos, pos + BLOCK_KEYWORD_PAD
+        if block_start is not None:
+            blocks.append(self._slice_block(data, block_start, block_end))
         return blocks
 
-    def parse_gps_block(self, block_text):
-        """Parse a GPS data block into structured data"""
-        entry = {
-            'lat': 'ERROR',
-            'long': 'ERROR', 
-            'utc_year': '',
-            'utc_month': '',
-            'utc_day': '',
-            'utc_hour': '',
-            'utc_min': '',
-            'timestamp_time': 'ERROR',
-            'lat_hex': '',
-            'lon_hex': ''
-        }
+    def _slice_block(self, data, block_start, block_end, base=0):
+        """Return the padded text of one block; base is the absolute offset of data[0]"""
+        start_pos = max(0, block_start - BLOCK_EDGE_PAD) - base
+        end_pos = block_end + BLOCK_EDGE_PAD - base
+        return bytes(data[start_pos:end_pos]).decode('latin-1')
+
+    def iter_gps_blocks(self, f, chunk_size=STREAM_CHUNK_SIZE):
+        """Yield the same GPS blocks as find_gps_blocks_binary from a binary file object"""
+        for _, block in self.iter_block_segments(f, chunk_size):
+            yield bytes(block).decode('latin-1')
+
+    def iter_segments(self, f, segmentation='cluster', chunk_size=STREAM_CHUNK_SIZE, anchor=RECORD_ANCHOR,
+                      cancel=None, progress=None):
+        """Yield (offset, memoryview) segments using the chosen segmentation mode
+
+        A CancelToken passed as cancel is checked before every chunk is read,
+        and a ProgressReporter passed as progress is given f.tell() after it.
+        """
+        if segmentation == 'cluster':
+            return self.iter_block_segments(f, chunk_size, cancel, progress)
+        if segmentation == 'record':
+            return self.iter_record_segments(f, chunk_size, anchor, cancel=cancel, progress=progress)
+        raise ValueError(f"Unknown segmentation mode: {segmentation}")
+
+    def iter_block_segments(self, f, chunk_size=STREAM_CHUNK_SIZE, cancel=None, progress=None):
+        """Yield (offset, memoryview) for each clustered GPS block in a binary file object
+
+        The blocks are the ones find_gps_blocks_binary returns. The file is
+        read in fixed-size chunks and only the bytes still needed by an open
+        block are kept between reads, so memory stays bounded by chunk_size
+        no matter how large the image is.
+        """
+        buf = b''
+        buf_start = 0      # absolute file offset of buf[0]
+        scan_pos = 0       # absolute offset where the keyword scan resumes
+        block_start = None
+        block_end = None
+        pending = []       # finished blocks still waiting for their trailing pad
+        eof = False
+        while not eof:
+            if cancel is not None:
+                cancel.raise_if_cancelled()
+            chunk = f.read(chunk_size)
+            eof = not chunk
+            if progress is not None:
+                progress.update(f.tell())
+            buf += chunk
+            buf_end = buf_start + len(buf)
+            # A keyword that starts near the end of the buffer may be cut in
+            # half, so hold back the overlap window until the next read
+            limit = buf_end if eof else buf_end - (GPS_KEYWORD_MAX_LEN - 1)
+            for pos in self.iter_keyword_positions(buf, scan_pos - buf_start, limit - buf_start):
+                pos += buf_start
+                if block_start is not None and pos - block_start < BLOCK_CLUSTER_SPAN:
+                    block_end = max(block_end, pos + BLOCK_KEYWORD_PAD)
+                    continue
+                if block_start is not None:
+                    pending.append((block_start, block_end))
+                block_start, block_end = pos, pos + BLOCK_KEYWORD_PAD
+            scan_pos = max(scan_pos, limit)
+            if eof and block_start is not None:
+                pending.append((block_start, block_end))
+                block_start = None
+            while pending and (eof or pending[0][1] + BLOCK_EDGE_PAD <= buf_end):
+                start, end = pending.pop(0)
+                start = max(0, start - BLOCK_EDGE_PAD)
+                yield start, memoryview(buf)[start - buf_start:end + BLOCK_EDGE_PAD - buf_start]
+            # Drop everything in front of the oldest byte we may still slice
+            keep_from = scan_pos
+            if pending:
+                keep_from = min(keep_from, pending[0][0] - BLOCK_EDGE_PAD)
+            if block_start is not None:
+                keep_from = min(keep_from, block_start - BLOCK_EDGE_PAD)
+            if keep_from > buf_start:
+                buf = buf[keep_from - buf_start:]
+                buf_start = keep_from
+
+    def iter_record_segments(self, f, chunk_size=STREAM_CHUNK_SIZE, anchor=RECORD_ANCHOR,
+                             max_record=RECORD_MAX_BYTES, cancel=None, progress=None):
+        """Yield (offset, memoryview) for each log record in a binary file object
+
+        A record runs from one anchor keyword to the next, capped at
+        max_record bytes, so every slice holds exactly one fix and parsing
+        cost no longer grows with how densely records are packed. Fields
+        logged before the anchor of their record are not seen; pick the
+        first field of the record layout as the anchor.
+        """
+        buf = b''
+        buf_start = 0      # absolute file offset of buf[0]
+        scan_pos = 0       # absolute offset where the anchor search resumes
+        record_start = None
+        eof = False
+        while not eof:
+            if cancel is not None:
+                cancel.raise_if_cancelled()
+            chunk = f.read(chunk_size)
+            eof = not chunk
+            if progress is not None:
+                progress.update(f.tell())
+            buf += chunk
+            buf_end = buf_start + len(buf)
+            limit = buf_end if eof else buf_end - (len(anchor) - 1)
+            view = memoryview(buf)
+            pos = buf.find(anchor, scan_pos - buf_start, limit - buf_start + len(anchor) - 1)
+            while pos != -1:
+                pos += buf_start
+                if record_start is not None:
+                    yield record_start, view[record_start - buf_start:min(pos, record_start + max_record) - buf_start]
+                record_start = pos
+                pos = buf.find(anchor, pos + len(anchor) - buf_start, limit - buf_start + len(anchor) - 1)
+            scan_pos = max(scan_pos, limit)
+            if record_start is not None and (eof or record_start + max_record <= scan_pos):
+                yield record_start, view[record_start - buf_start:record_start + max_record - buf_start]
+                record_start = None
+            keep_from = scan_pos if record_start is None else min(scan_pos, record_start)
+            if keep_from > buf_start:
+                buf = buf[keep_from - buf_start:]
+                buf_start = keep_from
+
+    def iter_fixes_parallel(self, file_path, workers=None, segmentation='cluster', engine='auto',
+                            progress_callback=None, stats=None, cancel=None, variant=None):
+        """Yield the fixes of a large file scanned and parsed by several processes
+
+        The file is split into byte-range shards that workers scan from
+        their own mmap of it. Each shard owns exactly the segments that start
+        at or after its first sync point (see iter_buffer_segments), so the
+        merged output matches a serial iter_fixes run, minus its None
+        entries. Fixes are yielded in file order as shards finish. When
+        plan_shards leaves a single shard, the file is decoded in this
+        process instead.
+        """
+        file_size = os.path.getsize(file_path)
+        if file_size == 0:
+            return
+        workers = workers or os.cpu_count() or 1
+        shard_size = max(MIN_SHARD_BYTES, -(-file_size // (workers * SHARDS_PER_WORKER)))
+        shards = self.plan_shards(file_path, shard_size, segmentation)
+        if len(shards) == 1:
+            if progress_callback and file_size > shard_size:
+                progress_callback("No sync points between shards (dense image), decoding in one process...", 10)
+            progress = ProgressReporter(progress_callback, file_size) if progress_callback else None
+            with open(file_path, 'rb') as f:
+                for fix in self.iter_fixes(f, segmentation, engine, stats, variant, cancel, progress):
+                    if fix:
+                        yield fix
+            return
+        last_offset = -1
+        yielded = 0
+        progress = ProgressReporter(progress_callback, file_size) if progress_callback else None
+        import multiprocessing
+        from concurrent.futures import ProcessPoolExecutor, wait
+        # Set on the way out (cancelled or abandoned) so running shards stop within a chunk
+        stop = multiprocessing.Event()
+        with ProcessPoolExecutor(max_workers=min(workers, len(shards)), initializer=_init_shard_worker,
+                                 initargs=(stop,)) as pool:
+            futures = [pool.submit(_decode_shard, file_path, start, end, segmentation, engine, stats is not None,
+                                   variant)
+                       for start, end in shards]
+            try:
+                for done, future in enumerate(futures, 1):
+                    if cancel is not None:
+                        while not wait([future], timeout=0.1).done:
+                            cancel.raise_if_cancelled()
+                        cancel.raise_if_cancelled()
+                    fixes, shard_stats = future.result()
+                    if stats is not None:
+                        stats.merge(shard_stats)
+                    for fix in fixes:
+                        # Segments start at strictly increasing offsets; anything
+                        # at or before the last one is a shard-boundary duplicate
+                        if fix.offset <= last_offset:
+                            continue
+                        last_offset = fix.offset
+                        yielded += 1
+                        yield fix
+                    if progress:
+                        progress.update(shards[done - 1][1], yielded, force=done == len(shards))
+            finally:
+                # Stopped early (cancelled or abandoned): drop the shards not started yet
+                for future in futures:
+                    future.cancel()
+                stop.set()
+
+    def plan_shards(self, file_path, shard_size, segmentation='cluster'):
+        """Split a file into (start, end) byte ranges of about shard_size for iter_fixes_parallel
+
+        In cluster mode each boundary is moved to the first sync point (see
+        iter_buffer_segments) within SHARD_SYNC_SEARCH_BYTES after it. A
+        boundary with none there, as on a dense image, is dropped and its
+        shard merged into the one before it, so no worker scans past its
+        own range looking for one.
+        """
+        file_size = os.path.getsize(file_path)
+        boundaries = list(range(shard_size, file_size, shard_size))
+        if segmentation == 'cluster' and boundaries:
+            with open(file_path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                synced = []
+                for boundary in boundaries:
+                    limit = min(file_size, boundary + SHARD_SYNC_SEARCH_BYTES)
+                    pos = self.find_cluster_sync_point(mm, boundary, limit)
+                    if pos < limit:
+                        synced.append(pos)
+                boundaries = synced
+        bounds = [0, *boundaries, file_size]
+        return list(zip(bounds, bounds[1:]))
+
+    def iter_buffer_segments(self, buf, start, end, segmentation='cluster', anchor=RECORD_ANCHOR, at_block=False,
+                             cancel=None, progress=None):
+        """Yield (offset, slice) for the segments a byte range of an in-memory buffer owns
+
+        Used by the parallel mode on an mmap. A 'record' shard owns the
+        records whose anchor lies in [start, end). A 'cluster' shard owns the
+        blocks that start from the first sync point at or after start up to
+        the first sync point at or after end, where a sync point is a keyword
+        with no other keyword in the BLOCK_CLUSTER_SPAN bytes before it: such
+        a keyword always starts a new block, however the scan began. The
+        search for the first one stops at end; plan_shards puts the
+        boundaries on sync points so neither search goes far. With
+        at_block, start is known to be a block's first keyword (a Checkpoint
+        offset) and the range starts there. A CancelToken passed as cancel
+        is checked, and a ProgressReporter passed as progress updated, every
+        STREAM_CHUNK_SIZE bytes scanned in cluster mode.
+        """
+        size = len(buf)
+        if segmentation == 'record':
+            pos = buf.find(anchor, start, min(size, end + len(anchor) - 1))
+            while pos != -1:
+                if cancel is not None:
+                    cancel.raise_if_cancelled()
+                next_pos = buf.find(anchor, pos + len(anchor))
+                record_end = min(size, pos + RECORD_MAX_BYTES)
+                if next_pos != -1:
+                    record_end = min(record_end, next_pos)
+                yield pos, buf[pos:record_end]
+                pos = next_pos if next_pos != -1 and next_pos < end else -1
+            return
+        if segmentation != 'cluster':
+            raise ValueError(f"Unknown segmentation mode: {segmentation}")
+        first = start if at_block else self.find_cluster_sync_point(buf, start, end)
+        if first == end:
+            return  # the shard before this one owns every block in it
+        stop = self.find_cluster_sync_point(buf, end) if end < size else size
+        block_start = None
+        block_end = None
+        for window in range(first, stop, STREAM_CHUNK_SIZE):
+            if cancel is not None:
+                cancel.raise_if_cancelled()
+            if progress is not None:
+                progress.update(window)
+            for pos in self.iter_keyword_positions(buf, window, min(stop, window + STREAM_CHUNK_SIZE)):
+                if block_start is not None and pos - block_start < BLOCK_CLUSTER_SPAN:
+                    block_end = max(block_end, pos + BLOCK_KEYWORD_PAD)
+                    continue
+                if block_start is not None:
+                    offset = max(0, block_start - BLOCK_EDGE_PAD)
+                    yield offset, buf[offset:block_end + BLOCK_EDGE_PAD]
+                block_start, block_end = pos, pos + BLOCK_KEYWORD_PAD
+        if block_start is not None:
+            offset = max(0, block_start - BLOCK_EDGE_PAD)
+            yield offset, buf[offset:block_end + BLOCK_EDGE_PAD]
+
+    def find_cluster_sync_point(self, buf, pos, limit=None):
+        """Return the first keyword in buf[pos:limit] that is guaranteed to start a block, or limit
+
+        limit defaults to len(buf).
+        """
+        if limit is None:
+            limit = len(buf)
+        previous = None
+        for hit in self.iter_keyword_positions(buf, max(0, pos - BLOCK_CLUSTER_SPAN + 1), limit):
+            if hit >= pos and (previous is None or hit - previous >= BLOCK_CLUSTER_SPAN):
+                return hit
+            previous = hit
+        return limit
+
+    def iter_keyword_positions(self, data, start=0, end=None):
+        """Yield offsets of GPS keywords that start within data[start:end], in order
+
+        Works directly on bytes, memoryview or mmap objects in a single pass.
+        Keywords may run past end as long as they start before it.
+        """
+        if end is None:
+            end = len(data)
+        endpos = min(len(data), end + GPS_KEYWORD_MAX_LEN - 1)
+        for match in GPS_KEYWORD_RE.finditer(data, start, endpos):
+            pos = match.start() - GPS_KEYWORD_EQ_OFFSETS[match.lastindex]
+            if pos >= end:
+                break
+            if pos >= start:
+                yield pos
+
+    def iter_fixes(self, f, segmentation='cluster', engine='auto', stats=None, variant=None, cancel=None,
+                   progress=None):
+        """Yield one GpsFix (or None) per segment of a binary file object
+
+        engine 'python' parses each segment on its own; 'numpy' collects the
+        raw fields of NUMPY_BATCH_SIZE segments and decodes them in one shot
+        with decode_fields_batch. 'auto' picks NumPy when it is installed,
+        and the Python path is always the fallback. With a DecodeStats as
+        stats, blocks are counted and scan/parse time is measured. Fields
+        are searched with a FirmwareVariant's specs if one is given, else
+        with every alias (see resolve_variant); record segmentation then
+        starts records at the variant's record_anchor. A CancelToken passed
+        as cancel is also checked by the scanner, and a ProgressReporter
+        passed as progress updated, once per chunk.
+        """
+        anchor = variant.record_anchor if variant is not None else RECORD_ANCHOR
+        segments = self.iter_segments(f, segmentation, anchor=anchor, cancel=cancel, progress=progress)
+        return self.decode_segments(segments, engine, stats, variant)
+
+    def iter_fixes_from(self, file_path, offset, segmentation='cluster', engine='auto', stats=None, variant=None,
+                        cancel=None, progress=None):
+        """Yield one GpsFix (or None) per segment from a block start at offset to the end of a file"""
+        with open(file_path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            anchor = variant.record_anchor if variant is not None else RECORD_ANCHOR
+            segments = self.iter_buffer_segments(mm, offset, len(mm), segmentation, anchor, at_block=True,
+                                                 cancel=cancel, progress=progress)
+            yield from self.decode_segments(segments, engine, stats, variant)
+
+    def decode_segments(self, segments, engine='auto', stats=None, variant=None):
+        """Yield one GpsFix (or None) per (offset, block) segment; see iter_fixes for engines"""
+        if stats is not None:
+            return self._decode_segments_timed(segments, engine, stats, variant)
+        return self._decode_segments(segments, engine, variant)
+
+    def _decode_segments_timed(self, segments, engine, stats, variant=None):
+        """decode_segments with block counters and scan/parse timers"""
+        clock = time.perf_counter
+        seconds = stats.seconds
+
+        def timed_segments():
+            iterator = iter(segments)
+            while True:
+                start = clock()
+                segment = next(iterator, None)
+                seconds['scan'] += clock() - start
+                if segment is None:
+                    return
+                stats.blocks_found += 1
+                yield segment
+
+        fixes = self._decode_segments(timed_segments(), engine, variant)
+        done = object()
+        while True:
+            scanned = seconds['scan']
+            start = clock()
+            fix = next(fixes, done)
+            # Time spent pulling segments inside next() belongs to the scan
+            seconds['parse'] += clock() - start - (seconds['scan'] - scanned)
+            if fix is done:
+                return
+            if fix:
+                stats.blocks_parsed += 1
+            yield fix
+
+    def _decode_segments(self, segments, engine, variant=None):
+        if engine not in ('auto', 'python', 'numpy'):
+            raise ValueError(f"Unknown decode engine: {engine}")
+        if engine == 'python' or load_numpy() is None:
+            for offset, block in segments:
+                yield self.parse_gps_block(block, offset, variant)
+            return
+        specs = variant.specs if variant is not None else GPS_FIELD_SPECS
+        batch = []
+        for offset, block in segments:
+            try:
+                batch.append((offset, self.extract_gps_fields(block, specs)))
+            except Exception:
+                # Keep file order and count the segment as parse_gps_block's None would be
+                if batch:
+                    yield from self.decode_fields_batch(batch)
+                    batch = []
+                yield None
+                continue
+            if len(batch) >= NUMPY_BATCH_SIZE:
+                yield from self.decode_fields_batch(batch)
+                batch = []
+        if batch:
+            yield from self.decode_fields_batch(batch)
+
+    def decode_fields_batch(self, batch):
+        """Decode a list of (offset, fields) pairs into GpsFix objects with NumPy
+
+        Produces the same fixes as parse_gps_block: coordinates are read from
+        the concatenated hex as little-endian float64 and range-checked as
+        arrays, and GPS time goes through GpsTimeConverter.to_unix_ms_array.
+        """
+        count = len(batch)
+        weeks = np.full(count, -1, dtype=np.int64)
+        tows = np.full(count, -1, dtype=np.int64)
+        coords = {}
+        for name, limit in (('lat_hex', 90), ('lon_hex', 180)):
+            rows = [i for i, (_, fields) in enumerate(batch) if fields.get(name)]
+            values = np.full(count, np.nan)
+            if rows:
+                raw = bytes.fromhex(''.join(batch[i][1][name] for i in rows))
+                values[rows] = np.frombuffer(raw, dtype='<f8') / 10000000.0
+            valid = (values >= -limit) & (values <= limit)
+            coords[name] = (values.tolist(), valid.tolist())
+        for i, (_, fields) in enumerate(batch):
+            week = fields.get('gps_week')
+            tow = fields.get('gps_tow')
+            # Out-of-range values only need to fail the range check below
+            if week is not None and tow is not None and week <= MAX_GPS_WEEK and tow <= GPS_WEEK_MS:
+                weeks[i] = week
+                tows[i] = tow
+        has_time = (weeks >= 0) & (tows >= 0)
+        timestamps = GPS_TIME.to_unix_ms_array(weeks, tows).tolist()
+        has_time = has_time.tolist()
+        lats, lat_valid = coords['lat_hex']
+        lons, lon_valid = coords['lon_hex']
+        fixes = []
+        for i, (offset, fields) in enumerate(batch):
+            fixes.append(GpsFix(
+                lat=lats[i] if lat_valid[i] else None,
+                lon=lons[i] if lon_valid[i] else None,
+                utc_year=fields.get('utc_year'),
+                utc_month=fields.get('utc_month'),
+                utc_day=fields.get('utc_day'),
+                utc_hour=fields.get('utc_hour'),
+                utc_min=fields.get('utc_min'),
+                timestamp_ms=timestamps[i] if has_time[i] else None,
+                lat_hex=fields.get('lat_hex'),
+                lon_hex=fields.get('lon_hex'),
+                gps_week=fields.get('gps_week'),
+                gps_tow=fields.get('gps_tow'),
+                offset=offset
+            ))
+        return fixes
+
+    def parse_gps_block(self, block_text, offset=None, variant=None):
+        """Parse a GPS data block into a GpsFix, with a FirmwareVariant's field specs if given"""
         try:
-            gps_tow = self.extract_number_flexible(block_text, [r'gps_tow=(\d+)', r'tow=(\d+)'])
-            gps_week = self.extract_number_flexible(block_text, [r'gps_week=(\d+)', r'week=(\d+)'])
-            utc_year = self.extract_number_flexible(block_text, [r'utc_year=(\d+)', r'year=(\d{4})'])
-            utc_month = self.extract_number_flexible(block_text, [r'utc_month=(\d+)', r'month=(\d+)'])
-            utc_day = self.extract_number_flexible(block_text, [r'utc_day=(\d+)', r'day=(\d+)'])
-            utc_hour = self.extract_number_flexible(block_text, [r'utc_hour=(\d+)', r'hour=(\d+)'])
-            utc_min = self.extract_number_flexible(block_text, [r'utc_min=(\d+)', r'min=(\d+)'])
-            entry['utc_year'] = utc_year if utc_year is not None else ''
-            entry['utc_month'] = utc_month if utc_month is not None else ''
-            entry['utc_day'] = utc_day if utc_day is not None else ''
-            entry['utc_hour'] = utc_hour if utc_hour is not None else ''
-            entry['utc_min'] = utc_min if utc_min is not None else ''
-            lat_hex = self.extract_hex_flexible(block_text, [r'lat=([0-9A-Fa-f]{16})', r'lat=([0-9A-Fa-f\s]{16,})'])
-            lon_hex = self.extract_hex_flexible(block_text, [r'lon=([0-9A-Fa-f]{16})', r'lon=([0-9A-Fa-f\s]{16,})'])
-            entry['lat_hex'] = lat_hex if lat_hex else ''
-            entry['lon_hex'] = lon_hex if lon_hex else ''
-            if gps_tow is not None and gps_week is not None:
-                try:
-                    if 0 <= gps_tow <= 604800000 and 0 <= gps_week <= 4000:
-                        gps_tow_sec = gps_tow / 1000.0
-                        gps_week_sec = gps_week * 604800
-                        total_seconds = gps_week_sec + gps_tow_sec
-                        gps_timestamp = self.gps_epoch.timestamp() + total_seconds
-                        dt = datetime.fromtimestamp(gps_timestamp, tz=timezone.utc)
-                        entry['timestamp_time'] = dt.strftime('%Y-%m-%d %H:%M:%S.%f')[:-3]
-                        # Check if date is before 2010
-                    if dt.year < 2010:
-                        entry['timestamp_time'] = 'DATE BEFORE 2010 ERROR'
-                except Exception:
-                    pass
-            if lat_hex:
-                try:
-                    clean_hex = re.sub(r'[^0-9A-Fa-f]', '', lat_hex)
-                    if len(clean_hex) == 16:
-                        lat_bytes = bytes.fromhex(clean_hex)
-                        lat_raw = struct.unpack('<d', lat_bytes)[0]
-                        lat_decimal = lat_raw / 10000000.0
-                        if -90 <= lat_decimal <= 90:
-                            entry['lat'] = lat_decimal
-                except Exception:
-                    entry['lat'] = 'ERROR'
-            if lon_hex:
-                try:
-                    clean_hex = re.sub(r'[^0-9A-Fa-f]', '', lon_hex)
-                    if len(clean_hex) == 16:
-                        lon_bytes = bytes.fromhex(clean_hex)
-                        lon_raw = struct.unpack('<d', lon_bytes)[0]
-                        lon_decimal = lon_raw / 10000000.0
-                        if -180 <= lon_decimal <= 180:
-                            entry['long'] = lon_decimal
-                except Exception:
-                    entry['long'] = 'ERROR'
-            return entry
+            fields = self.extract_gps_fields(block_text, variant.specs if variant is not None else GPS_FIELD_SPECS)
         except Exception:
             return None
+        fix = GpsFix(
+            utc_year=fields.get('utc_year'),
+            utc_month=fields.get('utc_month'),
+            utc_day=fields.get('utc_day'),
+            utc_hour=fields.get('utc_hour'),
+            utc_min=fields.get('utc_min'),
+            lat_hex=fields.get('lat_hex'),
+            lon_hex=fields.get('lon_hex'),
+            gps_week=fields.get('gps_week'),
+            gps_tow=fields.get('gps_tow'),
+            offset=offset
+        )
+        fix.timestamp_ms = gps_time_to_ms(fix.gps_week, fix.gps_tow)
+        fix.lat = self.decode_coordinate(fix.lat_hex, 90)
+        fix.lon = self.decode_coordinate(fix.lon_hex, 180)
+        return fix
 
-    def extract_number_flexible(self, text, patterns):
-        """Extract a number using multiple regex patterns"""
-        for pattern in patterns:
-            match = re.search(pattern, text)
-            if match:
-                try:
-                    value = int(match.group(1))
-                    return value
-                except:
-                    continue
+    def decode_coordinate(self, coord_hex, limit):
+        """Decode a 16-digit little-endian double hex value to degrees, or None if out of range"""
+        if not coord_hex or len(coord_hex) != 16:
+            return None
+        degrees = COORD_STRUCT.unpack(bytes.fromhex(coord_hex))[0] / 10000000.0
+        if -limit <= degrees <= limit:
+            return degrees
         return None
 
-    def extract_hex_flexible(self, text, patterns):
-        """Extract hex value using multiple regex patterns"""
-        for pattern in patterns:
-            match = re.search(pattern, text)
+    def extract_gps_fields(self, block, specs=GPS_FIELD_SPECS):
+        """Extract every GPS field from a block using the precompiled field specs
+
+        Returns a dict keyed by field name (gps_tow, utc_year, lat_hex, ...)
+        holding ints, or 16-character hex strings for lat_hex/lon_hex. Each
+        field takes the first match of its preferred pattern, else of its
+        fallback alias; a digit run too long for int() drops only that
+        field. Fallback hex values have their non-hex characters removed and
+        are cut to 16 digits. specs defaults to every alias; pass a
+        FirmwareVariant's specs to search only its spellings.
+        """
+        if isinstance(block, str):
+            block = block.encode('latin-1', errors='replace')
+        fields = {}
+        for field, preferred_re, fallback_re in specs:
+            match = preferred_re.search(block)
             if match:
-                hex_val = match.group(1)
-                clean_hex = re.sub(r'[^0-9A-Fa-f]', '', hex_val)
-                if len(clean_hex) >= 16:
-                    return clean_hex[:16]
-        return None
+                value = match.group(1)
+                if field in GPS_HEX_FIELDS:
+                    fields[field] = value.decode('ascii')
+                    continue
+                try:
+                    fields[field] = int(value)
+                    continue
+                except ValueError:
+                    pass  # more digits than int() accepts: try the alias, then drop just this field
+            if fallback_re is None:
+                continue
+            match = fallback_re.search(block)
+            if not match:
+                continue
+            value = match.group(1)
+            if field in GPS_HEX_FIELDS:
+                value = NON_HEX_RE.sub(b'', value)
+                if len(value) >= 16:
+                    fields[field] = value[:16].decode('ascii')
+                continue
+            try:
+                fields[field] = int(value)
+            except ValueError:
+                pass
+        return fields
 
     def is_valid_entry(self, entry):
         """Check if entry has at least some valid data"""
         if not entry:
             return False
-        if entry['lat'] == 'ERROR' or entry['long'] == 'ERROR':
-            return False
-        has_utc = all(entry.get(k) not in ('', None) for k in ['utc_year', 'utc_month', 'utc_day', 'utc_hour', 'utc_min'])
-        if not has_utc and entry['timestamp_time'] == 'ERROR':
-            return False
-        # Filter out dates before 2010
-        if entry['timestamp_time'] != 'ERROR':
-            try:
-                timestamp_year = int(entry['timestamp_time'][:4])
-                if timestamp_year < 2010:
-                    return False
-            except (ValueError, TypeError):
-                pass
+        return self.rejection_reason(entry) is None
 
-        return True
+    def rejection_reason(self, entry):
+        """Return why a parsed GpsFix would be dropped ('bad_lat', 'bad_lon', 'missing_time'), or None"""
+        if entry.lat is None:
+            return 'bad_lat'
+        if entry.lon is None:
+            return 'bad_lon'
+        has_utc = all(getattr(entry, k) is not None for k in UTC_FIELDS)
+        if not has_utc and entry.timestamp_ms is None:
+            return 'missing_time'
+        # Fixes dated before 2010 are kept; the writers label their time as an error
+        return None
 
-    def extract_gps_data_cli(self, file_path, output_xlsx_path):
-        """Extract GPS data from OnStar binary file and decode it to XLSX (CLI version)"""
+    def extract_gps_data_cli(self, file_path, output_xlsx_path, segmentation='cluster', engine='auto',
+                             output_format=None, workers=None, stats=None, dedup=None, pipeline=False,
+                             variant='auto', trips=None):
+        """Extract GPS data from OnStar binary file and decode it to XLSX or another format (CLI version)"""
         try:
             print("Reading binary file...")
-            with open(file_path, 'rb') as f:
-                data = f.read()
-    
-            print("Finding GPS data blocks...")
-            gps_blocks = self.find_gps_blocks_binary(data)
-        
-            print(f"Parsing {len(gps_blocks)} GPS blocks...")
-            parsed_entries = []
-            for block in gps_blocks:
-                entry = self.parse_gps_block(block)
-                if entry and self.is_valid_entry(entry):
-                    parsed_entries.append(entry)
-    
-            print("Writing XLSX file...")
-            wb = Workbook()
-            ws = wb.active
-            ws.title = "GPS Data"
-            headers = ['lat', 'long', 'utc_year', 'utc_month', 'utc_day', 'utc_hour', 'utc_min', 
-                      'timestamp_time', '', '', '', '', '', '', 'lat_hex', 'lon_hex']
-            ws.append(headers)
-            for entry in parsed_entries:
-                # Convert ERROR values to actual "ERROR" strings for consistency
-                lat_val = entry['lat'] if entry['lat'] != 'ERROR' else 'ERROR'
-                long_val = entry['long'] if entry['long'] != 'ERROR' else 'ERROR'
-                timestamp_val = entry['timestamp_time'] if entry['timestamp_time'] != 'ERROR' else 'ERROR'
-    
-                ws.append([
-                    lat_val,
-                    long_val,
-                    entry['utc_year'] if entry['utc_year'] else 'ERROR',
-                    entry['utc_month'] if entry['utc_month'] else 'ERROR', 
-                    entry['utc_day'] if entry['utc_day'] else 'ERROR',
-                    entry['utc_hour'] if entry['utc_hour'] else 'ERROR',
-                    entry['utc_min'] if entry['utc_min'] else 'ERROR',
-                    timestamp_val,
-                    '', '', '', '', '', '',  # Six blank columns
-                    entry['lat_hex'],
-                    entry['lon_hex']
-                ])
-            wb.save(output_xlsx_path)
+            output_format = self.output_format_for(output_xlsx_path, output_format)
+            variant = self.resolve_variant(file_path, variant)
+            print(f"Firmware variant: {variant.description}")
+            with self.open_sink(output_xlsx_path, output_format) as sink:
+                print("Finding and parsing GPS data blocks...")
+                if workers and workers > 1:
+                    print(f"Scanning in parallel with {workers} workers...")
+                progress = ConsoleProgress(sys.stdout) if sys.stdout.isatty() else None
+                target = TripSink(sink, trips, stats) if trips is not None else sink
+                block_count = self.write_fixes(file_path, target, segmentation, engine, workers, progress, stats,
+                                               dedup=dedup, pipeline=pipeline, variant=variant)
+                if trips is not None:
+                    target.finish()
+                if progress:
+                    progress.finish()
+                if workers and workers > 1:
+                    print(f"Parsed {block_count} GPS fixes.")
+                else:
+                    print(f"Parsed {block_count} GPS blocks.")
+                print(f"Writing {output_format.upper()} file...")
+            if getattr(sink, 'sheet_count', 1) > 1:
+                print(f"Output split across {sink.sheet_count} sheets (Excel row limit).")
         
-            print(f"Found {len(parsed_entries)} valid GPS entries.")
+            print(f"Found {sink.count} valid GPS entries.")
+            if dedup is not None:
+                print(f"Removed {dedup.removed} duplicate entries.")
+            if trips is not None:
+                print(f"Trips: {trips.summary()}.")
+            if stats is not None:
+                print(stats.summary())
             print(f"Results written to: {output_xlsx_path}")
         
         except FileNotFoundError:
@@ -275,11 +3088,97 @@ class OnStarDecoder:
         except Exception as e:
             print(f"Error processing file: {e}")
 
+class FixPreview:
+    """Virtualized live table of decoded fixes
+
+    The Treeview holds only as many items as there are visible rows; the
+    scrollbar and mouse wheel move a window over a GpsFixColumns store and
+    the items are re-filled from it, so a million fixes cost no more to
+    show than a dozen. The decode thread appends to the store (append() is
+    safe to read from the GUI thread: a row is visible only once count has
+    moved past it) and refresh() polls it. While scrolled to the bottom the
+    view follows new rows.
+    """
+    COLUMNS = (('#', 70), ('Offset', 100), ('Latitude', 110), ('Longitude', 110), ('UTC', 130),
+               ('GPS Time', 170))
+
+    def __init__(self, parent, rows=10):
+        self.rows = rows
+        self.frame = ttk.Frame(parent, style='Dark.TFrame')
+        self.tree = ttk.Treeview(self.frame, columns=[name for name, _ in self.COLUMNS], show='headings',
+                                 height=rows, selectmode='none', style='Preview.Treeview')
+        for name, width in self.COLUMNS:
+            self.tree.heading(name, text=name)
+            self.tree.column(name, width=width, anchor='w', stretch=True)
+        self.scrollbar = ttk.Scrollbar(self.frame, orient='vertical', command=self.on_scrollbar)
+        self.tree.pack(side='left', fill='both', expand=True)
+        self.scrollbar.pack(side='right', fill='y')
+        self.items = [self.tree.insert('', 'end', values=()) for _ in range(rows)]
+        for widget in (self.tree, self.scrollbar):
+            widget.bind('<MouseWheel>', lambda e: self.scroll_by(-1 if e.delta > 0 else 1, 'units'))
+            widget.bind('<Button-4>', lambda e: self.scroll_by(-1, 'units'))
+            widget.bind('<Button-5>', lambda e: self.scroll_by(1, 'units'))
+        self.reset()
+
+    def reset(self, fixes=None):
+        """Show a new (possibly still growing) GpsFixColumns store from the top"""
+        self.fixes = fixes if fixes is not None else GpsFixColumns()
+        self.top = 0
+        self.follow = True
+        self.shown = None
+        self.refresh()
+
+    def on_scrollbar(self, action, amount, unit=None):
+        if action == 'moveto':
+            self.scroll_to(int(float(amount) * len(self.fixes)))
+        else:
+            self.scroll_by(int(amount), unit)
+
+    def scroll_by(self, amount, unit):
+        step = self.rows - 1 if unit == 'pages' else 1
+        self.scroll_to(self.top + amount * step)
+        return 'break'
+
+    def scroll_to(self, top):
+        last_top = max(0, len(self.fixes) - self.rows)
+        self.top = min(max(0, top), last_top)
+        self.follow = self.top >= last_top
+        self.refresh()
+
+    def refresh(self):
+        """Re-render the visible rows if the window or its contents changed"""
+        total = len(self.fixes)
+        if self.follow:
+            self.top = max(0, total - self.rows)
+        visible = (self.top, min(total, self.top + self.rows))
+        if visible == self.shown:
+            return
+        self.shown = visible
+        for i, item in enumerate(self.items):
+            row = self.top + i
+            self.tree.item(item, values=self.row_values(row) if row < total else ())
+        if total:
+            self.scrollbar.set(self.top / total, min(1.0, (self.top + self.rows) / total))
+        else:
+            self.scrollbar.set(0.0, 1.0)
+
+    def row_values(self, row):
+        fix = self.fixes[row]
+        utc = (f"{fix.utc_year}-{fix.utc_month:02d}-{fix.utc_day:02d} {fix.utc_hour:02d}:{fix.utc_min:02d}"
+               if all(getattr(fix, k) is not None for k in UTC_FIELDS) else 'ERROR')
+        offset = f"0x{fix.offset:X}" if fix.offset is not None else ''
+        return (row + 1, offset, f"{fix.lat:.6f}", f"{fix.lon:.6f}", utc, fix.timestamp_time)
+
+
 class OnStarGUI:
-    def __init__(self, root):
+    # Milliseconds between live preview refreshes while decoding
+    PREVIEW_REFRESH_MS = 200
+
+    def __init__(self, root, cache_dir=None, use_cache=True):
+        load_gui_modules()
         self.root = root
         self.root.title("OnStar GPS Decoder")
-        self.root.geometry("800x600")
+        self.root.geometry("900x800")
         self.root.configure(bg='#1a1a1a')
 
         self.style = ttk.Style()
@@ -327,6 +3226,14 @@ class OnStarGUI:
             foreground=[('disabled', '#cccccc')]
         )
     
+        self.style.configure('Dark.TCheckbutton',
+                           background='#1a1a1a',
+                           foreground='#cccccc',
+                           font=('Segoe UI', 10),
+                           focuscolor='none')
+        self.style.map('Dark.TCheckbutton',
+                      background=[('active', '#1a1a1a')])
+    
         self.style.configure('Progress.TProgressbar',
                            background='#4a9eff',
                            troughcolor='#333333',
@@ -341,9 +3248,24 @@ class OnStarGUI:
                            lightcolor='#4a9eff',
                            darkcolor='#4a9eff')
 
-        self.decoder = OnStarDecoder()
+        self.style.configure('Preview.Treeview',
+                           background='#252525',
+                           fieldbackground='#252525',
+                           foreground='#cccccc',
+                           borderwidth=0,
+                           font=('Segoe UI', 9))
+        self.style.configure('Preview.Treeview.Heading',
+                           background='#333333',
+                           foreground='#ffffff',
+                           font=('Segoe UI', 9, 'bold'))
+
+        self.result_cache = ResultCache(cache_dir)
+        self.use_cache = tk.BooleanVar(value=use_cache)
+        self.decoder = OnStarDecoder(self.result_cache if use_cache else None)
         self.input_file = None
+        self.input_files = []
         self.is_processing = False
+        self.cancel_token = None
 
         self.setup_ui()
         self.setup_drag_drop()
@@ -420,6 +3342,14 @@ class OnStarGUI:
             state='disabled'
         )
         self.process_btn.pack(side='left')
+
+        # Cancel button (enabled only while processing)
+        self.cancel_btn = ttk.Button(button_frame, text="Cancel",
+            style='Disabled.TButton',
+            command=self.cancel_processing,
+            state='disabled'
+        )
+        self.cancel_btn.pack(side='left', padx=(10, 0))
     
         # Clear button (start as disabled and gray)
         self.clear_btn = ttk.Button(button_frame, text="Clear", 
@@ -428,6 +3358,20 @@ class OnStarGUI:
             state='disabled'
         )
         self.clear_btn.pack(side='right')
+
+        # Result cache: opt out, or delete the cached results
+        self.clear_cache_btn = ttk.Button(button_frame, text="Clear Cache",
+            style='Dark.TButton',
+            command=self.clear_cache
+        )
+        self.clear_cache_btn.pack(side='right', padx=(0, 10))
+
+        self.cache_check = ttk.Checkbutton(button_frame, text="Use result cache",
+            style='Dark.TCheckbutton',
+            variable=self.use_cache,
+            command=self.toggle_cache
+        )
+        self.cache_check.pack(side='right', padx=(0, 10))
     
         # Progress section
         progress_frame = ttk.Frame(main_frame, style='Dark.TFrame')
@@ -451,6 +3395,10 @@ class OnStarGUI:
                                      foreground='#4a9eff',
                                      font=('Segoe UI', 11, 'bold'))
         self.results_label.pack(anchor='w')
+
+        # Live preview of decoded fixes
+        self.preview = FixPreview(main_frame)
+        self.preview.frame.pack(fill='x', pady=(10, 0))
     
     def setup_drag_drop(self):
         # Bind click event to drop zone
@@ -476,8 +3424,22 @@ class OnStarGUI:
         if file_path:
             self.set_input_file(file_path)
     
+    def set_input_files(self, file_paths):
+        if len(file_paths) == 1:
+            self.set_input_file(file_paths[0])
+            return
+        self.input_file = None
+        self.input_files = list(file_paths)
+        size_mb = sum(os.path.getsize(p) for p in file_paths) / (1024 * 1024)
+
+        self.drop_label.configure(text=f"Selected: {len(file_paths)} files")
+        self.file_info_label.configure(text=f"Total size: {size_mb:.2f} MB")
+        self.process_btn.configure(state='normal', style='Dark.TButton')
+        self.clear_btn.configure(state='normal', style='Dark.TButton')
+
     def set_input_file(self, file_path):
         self.input_file = file_path
+        self.input_files = []
         filename = os.path.basename(file_path)
         file_size = os.path.getsize(file_path)
         size_mb = file_size / (1024 * 1024)
@@ -492,6 +3454,7 @@ class OnStarGUI:
             return
 
         self.input_file = None
+        self.input_files = []
         self.drop_label.configure(text="Drop OnStar binary file here\nor click to browse")
         self.file_info_label.configure(text="")
         self.process_btn.configure(state='disabled', style='Disabled.TButton')
@@ -499,37 +3462,82 @@ class OnStarGUI:
         self.progress['value'] = 0
         self.results_label.configure(text="")
         self.clear_btn.configure(state='disabled', style='Disabled.TButton')
+        self.preview.reset()
     
+    def toggle_cache(self):
+        self.decoder.cache = self.result_cache if self.use_cache.get() else None
+
+    def clear_cache(self):
+        if self.is_processing:
+            return
+        try:
+            self.result_cache.clear()
+        except OSError as e:
+            messagebox.showerror("Cache Error", f"Failed to clear the result cache:\n\n{e}")
+            return
+        self.progress_label.configure(text=f"Result cache cleared ({self.result_cache.directory})")
+
     def process_file(self):
-        if not self.input_file or self.is_processing:
+        if not (self.input_file or self.input_files) or self.is_processing:
             return
         
         self.is_processing = True
+        self.cancel_token = CancelToken()
         self.process_btn.configure(state='disabled', text='Processing...')
         self.browse_btn.configure(state='disabled')
         self.clear_btn.configure(state='disabled')
+        self.cancel_btn.configure(state='normal', text='Cancel', style='Dark.TButton')
+        self.results_label.configure(text="")
+
+        if self.input_files:
+            thread = threading.Thread(target=self.process_batch_in_background,
+                                      args=(self.input_files, self.cancel_token))
+            thread.daemon = True
+            thread.start()
+            return
         
         # Generate output path
         base, _ = os.path.splitext(self.input_file)
         output_path = base + ".xlsx"
         
         # Start processing in a separate thread
+        self.preview.reset(GpsFixColumns())
         thread = threading.Thread(target=self.process_in_background, 
-                                args=(self.input_file, output_path))
+                                args=(self.input_file, output_path, self.cancel_token, self.preview.fixes))
         thread.daemon = True
         thread.start()
-    
-    def process_in_background(self, input_path, output_path):
+        self.root.after(self.PREVIEW_REFRESH_MS, self.refresh_preview)
+
+    def refresh_preview(self):
+        self.preview.refresh()
+        if self.is_processing:
+            self.root.after(self.PREVIEW_REFRESH_MS, self.refresh_preview)
+
+    def cancel_processing(self):
+        if self.is_processing and self.cancel_token:
+            self.cancel_token.cancel()
+            self.cancel_btn.configure(state='disabled', text='Cancelling...', style='Disabled.TButton')
+
+    def reset_buttons(self):
+        self.process_btn.configure(state='normal', text='Process File', style='Dark.TButton')
+        self.browse_btn.configure(state='normal')
+        self.clear_btn.configure(state='normal', style='Dark.TButton')
+        self.cancel_btn.configure(state='disabled', text='Cancel', style='Disabled.TButton')
+
+    def process_in_background(self, input_path, output_path, cancel_token=None, preview_fixes=None):
         def progress_callback(status, percent):
             self.root.after(0, self.update_progress, status, percent)
     
         try:
             entry_count, result = self.decoder.extract_gps_data(
-                input_path, output_path, progress_callback
+                input_path, output_path, progress_callback, cancel=cancel_token,
+                on_fix=preview_fixes.append if preview_fixes is not None else None
             )
         
             # Check if result is None before calling startswith
-            if isinstance(result, str) and (result.startswith("Error") or result.startswith("File not found")):
+            if result == "Cancelled":
+                self.root.after(0, self.processing_cancelled)
+            elif isinstance(result, str) and (result.startswith("Error") or result.startswith("File not found")):
                 self.root.after(0, self.processing_error, result)
             else:
                 self.root.after(0, self.processing_complete, entry_count, output_path)
@@ -537,16 +3545,41 @@ class OnStarGUI:
         except Exception as e:
             self.root.after(0, self.processing_error, str(e))
     
+    def process_batch_in_background(self, input_paths, cancel_token=None):
+        def progress_callback(status, percent):
+            self.root.after(0, self.update_progress, status, percent)
+
+        try:
+            report_dir = os.path.dirname(input_paths[0])
+            report = self.decoder.process_batch(
+                input_paths, report_path=os.path.join(report_dir, 'onstar_batch_report.json'),
+                progress_callback=progress_callback, cancel=cancel_token
+            )
+            self.root.after(0, self.batch_complete, report)
+        except Exception as e:
+            self.root.after(0, self.processing_error, str(e))
+
+    def batch_complete(self, report):
+        self.is_processing = False
+        self.reset_buttons()
+
+        cancelled = self.cancel_token is not None and self.cancel_token.cancelled
+        self.progress_label.configure(text="Processing cancelled." if cancelled else "Processing complete!")
+        self.progress['value'] = 100
+
+        result_text = (f"✓ Extracted {report['total_entries']} GPS entries from {report['total_files']} files"
+                       f" ({report['failed_files']} failed). Report:\n {os.path.basename(report['report_path'])}")
+        self.results_label.configure(text=result_text)
+
     def update_progress(self, status, percent):
+        # Calls arrive throttled (ProgressReporter), and the mainloop redraws on its own
         self.progress_label.configure(text=status)
         self.progress['value'] = percent
-        self.root.update_idletasks()
     
     def processing_complete(self, entry_count, output_path):
         self.is_processing = False
-        self.process_btn.configure(state='normal', text='Process File', style='Dark.TButton')
-        self.browse_btn.configure(state='normal')
-        self.clear_btn.configure(state='normal', style='Dark.TButton')
+        self.reset_buttons()
+        self.preview.refresh()
     
         self.progress_label.configure(text="Processing complete!")
         self.progress['value'] = 100
@@ -556,11 +3589,21 @@ class OnStarGUI:
     
         self.results_label.configure(text=result_text)
     
+    def processing_cancelled(self):
+        self.is_processing = False
+        self.reset_buttons()
+        self.preview.refresh()
+
+        self.progress_label.configure(text="Processing cancelled.")
+        self.progress['value'] = 0
+        self.results_label.configure(text=f"✗ Cancelled after {len(self.preview.fixes)} GPS entries; no file written")
+
     def processing_error(self, error_msg):
         self.is_processing = False
         self.process_btn.configure(state='normal', text='Process File')
         self.browse_btn.configure(state='normal')
         self.clear_btn.configure(state='normal')
+        self.cancel_btn.configure(state='disabled', text='Cancel', style='Disabled.TButton')
     
         self.progress_label.configure(text="Processing failed!")
         self.progress['value'] = 0
@@ -571,26 +3614,370 @@ class OnStarGUI:
     def on_file_drop(self, event):
         if self.is_processing:
             return
-        # event.data may contain a list of files; take the first one
-        file_path = event.data.strip().split()[0]
-        if os.path.isfile(file_path):
-            self.set_input_file(file_path)
+        # event.data is a Tcl list; paths with spaces arrive wrapped in braces
+        file_paths = [p for p in self.root.tk.splitlist(event.data) if os.path.isfile(p)]
+        if file_paths:
+            self.set_input_files(file_paths)
+
+class DecodeService:
+    """Long-running decoder: a warm worker pool fed by a watch folder and a localhost API
+
+    The worker processes start once, with the decoder (and openpyxl or
+    NumPy when jobs will need them) already imported, and then take one
+    job after another, so a job costs only its own decode. Jobs come from
+    submit(), from files that appear in a watched folder (see watch) and
+    from the HTTP API (see serve_http). Each runs like a --batch file; its
+    record (job, jobs) holds the batch report fields plus id, status
+    ('queued', 'running', 'done', 'failed' or 'cancelled') and submitted /
+    finished times. metrics() reports job counts and throughput. Outputs
+    go to output_dir, or next to each input.
+    """
+
+    def __init__(self, output_dir=None, output_format='xlsx', workers=None, segmentation='cluster', engine='auto',
+                 cache=None, dedup=False, pipeline=False, variant='auto', trips=None, log=None):
+        self.output_dir = output_dir
+        self.output_format = output_format
+        self.workers = workers or os.cpu_count() or 1
+        self.options = {'segmentation': segmentation, 'engine': engine,
+                        'cache': (cache.directory, cache.max_bytes) if cache is not None else None,
+                        'dedup': dedup, 'pipeline': pipeline, 'variant': variant, 'trips': trips}
+        self.log = log or (lambda message: None)
+        self.lock = threading.Lock()
+        self.records = {}
+        self.futures = {}
+        self.next_id = 1
+        self.started = time.time()
+        self.stopping = threading.Event()
+        self.threads = []
+        self.server = None
+        self.pool = None
+        if output_dir:
+            os.makedirs(output_dir, exist_ok=True)
+
+    def start(self):
+        """Start the worker processes and wait until each one is ready"""
+        from concurrent.futures import ProcessPoolExecutor
+        # Called before any service thread starts, so no worker is forked from a multi-threaded process
+        self.pool = ProcessPoolExecutor(max_workers=self.workers, initializer=_warm_service_worker,
+                                        initargs=(self.output_format, self.options['engine']))
+        for future in [self.pool.submit(os.getpid) for _ in range(self.workers)]:
+            future.result()
+        return self
+
+    def output_path_for(self, input_path, output_format):
+        base = os.path.splitext(os.path.basename(input_path))[0]
+        folder = self.output_dir or os.path.dirname(input_path)
+        return os.path.join(folder, base + OnStarDecoder.output_sinks[output_format].extension)
+
+    def contained_output_path(self, input_path, output_path):
+        """Resolve a client-supplied output path inside the output folder; raises ValueError if it escapes
+
+        The folder is output_dir, or the input's own folder. Absolute paths
+        and paths that leave the folder (through '..' or a symlink) are
+        refused, so API clients cannot overwrite files elsewhere.
+        """
+        if not output_path:
+            return None
+        folder = os.path.realpath(self.output_dir or os.path.dirname(os.path.abspath(input_path)))
+        if os.path.isabs(output_path) or os.path.splitdrive(output_path)[0]:
+            raise ValueError("output must be a path relative to the output folder")
+        resolved = os.path.realpath(os.path.join(folder, output_path))
+        if resolved == folder or os.path.commonpath([folder, resolved]) != folder:
+            raise ValueError("output must stay inside the output folder")
+        return resolved
+
+    def submit(self, input_path, output_path=None, output_format=None):
+        """Queue one image and return its job record; raises ValueError for a bad request"""
+        from concurrent.futures.process import BrokenProcessPool
+        output_format = output_format or self.output_format
+        if output_format not in OnStarDecoder.output_sinks:
+            raise ValueError(f"Unknown output format: {output_format}")
+        input_path = os.path.abspath(input_path)
+        if not os.path.isfile(input_path):
+            raise ValueError(f"File not found: {input_path}")
+        output_path = os.path.abspath(output_path or self.output_path_for(input_path, output_format))
+        options = dict(self.options, output_format=output_format)
+        with self.lock:
+            if self.stopping.is_set():
+                raise ValueError("The service is shutting down")
+            job_id = str(self.next_id)
+            self.next_id += 1
+            record = {'id': job_id, 'status': 'queued', 'input': input_path, 'output': output_path,
+                      'format': output_format, 'bytes': os.path.getsize(input_path), 'entries': 0,
+                      'seconds': None, 'error': None, 'submitted': time.time(), 'finished': None}
+            self.records[job_id] = record
+            try:
+                future = self.pool.submit(_decode_file_job, input_path, output_path, options)
+            except BrokenProcessPool:
+                # A worker died (out of memory, killed): replace the pool and carry on
+                self.log("Worker pool broke; restarting it")
+                self.pool.shutdown(wait=False)
+                self.start()
+                future = self.pool.submit(_decode_file_job, input_path, output_path, options)
+            self.futures[job_id] = future
+        future.add_done_callback(lambda done: self._finished(job_id, done))
+        self.log(f"Job {job_id} queued: {input_path}")
+        return self.job(job_id)
+
+    def _finished(self, job_id, future):
+        if future.cancelled():
+            result = {'status': 'cancelled', 'error': "Cancelled"}
+        else:
+            try:
+                result = dict(future.result())
+            except Exception as e:
+                result = {'error': f"Worker failed: {str(e)}"}
+            if 'trips' in result:
+                result['trips'] = len(result['trips'])
+            result['status'] = 'failed' if result['error'] else 'done'
+        with self.lock:
+            record = self.records.get(job_id)
+            if record is None:
+                return
+            record.update(result, finished=time.time())
+            del self.futures[job_id]
+            finished = [key for key, other in self.records.items() if other['finished'] is not None]
+            for key in finished[:max(0, len(finished) - SERVICE_MAX_FINISHED_JOBS)]:
+                del self.records[key]
+        if record['status'] == 'done':
+            self.log(f"Job {job_id} done: {record['output']} ({record['entries']} entries, {record['seconds']}s)")
+        else:
+            self.log(f"Job {job_id} {record['status']}: {record['error']}")
 
-def run_cli():
+    def job(self, job_id):
+        """Return a copy of a job's record, or None for an unknown id"""
+        with self.lock:
+            record = self.records.get(job_id)
+            if record is None:
+                return None
+            future = self.futures.get(job_id)
+            record = dict(record)
+        if record['status'] == 'queued' and future is not None and future.running():
+            record['status'] = 'running'
+        return record
+
+    def jobs(self):
+        """Return copies of every remembered job record, oldest first"""
+        with self.lock:
+            ids = list(self.records)
+        return [record for record in map(self.job, ids) if record is not None]
+
+    def cancel(self, job_id):
+        """Cancel a job that has not started yet; returns whether it was cancelled"""
+        with self.lock:
+            future = self.futures.get(job_id)
+        return future is not None and future.cancel()
+
+    def metrics(self):
+        """Job counts by status, totals, and throughput over the time jobs have been running"""
+        records = self.jobs()
+        counts = dict.fromkeys(('queued', 'running', 'done', 'failed', 'cancelled'), 0)
+        for record in records:
+            counts[record['status']] += 1
+        done = [record for record in records if record['status'] == 'done']
+        done_bytes = sum(record['bytes'] or 0 for record in done)
+        busy = None
+        if done:
+            busy = max(record['finished'] for record in done) - min(record['submitted'] for record in done)
+        return {
+            'uptime_s': round(time.time() - self.started, 3),
+            'workers': self.workers,
+            'jobs': counts,
+            'bytes': done_bytes,
+            'entries': sum(record['entries'] for record in done),
+            'mean_job_seconds': round(sum(record['seconds'] for record in done) / len(done), 3) if done else None,
+            'mb_per_s': round(done_bytes / (1 << 20) / busy, 3) if busy else None,
+            'jobs_per_minute': round(len(done) * 60 / busy, 3) if busy else None,
+        }
+
+    def watch(self, directory, interval=SERVICE_WATCH_INTERVAL):
+        """Queue each file that appears in directory once its size and modification time stop changing
+
+        Checked every interval seconds. Files starting with '.', outputs and
+        temporary or journal files (by extension) are ignored, as is an input whose output is already
+        newer than it, so restarting the service does not redo work.
+        """
+        thread = threading.Thread(target=self._watch, args=(directory, interval), daemon=True)
+        self.threads.append(thread)
+        thread.start()
+
+    def _watch(self, directory, interval):
+        skip = tuple(sink.extension for sink in OnStarDecoder.output_sinks.values()) + (
+            '.json', '.tmp', '-journal', '-wal', '-shm')
+        seen = {}
+        queued = {}
+        while True:
+            try:
+                entries = list(os.scandir(directory))
+            except OSError as e:
+                self.log(f"Cannot scan {directory}: {e}")
+                entries = []
+            for entry in entries:
+                if entry.name.startswith('.') or entry.name.lower().endswith(skip):
+                    continue
+                try:
+                    if not entry.is_file():
+                        continue
+                    info = entry.stat()
+                except OSError:
+                    continue
+                signature = (info.st_size, info.st_mtime_ns)
+                path = entry.path
+                if queued.get(path) == signature:
+                    continue
+                if seen.get(path) != signature:
+                    seen[path] = signature  # still being written, or new: look again next time
+                    continue
+                queued[path] = signature
+                output_path = self.output_path_for(path, self.output_format)
+                try:
+                    if os.path.getmtime(output_path) >= info.st_mtime:
+                        continue
+                except OSError:
+                    pass
+                try:
+                    self.submit(path)
+                except ValueError as e:
+                    self.log(f"Cannot queue {path}: {e}")
+            if self.stopping.wait(interval):
+                return
+
+    def serve_http(self, port=SERVICE_PORT, host='127.0.0.1'):
+        """Serve the JSON job API on host:port in a background thread; returns the server
+
+        POST /jobs with {"input": path, "output": path, "format": name}
+        (output and format optional; output relative to the output folder)
+        queues a job; GET /jobs lists jobs, GET /jobs/<id> shows one,
+        DELETE /jobs/<id> cancels a queued one and GET /metrics reports
+        metrics(). Port 0 picks a free port (see server.server_address).
+        Requests must name localhost or 127.0.0.1 in their Host header and
+        POST bodies must be sent as application/json, so web pages cannot
+        reach the API through the user's browser.
+        """
+        from http.server import ThreadingHTTPServer
+        self.server = ThreadingHTTPServer((host, port), _service_handler(self))
+        thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.threads.append(thread)
+        thread.start()
+        return self.server
+
+    def stop(self, wait=True):
+        """Stop taking jobs, cancel queued ones and shut the workers down after the running ones"""
+        self.stopping.set()
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+        for thread in self.threads:
+            if thread is not threading.current_thread():
+                thread.join()
+        with self.lock:
+            futures = list(self.futures.values())
+        for future in futures:
+            future.cancel()
+        if self.pool is not None:
+            self.pool.shutdown(wait=wait)
+
+
+def _service_handler(service):
+    """Build the HTTP request handler class for a DecodeService's JSON API"""
+    from http.server import BaseHTTPRequestHandler
+
+    class ServiceRequestHandler(BaseHTTPRequestHandler):
+        def local_host(self):
+            """Refuse requests addressed to another host name (DNS rebinding); returns whether to go on"""
+            name, _, port = (self.headers.get('Host') or '').rpartition(':')
+            if not name or not port.isdigit():
+                name, port = self.headers.get('Host') or '', None
+            if name.lower() in ('localhost', '127.0.0.1') and port in (None, str(self.server.server_address[1])):
+                return True
+            self.send_json(403, {'error': "Host must be localhost or 127.0.0.1"})
+            return False
+
+        def do_GET(self):
+            if not self.local_host():
+                return
+            path = self.path.split('?', 1)[0].rstrip('/')
+            if path == '/metrics':
+                self.send_json(200, service.metrics())
+            elif path == '/jobs':
+                self.send_json(200, service.jobs())
+            elif path.startswith('/jobs/'):
+                record = service.job(path[len('/jobs/'):])
+                self.send_json(200, record) if record else self.send_json(404, {'error': "No such job"})
+            else:
+                self.send_json(404, {'error': "Not found"})
+
+        def do_POST(self):
+            if not self.local_host():
+                return
+            if self.path.split('?', 1)[0].rstrip('/') != '/jobs':
+                self.send_json(404, {'error': "Not found"})
+                return
+            # A browser only sends application/json cross-site after a CORS preflight, which is never answered
+            if self.headers.get_content_type() != 'application/json':
+                self.send_json(415, {'error': "Content-Type must be application/json"})
+                return
+            try:
+                length = int(self.headers.get('Content-Length') or 0)
+                request = json.loads(self.rfile.read(length) or b'{}')
+                if not isinstance(request, dict) or not request.get('input'):
+                    raise ValueError('expected a JSON object with an "input" path')
+                output_path = service.contained_output_path(request['input'], request.get('output'))
+                record = service.submit(request['input'], output_path, request.get('format'))
+            except ValueError as e:
+                self.send_json(400, {'error': str(e)})
+                return
+            self.send_json(202, record)
+
+        def do_DELETE(self):
+            if not self.local_host():
+                return
+            path = self.path.split('?', 1)[0].rstrip('/')
+            job_id = path[len('/jobs/'):] if path.startswith('/jobs/') else None
+            if job_id is None or service.job(job_id) is None:
+                self.send_json(404, {'error': "No such job"})
+            elif service.cancel(job_id):
+                self.send_json(200, service.job(job_id))
+            else:
+                self.send_json(409, {'error': "Job already started or finished"})
+
+        def send_json(self, status, payload):
+            body = json.dumps(payload, indent=2).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass  # jobs are logged by the service itself
+
+    return ServiceRequestHandler
+
+
+def run_cli(segmentation='cluster', engine='auto', output_format='xlsx', workers=None, stats_path=None,
+            cache=None, dedup=False, pipeline=False, variant='auto', trips=None):
     """Run the CLI version"""
     input_file = input("Enter the path to the input file: ").strip()
     if not os.path.isfile(input_file):
         print(f"Error: File not found - {input_file}")
         return
 
+    decoder = OnStarDecoder(cache)
     base, _ = os.path.splitext(input_file)
-    output_file = base + ".xlsx"
+    output_file = base + decoder.output_sinks[output_format].extension
 
-    decoder = OnStarDecoder()
-    decoder.extract_gps_data_cli(input_file, output_file)
+    stats = DecodeStats() if stats_path else None
+    decoder.extract_gps_data_cli(input_file, output_file, segmentation, engine, output_format, workers, stats,
+                                 FixDeduplicator() if dedup else None, pipeline, variant,
+                                 TripSimplifier(**trips) if trips is not None else None)
+    if stats is not None:
+        stats.write_json(stats_path)
+        print(f"Stats written to: {stats_path}")
 
-def run_gui():
-    """Run the GUI version"""
+def run_gui(cache_dir=None, use_cache=True):
+    """Run the GUI version; cache_dir and use_cache set up its result cache as --cache-dir and --no-cache do"""
+    load_gui_modules()
     root = TkinterDnD.Tk()  # Use TkinterDnD for drag-and-drop support
     icon_path_for_display = "car.ico" # Used for a more user-friendly message
 
@@ -626,7 +4013,7 @@ def run_gui():
         print(f"ICON LOAD ERROR: {error_details}") # Print to console if available
         messagebox.showwarning("Icon Error", error_details)
         
-    app = OnStarGUI(root) # Initialize your application GUI
+    app = OnStarGUI(root, cache_dir, use_cache) # Initialize your application GUI
     
     # Center the window
     # The OnStarGUI class already sets the initial geometry (e.g., "800x600")
@@ -649,16 +4036,341 @@ def run_gui():
     
     root.mainloop()
 
-def main():
-    parser = argparse.ArgumentParser(description='OnStar GPS Decoder - Extract GPS data from OnStar binary files')
+def run_batch(inputs, output_dir=None, output_format='xlsx', workers=None, report_path=None,
+              segmentation='cluster', engine='auto', cache=None, dedup=False, pipeline=False, variant='auto',
+              trips=None):
+    """Run batch mode over files, directories or globs; returns the process exit code
+
+    Exit codes: 0 on success, 1 if no input file was found or any failed.
+    """
+    decoder = OnStarDecoder(cache)
+
+    def progress_callback(status, percent):
+        print(status)
+
+    report = decoder.process_batch(inputs, output_dir, output_format, workers, report_path,
+                                   progress_callback, segmentation, engine, dedup=dedup,
+                                   pipeline=pipeline, variant=variant, trips=trips)
+    for entry in report['files']:
+        if entry['error']:
+            print(f"  FAILED {entry['input']}: {entry['error']}")
+        elif 'trips' in entry:
+            print(f"  {entry['input']}: {len(entry['trips'])} trips")
+    print(f"Processed {report['total_files']} files ({report['failed_files']} failed), "
+          f"{report['total_entries']} GPS entries in {report['seconds']:.1f}s.")
+    print(f"Summary report written to: {report['report_path']}")
+    return 1 if report['failed_files'] or not report['total_files'] else 0
+
+def run_decode(inputs, output=None, output_format=None, quiet=False, segmentation='cluster', engine='auto',
+               workers=None, stats_path=None, cache=None, resume=False, dedup=None, dedup_offsets_path=None,
+               pipeline=False, variant='auto', trips=None, trips_path=None):
+    """Decode input files without prompting; returns the process exit code
+
+    With an output path (or STDOUT_PATH) all inputs go into that one output,
+    otherwise each input gets <base><extension> next to it. Status messages
+    go to stderr so stdout can carry the data. With stats_path, DecodeStats
+    for all inputs are written there as JSON. With resume, each output
+    that has one input keeps a Checkpoint and continues from it (see
+    OnStarDecoder.extract_gps_data). dedup ('first' or 'offsets') removes
+    repeated fixes within each input; with dedup_offsets_path the offsets
+    of the removed copies are written there as JSON per input. pipeline
+    overlaps reading, parsing and writing (see OnStarDecoder.write_fixes).
+    variant names the firmware variant, or 'auto' to detect and log it
+    per input. trips, a dict of TripSimplifier arguments, splits each
+    input's fixes into trips and writes only the fixes kept; with
+    trips_path the per-trip stats are written there as JSON per input.
+    Exit codes: 0 on success, 1 if any input failed.
+    """
+    decoder = OnStarDecoder(cache)
+    stats = DecodeStats() if stats_path else None
+    progress = ConsoleProgress(sys.stderr) if not quiet and sys.stderr.isatty() else None
+    log = (lambda message: None) if quiet else (lambda message: print(message, file=sys.stderr))
+    if output == STDOUT_PATH and engine == 'auto':
+        engine = 'python'  # NumPy batches would hold rows back until a whole batch is decoded
+    if dedup_offsets_path:
+        dedup = 'offsets'
+    dedups = {input_file: FixDeduplicator(dedup) for input_file in inputs} if dedup else {}
+    if trips_path and trips is None:
+        trips = {'tolerance_m': None}
+    simplifiers = {input_file: TripSimplifier(**trips) for input_file in inputs} if trips is not None else {}
+    variants = {}
+
+    def variant_for(input_file):
+        if input_file not in variants:
+            variants[input_file] = decoder.resolve_variant(input_file, variant)
+            if variant == 'auto':
+                log(f"{input_file}: detected {variants[input_file].description} firmware")
+        return variants[input_file]
+
+    def checkpoint_for(input_file, output_file):
+        if not resume or not os.path.isfile(input_file):
+            return None
+        checkpoint = decoder.checkpoint_for(input_file, output_file, output_format, segmentation,
+                                            dedups.get(input_file), variant_for(input_file))
+        if checkpoint is None:
+            log(f"{output_file}: this output format cannot be resumed, decoding from the start")
+        elif checkpoint.offset:
+            log(f"{input_file}: resuming at byte {checkpoint.offset:,} ({checkpoint.rows} entries kept)")
+        return checkpoint
+
+    def decode_into(sink, input_file, checkpoint=None):
+        if not os.path.isfile(input_file):
+            log(f"Error: File not found - {input_file}")
+            return False
+        try:
+            before = sink.count
+            target = TripSink(sink, simplifiers[input_file], stats) if trips is not None else sink
+            try:
+                decoder.write_fixes(input_file, target, segmentation, engine, workers, progress, stats,
+                                    checkpoint=checkpoint, dedup=dedups.get(input_file), pipeline=pipeline,
+                                    variant=variant_for(input_file))
+                if trips is not None:
+                    target.finish()
+            finally:
+                if progress:
+                    progress.finish()
+        except BrokenPipeError:
+            raise
+        except Exception as e:
+            log(f"Error processing file {input_file}: {e}")
+            return False
+        removed = f" ({dedups[input_file].removed} duplicates removed)" if dedup else ""
+        log(f"{input_file}: {sink.count - before} valid GPS entries{removed}")
+        if trips is not None:
+            log(f"{input_file}: {simplifiers[input_file].summary()}")
+        return True
+
+    failed = 0
+    try:
+        if output:
+            checkpoint = checkpoint_for(inputs[0], output) if len(inputs) == 1 else None
+            with decoder.open_sink(output, output_format, checkpoint) as sink:
+                for input_file in inputs:
+                    failed += not decode_into(sink, input_file, checkpoint)
+            if checkpoint is not None and not failed:
+                checkpoint.complete = True
+                checkpoint.save()
+            if output != STDOUT_PATH:
+                log(f"Results written to: {output}")
+        else:
+            output_format = output_format or 'xlsx'
+            for input_file in inputs:
+                base, _ = os.path.splitext(input_file)
+                output_file = base + decoder.output_sinks[output_format].extension
+                checkpoint = checkpoint_for(input_file, output_file)
+                with decoder.open_sink(output_file, output_format, checkpoint) as sink:
+                    ok = decode_into(sink, input_file, checkpoint)
+                failed += not ok
+                if ok:
+                    if checkpoint is not None:
+                        checkpoint.complete = True
+                        checkpoint.save()
+                    log(f"Results written to: {output_file}")
+    except BrokenPipeError:
+        # The reader went away (e.g. `| head`); silence the flush at interpreter exit
+        os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+        return 1
+    except (OSError, ValueError) as e:
+        log(f"Error: {e}")
+        return 1
+    if stats is not None:
+        log(stats.summary())
+        stats.write_json(stats_path)
+    if trips_path:
+        with open(trips_path, 'w', encoding='utf-8') as f:
+            json.dump({input_file: simplifier.trips for input_file, simplifier in simplifiers.items()}, f, indent=2)
+    if dedup_offsets_path:
+        with open(dedup_offsets_path, 'w', encoding='utf-8') as f:
+            json.dump({input_file: {str(first): copies for first, copies in table.duplicate_offsets.items()}
+                       for input_file, table in dedups.items()}, f, indent=2)
+    return 1 if failed else 0
+
+def run_service(watch_dir=None, port=SERVICE_PORT, output_dir=None, output_format='xlsx', workers=None,
+                segmentation='cluster', engine='auto', cache=None, dedup=False, pipeline=False, variant='auto',
+                trips=None):
+    """Run a DecodeService until interrupted; port None serves no API"""
+    if watch_dir and not os.path.isdir(watch_dir):
+        print(f"Error: Not a directory - {watch_dir}", file=sys.stderr)
+        return 1
+    service = DecodeService(output_dir, output_format, workers, segmentation, engine, cache, dedup, pipeline,
+                            variant, trips, log=lambda message: print(message, flush=True))
+    service.start()
+    try:
+        if port is not None:
+            try:
+                server = service.serve_http(port)
+            except OSError as e:
+                print(f"Error: Cannot listen on port {port} - {e}", file=sys.stderr)
+                return 1
+            host, bound_port = server.server_address[:2]
+            print(f"Job API listening on http://{host}:{bound_port}/jobs", flush=True)
+        if watch_dir:
+            service.watch(watch_dir)
+            print(f"Watching {os.path.abspath(watch_dir)} for new images", flush=True)
+        print(f"{service.workers} workers ready; press Ctrl+C to stop", flush=True)
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        print("Stopping: waiting for running jobs to finish...", flush=True)
+    finally:
+        service.stop()
+    metrics = service.metrics()
+    print(f"{metrics['jobs']['done']} jobs done, {metrics['jobs']['failed']} failed, "
+          f"{metrics['entries']} GPS entries.")
+    return 0
+
+def run_query(argv):
+    """Query an indexed SQLite store: `query DATABASE [--from T] [--to T] [--bbox ...]`; returns the exit code"""
+    parser = argparse.ArgumentParser(prog='onstar_gen11.py query',
+                                     description='Query fixes from a SQLite store by time range and bounding box')
+    parser.add_argument('database', help='SQLite file written with --format sqlite')
+    parser.add_argument('--from', dest='time_from', metavar='TIME',
+                        help='Earliest fix time, e.g. "2023-04-01 14:00" (UTC unless an offset is given)')
+    parser.add_argument('--to', dest='time_to', metavar='TIME', help='Latest fix time (inclusive)')
+    parser.add_argument('--bbox', nargs=4, type=float, metavar=('MIN_LAT', 'MIN_LON', 'MAX_LAT', 'MAX_LON'),
+                        help='Only fixes inside this bounding box')
+    parser.add_argument('--limit', type=int, help='Return at most this many fixes')
+    parser.add_argument('-o', '--output', default=STDOUT_PATH,
+                        help='Write the fixes to this file (default: "-" for stdout)')
+    parser.add_argument('--format', dest='output_format', choices=sorted(OnStarDecoder.output_sinks),
+                        help='Output format (default: from the --output extension, ndjson for stdout)')
+    parser.add_argument('-q', '--quiet', action='store_true', help='Suppress the summary on stderr')
+    args = parser.parse_args(argv)
+    try:
+        start_ms = parse_timestamp_ms(args.time_from) if args.time_from else None
+        end_ms = parse_timestamp_ms(args.time_to) if args.time_to else None
+    except ValueError as e:
+        parser.error(f"invalid time: {e}")
+
+    started = time.perf_counter()
+    try:
+        with FixStore(args.database) as store:
+            with OnStarDecoder().open_sink(args.output, args.output_format) as sink:
+                for fix in store.query(start_ms, end_ms, args.bbox, args.limit):
+                    sink.write(fix)
+    except BrokenPipeError:
+        os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+        return 1
+    except FileNotFoundError:
+        print(f"Error: File not found - {args.database}", file=sys.stderr)
+        return 1
+    except (OSError, ValueError, sqlite3.Error) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+    if not args.quiet:
+        print(f"{sink.count} fixes in {(time.perf_counter() - started) * 1000:.1f} ms", file=sys.stderr)
+    return 0
+
+def main(argv=None):
+    if argv is None:
+        argv = sys.argv[1:]
+    if argv[:1] == ['query']:
+        return run_query(argv[1:])
+    parser = argparse.ArgumentParser(description='OnStar GPS Decoder - Extract GPS data from OnStar binary files',
+                                     epilog='Query a SQLite store with: %(prog)s query DATABASE --from TIME '
+                                            '--to TIME --bbox MIN_LAT MIN_LON MAX_LAT MAX_LON')
+    parser.add_argument('inputs', nargs='*', metavar='INPUT',
+                        help='Binary files to decode without prompting (omit to start the GUI)')
+    parser.add_argument('-o', '--output',
+                        help='Write all inputs to this file, or "-" to stream NDJSON/CSV/GPX/KML to stdout '
+                             '(default: <input base>.<format extension> per input)')
+    parser.add_argument('-q', '--quiet', action='store_true', help='Suppress status messages on stderr')
     parser.add_argument('--cli', action='store_true', help='Run in command line interface mode')
+    parser.add_argument('--segmentation', choices=['cluster', 'record'], default='cluster',
+                        help='Split the image into keyword clusters (default) or one slice per gps_tow= record')
+    parser.add_argument('--format', dest='output_format', choices=sorted(OnStarDecoder.output_sinks),
+                        help='Output format (default: from the --output extension, ndjson for stdout, else xlsx)')
+    parser.add_argument('--engine', choices=['auto', 'python', 'numpy'], default='auto',
+                        help='Decode fixes one at a time or in NumPy batches (auto uses NumPy when installed)')
+    parser.add_argument('--batch', nargs='+', metavar='PATH',
+                        help='Process files, directories or glob patterns in parallel')
+    parser.add_argument('--workers', type=int, default=None,
+                        help='Worker processes for --batch and --serve (default: number of CPU cores); '
+                             'with --cli, scan one large file in parallel shards')
+    parser.add_argument('--output-dir',
+                        help='Directory for --batch and --serve outputs (default: next to each input)')
+    parser.add_argument('--report', help='Path of the --batch JSON summary report')
+    parser.add_argument('--stats', metavar='PATH',
+                        help='Collect stage timings and rejection counters and write them to this JSON file')
+    parser.add_argument('--no-cache', action='store_true',
+                        help='Always re-scan inputs instead of reusing (and saving) cached decode results')
+    parser.add_argument('--cache-dir', help='Result cache directory (default: $ONSTAR_CACHE_DIR or the user cache)')
+    parser.add_argument('--resume', action='store_true',
+                        help='Keep a checkpoint next to each CSV/NDJSON/SQLite/GPX/KML output and continue from '
+                             'it: an interrupted run picks up where it stopped, and an image that only grew '
+                             'since the last run is scanned from where that run ended')
+    parser.add_argument('--dedup', action='store_true',
+                        help='Drop repeated copies of a fix (same GPS week, time of week and raw lat/lon), '
+                             'keeping the first')
+    parser.add_argument('--dedup-offsets', metavar='PATH',
+                        help='With positional inputs, also write the byte offsets of every removed copy to this '
+                             'JSON file (implies --dedup)')
+    parser.add_argument('--variant', choices=['auto'] + sorted(FIRMWARE_VARIANTS), default='auto',
+                        help='Firmware field layout: gen11 (gps_tow=/gps_week=), gen10 (tow=/week=) or generic '
+                             '(every alias); auto (default) detects it from the first 4 MB of each image')
+    parser.add_argument('--simplify', nargs='?', type=float, const=TRIP_TOLERANCE_METERS, metavar='METERS',
+                        help='Split fixes into trips and keep only the fixes needed to draw each track to within '
+                             f'METERS (default {TRIP_TOLERANCE_METERS:g}); a parked vehicle shrinks to two fixes')
+    parser.add_argument('--trips', metavar='PATH',
+                        help='With positional inputs, write per-trip stats (start/end, distance, fix counts) to this '
+                             'JSON file; without --simplify every fix is kept')
+    parser.add_argument('--trip-gap', type=float, default=TRIP_MAX_GAP_SECONDS, metavar='SECONDS',
+                        help=f'Start a new trip after this long without a fix (default {TRIP_MAX_GAP_SECONDS})')
+    parser.add_argument('--trip-jump', type=float, default=TRIP_MAX_JUMP_METERS, metavar='METERS',
+                        help=f'Start a new trip when consecutive fixes are this far apart '
+                             f'(default {TRIP_MAX_JUMP_METERS})')
+    parser.add_argument('--pipeline', action='store_true',
+                        help='Read ahead and write on background threads so disk reads, decoding and output '
+                             'writing overlap')
+    parser.add_argument('--serve', action='store_true',
+                        help='Keep warm worker processes running and take jobs from the localhost JSON API '
+                             '(POST /jobs, GET /jobs, GET /metrics) until interrupted')
+    parser.add_argument('--watch', metavar='DIR',
+                        help='Keep warm worker processes running and decode every image that appears in DIR '
+                             '(implies --serve; the API only starts with --serve)')
+    parser.add_argument('--port', type=int, default=SERVICE_PORT,
+                        help=f'Localhost port of the --serve job API (default {SERVICE_PORT}, 0 picks a free one)')
+    parser.add_argument('--profile', metavar='PATH',
+                        help='Run under cProfile and dump the stats to PATH (view with python -m pstats)')
     
-    args = parser.parse_args()
+    args = parser.parse_args(argv)
     
-    if args.cli:
-        run_cli()
-    else:
-        run_gui()
+    if args.output == STDOUT_PATH and args.output_format:
+        if not OnStarDecoder.output_sinks[args.output_format].streams:
+            parser.error(f"--format {args.output_format} cannot be written to stdout")
+    if args.resume and args.output and len(args.inputs) > 1:
+        parser.error("--resume needs one input per output")
+    if args.resume and (args.simplify is not None or args.trips):
+        parser.error("--resume cannot be combined with --simplify or --trips")
+    if args.simplify is not None and args.simplify <= 0:
+        parser.error("--simplify needs a tolerance above 0 metres")
+    trips = None
+    if args.simplify is not None or args.trips:
+        trips = {'tolerance_m': args.simplify, 'max_gap_s': args.trip_gap, 'max_jump_m': args.trip_jump}
+    if (args.serve or args.watch) and (args.inputs or args.batch):
+        parser.error("--serve and --watch take jobs from the API and the watch folder, not INPUT or --batch")
+    cache = None if args.no_cache else ResultCache(args.cache_dir)
+    with profile_to(args.profile) if args.profile else nullcontext():
+        if args.serve or args.watch:
+            return run_service(args.watch, args.port if args.serve else None, args.output_dir,
+                               args.output_format or 'xlsx', args.workers, args.segmentation, args.engine, cache,
+                               args.dedup, args.pipeline, args.variant, trips)
+        elif args.inputs:
+            return run_decode(args.inputs, args.output, args.output_format, args.quiet, args.segmentation,
+                              args.engine, args.workers, args.stats, cache, args.resume,
+                              'first' if args.dedup else None, args.dedup_offsets, args.pipeline, args.variant,
+                              trips, args.trips)
+        elif args.batch:
+            return run_batch(args.batch, args.output_dir, args.output_format or 'xlsx', args.workers, args.report,
+                             args.segmentation, args.engine, cache, args.dedup, args.pipeline, args.variant, trips)
+        elif args.cli:
+            run_cli(args.segmentation, args.engine, args.output_format or 'xlsx', args.workers, args.stats,
+                    cache, args.dedup, args.pipeline, args.variant, trips)
+        else:
+            run_gui(args.cache_dir, not args.no_cache)
+    return 0
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    import multiprocessing
+    multiprocessing.freeze_support()  # needed for batch and shard workers in PyInstaller builds
+    sys.exit(main())
\ No newline at end of file
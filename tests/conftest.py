@@ -0,0 +1,36 @@
+"""Shared fixtures: small reproducible synthetic images from benchmark.generate_image"""
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import benchmark  # noqa: E402
+
+DENSE = 5000
+
+
+@pytest.fixture(scope='session')
+def make_image(tmp_path_factory):
+    """Return the path of a 1 MiB synthetic image of the given style, generated once per session
+
+    density is records per MiB; at DENSE records are closer together than
+    BLOCK_CLUSTER_SPAN, so cluster mode finds no sync points.
+    """
+    images = {}
+
+    def make(style='gen11', size=1 << 20, seed=7, density=400):
+        key = (style, size, seed, density)
+        if key not in images:
+            path = tmp_path_factory.mktemp('images') / f"{style}_{size}_{seed}_{density}.bin"
+            benchmark.generate_image(str(path), size, density=density, style=style, seed=seed)
+            images[key] = str(path)
+        return images[key]
+
+    return make
+
+
+@pytest.fixture
+def image(make_image):
+    return make_image()
@@ -0,0 +1,130 @@
+"""ResultCache: replayed results match a fresh decode, and any change to the input misses"""
+import os
+import shutil
+
+import pytest
+
+import onstar_gen11
+from onstar_gen11 import DecodeStats, OnStarDecoder, ResultCache
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return ResultCache(str(tmp_path / 'cache'))
+
+
+@pytest.fixture
+def copy(make_image, tmp_path):
+    path = str(tmp_path / 'image.bin')
+    shutil.copyfile(make_image(), path)
+    return path
+
+
+def decode(decoder, file_path, output_path, **options):
+    stats = DecodeStats()
+    count, error = decoder.extract_gps_data(file_path, output_path, stats=stats, **options)
+    assert error is None
+    return count, stats
+
+
+def read(path):
+    with open(path, 'rb') as f:
+        return f.read()
+
+
+def test_second_decode_is_replayed_from_cache(copy, cache, tmp_path):
+    decoder = OnStarDecoder(cache)
+    first, stats = decode(decoder, copy, str(tmp_path / 'first.csv'))
+    assert stats.cache_hits == 0
+    second, replayed = decode(decoder, copy, str(tmp_path / 'second.csv'))
+    assert replayed.cache_hits == 1
+    assert second == first
+    assert read(str(tmp_path / 'second.csv')) == read(str(tmp_path / 'first.csv'))
+    assert replayed.rejected == stats.rejected
+    assert replayed.blocks_found == stats.blocks_found
+
+
+def test_key_changes_with_content_mtime_and_settings(copy, cache):
+    key = cache.key_for(copy)
+    assert cache.key_for(copy) == key
+    assert cache.key_for(copy, 'record') != key
+    assert cache.key_for(copy, variant='gen10') != key
+    info = os.stat(copy)
+    os.utime(copy, ns=(info.st_atime_ns, info.st_mtime_ns + 10 ** 9))
+    assert cache.key_for(copy) != key
+
+
+def test_same_size_edit_in_sampled_bytes_misses(copy, cache, tmp_path):
+    decoder = OnStarDecoder(cache)
+    decode(decoder, copy, str(tmp_path / 'first.csv'))
+    info = os.stat(copy)
+    with open(copy, 'r+b') as f:
+        f.seek(10)
+        byte = f.read(1)
+        f.seek(10)
+        f.write(bytes([byte[0] ^ 0xFF]))
+    # Even with size and mtime restored, the content hash changes the key
+    os.utime(copy, ns=(info.st_atime_ns, info.st_mtime_ns))
+    _, stats = decode(decoder, copy, str(tmp_path / 'second.csv'))
+    assert stats.cache_hits == 0
+
+
+def test_decoder_version_bump_misses(copy, cache, tmp_path, monkeypatch):
+    decoder = OnStarDecoder(cache)
+    decode(decoder, copy, str(tmp_path / 'first.csv'))
+    monkeypatch.setattr(onstar_gen11, 'DECODER_VERSION', onstar_gen11.DECODER_VERSION + 1)
+    _, stats = decode(decoder, copy, str(tmp_path / 'second.csv'))
+    assert stats.cache_hits == 0
+
+
+def test_corrupt_entry_is_a_miss(copy, cache, tmp_path):
+    decoder = OnStarDecoder(cache)
+    expected, _ = decode(decoder, copy, str(tmp_path / 'first.csv'))
+    key = cache.key_for(copy, variant=decoder.detect_variant(copy).name)
+    with open(cache.path_for(key), 'r+b') as f:
+        f.write(b'garbage!')
+    assert cache.load(key) is None
+    count, stats = decode(decoder, copy, str(tmp_path / 'second.csv'))
+    assert stats.cache_hits == 0 and count == expected
+
+
+def test_truncated_entry_is_a_miss(copy, cache, tmp_path):
+    decoder = OnStarDecoder(cache)
+    decode(decoder, copy, str(tmp_path / 'first.csv'))
+    path = cache.path_for(cache.key_for(copy, variant=decoder.detect_variant(copy).name))
+    os.truncate(path, os.path.getsize(path) - 1)
+    _, stats = decode(decoder, copy, str(tmp_path / 'second.csv'))
+    assert stats.cache_hits == 0
+
+
+def test_entry_over_max_bytes_is_not_stored(copy, cache, tmp_path, monkeypatch):
+    monkeypatch.setattr(onstar_gen11, 'CACHE_FRAME_FIXES', 16)
+    cache.max_bytes = 4096
+    decoder = OnStarDecoder(cache)
+    decode(decoder, copy, str(tmp_path / 'first.csv'))
+    assert os.listdir(cache.directory) == []
+
+
+def test_parallel_entry_replays_segment_count(copy, cache, tmp_path):
+    decoder = OnStarDecoder(cache)
+    _, serial = decode(OnStarDecoder(), copy, str(tmp_path / 'serial.csv'))
+    decode(decoder, copy, str(tmp_path / 'first.csv'), workers=2)
+    count, replayed = decode(decoder, copy, str(tmp_path / 'second.csv'))
+    assert replayed.cache_hits == 1
+    assert replayed.blocks_found == serial.blocks_found
+    assert read(str(tmp_path / 'second.csv')) == read(str(tmp_path / 'serial.csv'))
+
+
+def test_least_recently_used_entries_are_evicted(cache):
+    entry_size = len(onstar_gen11.CACHE_MAGIC) + onstar_gen11.CACHE_HEADER.size
+    cache.max_bytes = 2 * entry_size
+    for n, key in enumerate(('a', 'b', 'c')):
+        spool = cache.spool(key)
+        spool.segments = n
+        assert spool.commit()
+        path = cache.path_for(key)
+        os.utime(path, (n, n))  # store order, without relying on clock resolution
+    assert cache.load('a') is None
+    assert cache.load('b') is not None and cache.load('c').segments == 2
+    cache.clear()
+    assert cache.load('b') is None and cache.load('c') is None
@@ -0,0 +1,22 @@
+"""CancelToken: a cancelled decode stops inside a long stretch without keywords"""
+import random
+
+import pytest
+
+import onstar_gen11
+from onstar_gen11 import CancelToken, OnStarDecoder
+
+
+@pytest.mark.parametrize('segmentation', ['cluster', 'record'])
+@pytest.mark.parametrize('workers', [None, 2])
+def test_cancel_stops_a_scan_without_keywords(tmp_path, monkeypatch, segmentation, workers):
+    monkeypatch.setattr(onstar_gen11, 'MIN_SHARD_BYTES', 64 * 1024)
+    image = str(tmp_path / 'noise.bin')
+    with open(image, 'wb') as f:
+        f.write(random.Random(1).randbytes(1 << 20).replace(b'=', b'#'))
+    cancel = CancelToken()
+    cancel.cancel()
+    count, error = OnStarDecoder().extract_gps_data(image, str(tmp_path / 'out.csv'), segmentation=segmentation,
+                                                    workers=workers, cancel=cancel, variant='gen11')
+    assert (count, error) == (0, "Cancelled")
+    assert not (tmp_path / 'out.csv').exists()
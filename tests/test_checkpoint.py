@@ -0,0 +1,155 @@
+"""Checkpoint resume (interrupted runs) and incremental tail decoding"""
+import os
+import shutil
+import sqlite3
+
+import pytest
+
+import onstar_gen11
+from conftest import DENSE
+from onstar_gen11 import CHECKPOINT_SUFFIX, CancelToken, FixDeduplicator, OnStarDecoder
+
+
+def read_rows(path):
+    if path.endswith('.sqlite'):
+        connection = sqlite3.connect(path)
+        try:
+            return connection.execute('SELECT * FROM gps_fixes ORDER BY rowid').fetchall()
+        finally:
+            connection.close()
+    with open(path, 'rb') as f:
+        return f.read()
+
+
+def decode(file_path, output_path, **options):
+    count, error = OnStarDecoder().extract_gps_data(file_path, output_path, **options)
+    assert error is None
+    return count
+
+
+def interrupt_after(fixes):
+    """Return (cancel, on_fix) that cancel a run once it has written the given number of fixes"""
+    cancel = CancelToken()
+    written = [0]
+
+    def on_fix(fix):
+        written[0] += 1
+        if written[0] >= fixes:
+            cancel.cancel()
+
+    return cancel, on_fix
+
+
+@pytest.mark.parametrize('segmentation', ['cluster', 'record'])
+@pytest.mark.parametrize('extension', ['csv', 'sqlite', 'ndjson'])
+def test_interrupted_run_resumes_to_same_output(image, tmp_path, monkeypatch, extension, segmentation):
+    full = str(tmp_path / f"full.{extension}")
+    expected = decode(image, full, segmentation=segmentation)
+    assert expected > 100
+
+    monkeypatch.setattr(onstar_gen11, 'CHECKPOINT_INTERVAL', 0.0)  # checkpoint at every block
+    output = str(tmp_path / f"resumed.{extension}")
+    for stop_at in (expected // 3, expected // 3):
+        cancel, on_fix = interrupt_after(stop_at)
+        count, error = OnStarDecoder().extract_gps_data(image, output, segmentation=segmentation, resume=True,
+                                                        cancel=cancel, on_fix=on_fix)
+        assert error == "Cancelled"
+        assert os.path.exists(output + CHECKPOINT_SUFFIX)
+    assert decode(image, output, segmentation=segmentation, resume=True) == expected
+    assert read_rows(output) == read_rows(full)
+
+
+def test_interrupted_run_with_dedup_resumes_to_same_output(make_image, tmp_path, monkeypatch):
+    # The same image twice over: the second half is all repeats
+    image = str(tmp_path / 'repeated.bin')
+    with open(make_image(), 'rb') as f:
+        data = f.read()
+    with open(image, 'wb') as f:
+        f.write(data + data)
+    full = str(tmp_path / 'full.csv')
+    expected = decode(image, full, dedup=FixDeduplicator())
+
+    monkeypatch.setattr(onstar_gen11, 'CHECKPOINT_INTERVAL', 0.0)
+    output = str(tmp_path / 'resumed.csv')
+    cancel, on_fix = interrupt_after(expected // 2)
+    _, error = OnStarDecoder().extract_gps_data(image, output, resume=True, cancel=cancel, on_fix=on_fix,
+                                                dedup=FixDeduplicator())
+    assert error == "Cancelled"
+    assert decode(image, output, resume=True, dedup=FixDeduplicator()) == expected
+    assert read_rows(output) == read_rows(full)
+
+
+@pytest.mark.parametrize('style,segmentation', [('gen11', 'cluster'), ('gen11', 'record'), ('gen10', 'record')])
+@pytest.mark.parametrize('extension', ['csv', 'sqlite'])
+def test_growing_image_is_decoded_incrementally(make_image, tmp_path, extension, style, segmentation):
+    with open(make_image(style), 'rb') as f:
+        data = f.read()
+    image = str(tmp_path / 'image.bin')
+    full = str(tmp_path / f"full.{extension}")
+    shutil.copyfile(make_image(style), image)
+    expected = decode(image, full, segmentation=segmentation)
+    assert expected > 100
+
+    output = str(tmp_path / f"tail.{extension}")
+    for part in range(1, 6):
+        with open(image, 'wb') as f:
+            f.write(data[:len(data) * part // 5])
+        count = decode(image, output, segmentation=segmentation, resume=True)
+    assert count == expected
+    assert read_rows(output) == read_rows(full)
+
+
+def test_dense_image_resumes_and_tails_without_a_sync_point(make_image, tmp_path, monkeypatch):
+    # Records closer than BLOCK_CLUSTER_SPAN: in cluster mode no keyword is a sync point
+    segmentation = 'cluster'
+    source = make_image(density=DENSE)
+    with open(source, 'rb') as f:
+        data = f.read()
+    full = str(tmp_path / 'full.csv')
+    expected = decode(source, full, segmentation=segmentation)
+
+    monkeypatch.setattr(onstar_gen11, 'CHECKPOINT_INTERVAL', 0.0)
+    output = str(tmp_path / 'resumed.csv')
+    cancel, on_fix = interrupt_after(expected // 2)
+    _, error = OnStarDecoder().extract_gps_data(source, output, segmentation=segmentation, resume=True,
+                                                cancel=cancel, on_fix=on_fix)
+    assert error == "Cancelled"
+    checkpoint = OnStarDecoder().checkpoint_for(source, output, 'csv', segmentation)
+    assert checkpoint.offset > len(data) // 3
+    assert decode(source, output, segmentation=segmentation, resume=True) == expected
+    assert read_rows(output) == read_rows(full)
+
+    image = str(tmp_path / 'image.bin')
+    tail = str(tmp_path / 'tail.csv')
+    with open(image, 'wb') as f:
+        f.write(data[:len(data) // 2])
+    decode(image, tail, segmentation=segmentation, resume=True)
+    assert OnStarDecoder().checkpoint_for(image, tail, 'csv', segmentation).offset > len(data) // 3
+    with open(image, 'wb') as f:
+        f.write(data)
+    assert decode(image, tail, segmentation=segmentation, resume=True) == expected
+    assert read_rows(tail) == read_rows(full)
+
+
+def test_rerun_of_finished_output_only_rescans_the_tail(image, tmp_path):
+    output = str(tmp_path / 'out.csv')
+    expected = decode(image, output, resume=True)
+    rows = read_rows(output)
+    checkpoint = OnStarDecoder().checkpoint_for(image, output, 'csv')
+    # Left at the last block start: only what follows it is scanned again
+    assert checkpoint.offset > os.path.getsize(image) // 2
+    assert 0 < checkpoint.rows <= expected
+    assert decode(image, output, resume=True) == expected
+    assert read_rows(output) == rows
+
+
+def test_changed_image_starts_over(make_image, tmp_path):
+    image = str(tmp_path / 'image.bin')
+    output = str(tmp_path / 'out.csv')
+    shutil.copyfile(make_image(seed=7), image)
+    decode(image, output, resume=True)
+    shutil.copyfile(make_image(seed=8), image)
+    full = str(tmp_path / 'full.csv')
+    expected = decode(image, full)
+    assert decode(image, output, resume=True) == expected
+    assert read_rows(output) == read_rows(full)
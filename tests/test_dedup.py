@@ -0,0 +1,105 @@
+"""FixDeduplicator: probing on fingerprint collisions, table growth, resets and serialization"""
+import pytest
+
+import onstar_gen11
+from onstar_gen11 import FixDeduplicator, GpsFix, OnStarDecoder
+
+
+def make_fix(n, offset):
+    return GpsFix(gps_week=2200, gps_tow=n * 1000, lat_hex=f"{n:016x}", lon_hex=f"{n + 1:016x}", offset=offset)
+
+
+@pytest.fixture
+def small_table(monkeypatch):
+    monkeypatch.setattr(onstar_gen11, 'DEDUP_INITIAL_SLOTS', 8)
+
+
+def test_copies_are_duplicates_and_distinct_fixes_are_not():
+    dedup = FixDeduplicator()
+    assert not dedup.is_duplicate(make_fix(1, 100))
+    assert not dedup.is_duplicate(make_fix(2, 200))
+    assert dedup.is_duplicate(make_fix(1, 300))
+    assert dedup.removed == 1
+    # Same key with lower-case and upper-case hex is the same fix
+    upper = make_fix(2, 400)
+    upper.lat_hex = upper.lat_hex.upper()
+    assert dedup.is_duplicate(upper)
+
+
+def test_rescanning_earlier_offsets_keeps_first_copies():
+    dedup = FixDeduplicator()
+    assert not dedup.is_duplicate(make_fix(1, 500))
+    # A resumed run sees the first copy again, or an even earlier one
+    assert not dedup.is_duplicate(make_fix(1, 500))
+    assert not dedup.is_duplicate(make_fix(1, 100))
+    assert dedup.is_duplicate(make_fix(1, 500))
+    assert dedup.removed == 1
+
+
+def test_colliding_slots_are_probed(small_table, monkeypatch):
+    # Every fingerprint lands in slot 1, so each new key probes past the earlier ones
+    monkeypatch.setattr(FixDeduplicator, 'fingerprint', staticmethod(lambda fix: 1 + (fix.gps_tow // 1000) * 8))
+    dedup = FixDeduplicator()
+    for n in range(4):
+        assert not dedup.is_duplicate(make_fix(n, n))
+    for n in range(4):
+        assert dedup.is_duplicate(make_fix(n, 100 + n))
+    assert len(dedup) == 4 and dedup.removed == 4
+
+
+def test_table_grows_and_keeps_every_key(small_table):
+    dedup = FixDeduplicator()
+    for n in range(1000):
+        assert not dedup.is_duplicate(make_fix(n, n))
+    assert len(dedup) == 1000
+    assert len(dedup.keys) >= 2000  # kept at most half full
+    assert all(dedup.is_duplicate(make_fix(n, 5000 + n)) for n in range(1000))
+
+
+def test_table_starts_over_beyond_max_keys(small_table):
+    dedup = FixDeduplicator(max_keys=100)
+    for n in range(150):
+        dedup.is_duplicate(make_fix(n, n))
+    assert dedup.resets == 1
+    assert len(dedup) == 50
+    assert dedup.is_duplicate(make_fix(149, 1000))
+    assert not dedup.is_duplicate(make_fix(0, 1000))  # forgotten by the reset
+
+
+def test_offsets_mode_and_round_trip(small_table):
+    dedup = FixDeduplicator(keep='offsets')
+    for offset in (10, 20, 30):
+        dedup.is_duplicate(make_fix(1, offset))
+    for n in range(2, 40):
+        dedup.is_duplicate(make_fix(n, 100 + n))
+    assert dedup.duplicate_offsets == {10: [20, 30]}
+    # A resumed run rescans copies it has already recorded
+    for offset in (20, 30):
+        dedup.is_duplicate(make_fix(1, offset))
+    assert dedup.duplicate_offsets == {10: [20, 30]}
+    restored = FixDeduplicator(keep='offsets')
+    restored.load_bytes(dedup.to_bytes())
+    assert len(restored) == len(dedup)
+    assert restored.duplicate_offsets == dedup.duplicate_offsets
+    assert restored.is_duplicate(make_fix(39, 999))
+    with pytest.raises(ValueError):
+        FixDeduplicator(keep='first').load_bytes(dedup.to_bytes())
+
+
+def test_repeated_image_decodes_to_single_copy(make_image, tmp_path):
+    with open(make_image(), 'rb') as f:
+        data = f.read()
+    once = str(tmp_path / 'once.bin')
+    twice = str(tmp_path / 'twice.bin')
+    with open(once, 'wb') as f:
+        f.write(data)
+    with open(twice, 'wb') as f:
+        f.write(data + data)
+    decoder = OnStarDecoder()
+    expected, error = decoder.extract_gps_data(once, str(tmp_path / 'once.csv'))
+    assert error is None
+    dedup = FixDeduplicator()
+    count, error = decoder.extract_gps_data(twice, str(tmp_path / 'twice.csv'), dedup=dedup)
+    assert error is None
+    assert count == expected
+    assert dedup.removed >= expected
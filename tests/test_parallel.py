@@ -0,0 +1,41 @@
+"""Intra-file parallel mode: shards merge to the same output as a serial run"""
+import pytest
+
+import onstar_gen11
+from conftest import DENSE
+from onstar_gen11 import OnStarDecoder
+
+
+@pytest.fixture(autouse=True)
+def small_shards(monkeypatch):
+    monkeypatch.setattr(onstar_gen11, 'MIN_SHARD_BYTES', 64 * 1024)
+    monkeypatch.setattr(onstar_gen11, 'SHARD_SYNC_SEARCH_BYTES', 16 * 1024)
+
+
+def decode(file_path, output_path, **options):
+    count, error = OnStarDecoder().extract_gps_data(file_path, output_path, **options)
+    assert error is None
+    with open(output_path, 'rb') as f:
+        return count, f.read()
+
+
+@pytest.mark.parametrize('segmentation', ['cluster', 'record'])
+def test_parallel_matches_serial(make_image, tmp_path, segmentation):
+    image = make_image()
+    assert len(OnStarDecoder().plan_shards(image, 64 * 1024, segmentation)) > 1
+    serial = decode(image, str(tmp_path / 'serial.csv'), segmentation=segmentation)
+    parallel = decode(image, str(tmp_path / 'parallel.csv'), segmentation=segmentation, workers=4)
+    assert parallel == serial
+
+
+def test_dense_image_falls_back_to_serial(make_image, tmp_path):
+    image = make_image(density=DENSE)
+    decoder = OnStarDecoder()
+    # No sync point near any boundary: every shard merges into the first
+    assert decoder.plan_shards(image, 64 * 1024) == [(0, 1 << 20)]
+    messages = []
+    serial = decode(image, str(tmp_path / 'serial.csv'))
+    parallel = decode(image, str(tmp_path / 'parallel.csv'), workers=4,
+                      progress_callback=lambda status, percent: messages.append(status))
+    assert parallel == serial
+    assert any('decoding in one process' in message for message in messages)
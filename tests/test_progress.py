@@ -0,0 +1,29 @@
+"""ProgressReporter: the scanners report bytes read once per chunk, even without keywords"""
+import random
+
+import pytest
+
+from onstar_gen11 import OnStarDecoder, ProgressReporter
+
+
+@pytest.mark.parametrize('segmentation', ['cluster', 'record'])
+def test_scanners_report_every_chunk(tmp_path, segmentation):
+    image = str(tmp_path / 'noise.bin')
+    with open(image, 'wb') as f:
+        f.write(random.Random(1).randbytes(1 << 20).replace(b'=', b'#'))
+    calls = []
+    progress = ProgressReporter(lambda status, percent: calls.append(percent), 1 << 20, min_interval=0)
+    with open(image, 'rb') as f:
+        segments = list(OnStarDecoder().iter_segments(f, segmentation, chunk_size=64 * 1024, progress=progress))
+    assert segments == []
+    assert len(calls) >= 16
+    assert calls == sorted(calls) and calls[-1] == progress.end_percent
+
+
+def test_bytes_done_never_go_back():
+    calls = []
+    progress = ProgressReporter(lambda status, percent: calls.append(status), 100, min_interval=0)
+    progress.update(80, 5)
+    progress.update(40)
+    assert progress.done_bytes == 80
+    assert "5 entries" in calls[-1]
@@ -0,0 +1,125 @@
+"""DecodeService: jobs from the localhost API and the watch folder, request checks, cancel and metrics"""
+import http.client
+import json
+import os
+import shutil
+import time
+
+import pytest
+
+from onstar_gen11 import DecodeService, OnStarDecoder
+
+
+@pytest.fixture
+def service(tmp_path):
+    service = DecodeService(str(tmp_path / 'out'), 'csv', workers=1).start()
+    service.serve_http(0)
+    yield service
+    service.stop()
+
+
+def request(service, method, path, body=None, headers=None):
+    port = service.server.server_address[1]
+    headers = dict({'Host': f"127.0.0.1:{port}", 'Content-Type': 'application/json'}, **(headers or {}))
+    connection = http.client.HTTPConnection('127.0.0.1', port, timeout=10)
+    try:
+        connection.request(method, path, json.dumps(body) if body is not None else None, headers)
+        response = connection.getresponse()
+        return response.status, json.loads(response.read())
+    finally:
+        connection.close()
+
+
+def wait_for(condition, timeout=60):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.05)
+
+
+def finished(service, job_id):
+    return service.job(job_id)['status'] in ('done', 'failed', 'cancelled')
+
+
+def read(path):
+    with open(path, 'rb') as f:
+        return f.read()
+
+
+def test_api_job_matches_direct_decode(service, image, tmp_path):
+    status, job = request(service, 'POST', '/jobs', {'input': image, 'output': 'api.csv'})
+    assert status == 202 and job['status'] in ('queued', 'running')
+    wait_for(lambda: finished(service, job['id']))
+    status, job = request(service, 'GET', f"/jobs/{job['id']}")
+    assert status == 200 and job['status'] == 'done' and job['error'] is None
+    assert job['output'] == str(tmp_path / 'out' / 'api.csv')
+    expected, error = OnStarDecoder().extract_gps_data(image, str(tmp_path / 'direct.csv'))
+    assert error is None and job['entries'] == expected
+    assert read(job['output']) == read(str(tmp_path / 'direct.csv'))
+    status, jobs = request(service, 'GET', '/jobs')
+    assert [listed['id'] for listed in jobs] == [job['id']]
+    status, metrics = request(service, 'GET', '/metrics')
+    assert metrics['jobs']['done'] == 1 and metrics['entries'] == expected
+
+
+@pytest.mark.parametrize('body,headers,expected', [
+    ({'input': 'IMAGE'}, {'Content-Type': 'text/plain'}, 415),
+    ({'input': 'IMAGE'}, {'Host': 'attacker.example'}, 403),
+    ({'input': 'IMAGE'}, {'Host': 'localhost:1'}, 403),
+    ({'input': 'IMAGE', 'output': '/tmp/elsewhere.csv'}, {}, 400),
+    ({'input': 'IMAGE', 'output': '../escaped.csv'}, {}, 400),
+    ({'input': 'IMAGE', 'format': 'pdf'}, {}, 400),
+    ({'input': '/no/such/image.bin'}, {}, 400),
+    ({'output': 'x.csv'}, {}, 400),
+])
+def test_bad_requests_are_refused(service, image, tmp_path, body, headers, expected):
+    body = {key: image if value == 'IMAGE' else value for key, value in body.items()}
+    status, reply = request(service, 'POST', '/jobs', body, headers)
+    assert status == expected and reply['error']
+    assert service.jobs() == []
+    assert not os.path.exists(tmp_path / 'escaped.csv')
+
+
+def test_unknown_paths_and_jobs(service):
+    assert request(service, 'GET', '/jobs/42')[0] == 404
+    assert request(service, 'DELETE', '/jobs/42')[0] == 404
+    assert request(service, 'GET', '/nowhere')[0] == 404
+    assert request(service, 'GET', '/metrics', headers={'Host': 'rebound.example:80'})[0] == 403
+
+
+def test_queued_job_can_be_cancelled(service, make_image):
+    image = make_image(size=8 << 20)
+    # One worker runs the first job and its pool holds the next one; the last stays queued
+    jobs = [service.submit(image)['id'] for _ in range(4)]
+    status, _ = request(service, 'DELETE', f"/jobs/{jobs[-1]}")
+    assert status == 200
+    wait_for(lambda: all(finished(service, job_id) for job_id in jobs))
+    assert service.job(jobs[-1])['status'] == 'cancelled'
+    assert service.job(jobs[0])['status'] == 'done'
+    assert request(service, 'DELETE', f"/jobs/{jobs[0]}")[0] == 409
+    assert service.metrics()['jobs']['cancelled'] == 1
+
+
+def test_watch_folder_decodes_new_files_once(tmp_path, image):
+    watched = tmp_path / 'watched'
+    watched.mkdir()
+    service = DecodeService(str(tmp_path / 'out'), 'csv', workers=1).start()
+    try:
+        service.watch(str(watched), interval=0.05)
+        shutil.copyfile(image, watched / 'image.bin')
+        (watched / '.partial.bin').write_bytes(b'ignored')
+        wait_for(lambda: service.jobs() and finished(service, service.jobs()[0]['id']))
+        time.sleep(0.3)
+        jobs = service.jobs()
+        assert len(jobs) == 1 and jobs[0]['status'] == 'done'
+        assert jobs[0]['output'] == str(tmp_path / 'out' / 'image.csv')
+    finally:
+        service.stop()
+    # A restarted service skips the input whose output is already newer
+    service = DecodeService(str(tmp_path / 'out'), 'csv', workers=1).start()
+    try:
+        service.watch(str(watched), interval=0.05)
+        time.sleep(0.5)
+        assert service.jobs() == []
+    finally:
+        service.stop()
@@ -0,0 +1,34 @@
+"""Firmware variant detection: marker hits are counted and a clear majority wins"""
+import pytest
+
+from onstar_gen11 import BareKeyMarker, KeyMarker, OnStarDecoder
+
+
+def test_markers_share_one_interface():
+    sample = b'gps_tow=1 gps_week=2 tow=3'
+    assert KeyMarker(b'gps_tow=', b'gps_week=').count(sample) == 2
+    assert BareKeyMarker(b'tow=', b'week=').count(sample) == 1
+    assert BareKeyMarker(b'tow=').found(b'tow=1') and not BareKeyMarker(b'tow=').found(b'gps_tow=1')
+
+
+@pytest.mark.parametrize('style', ['gen11', 'gen10'])
+def test_detects_the_variant_that_wrote_an_image(make_image, style):
+    assert OnStarDecoder().detect_variant(make_image(style)).name == style
+
+
+def test_a_few_corrupted_records_do_not_change_the_variant(make_image, tmp_path):
+    image = str(tmp_path / 'image.bin')
+    with open(make_image('gen11'), 'rb') as f:
+        data = f.read()
+    with open(image, 'wb') as f:
+        f.write(b'lon=zzweek=12 ' + data + b' xtow=5')
+    assert OnStarDecoder().detect_variant(image).name == 'gen11'
+
+
+def test_mixed_firmware_is_generic(make_image, tmp_path):
+    image = str(tmp_path / 'mixed.bin')
+    with open(image, 'wb') as f:
+        for style in ('gen11', 'gen10'):
+            with open(make_image(style), 'rb') as part:
+                f.write(part.read())
+    assert OnStarDecoder().detect_variant(image).name == 'generic'